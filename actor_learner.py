@@ -0,0 +1,229 @@
+# src/rl_agent/actor_learner.py
+
+import os
+import queue
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from src.rl_agent.dqn_agent import DQN
+
+# Parâmetros padrão do modo distribuído (vários atores / um aprendiz)
+TRANSITIONS_PER_MESSAGE = 32   # Transições agrupadas por mensagem na fila
+QUEUE_MAX_MESSAGES = 64        # Limite da fila: atores esperam se o aprendiz ficar para trás
+SYNC_INTERVAL = 50             # Atualizações do aprendiz entre duas publicações de pesos
+REPLAY_RATIO = 0.25            # Atualizações (replay) por transição recebida
+ACTOR_JOIN_TIMEOUT = 10        # Segundos para os atores encerrarem antes de serem terminados
+
+
+def _pack_transitions(transitions):
+    """Converte uma lista de transições em arrays contíguos (uma mensagem pequena por lote na fila).
+
+    Inclui os índices nos dados de cada estado (step/next_step), usados pela memória de replay compacta.
+    """
+    states, actions, rewards, next_states, dones, steps, next_steps = zip(*transitions)
+    return (
+        np.asarray(states, dtype=np.float32),
+        np.asarray(actions, dtype=np.int64),
+        np.asarray(rewards, dtype=np.float32),
+        np.asarray(next_states, dtype=np.float32),
+        np.asarray(dones, dtype=np.bool_),
+        np.asarray(steps, dtype=np.int64),
+        np.asarray(next_steps, dtype=np.int64)
+    )
+
+
+def _actor_process(actor_id, env, shared_model, weights_version, weights_lock, epsilon_value,
+                   transition_queue, stop_event, seed):
+    """Processo ator: joga episódios na sua cópia do ambiente e envia as transições ao aprendiz.
+
+    Usa uma cópia local da política, atualizada sempre que o aprendiz publica novos pesos.
+    """
+    torch.set_num_threads(1)  # Cada ator usa um núcleo
+    rng = np.random.default_rng(seed)
+    action_size = env.action_space.n
+
+    local_model = DQN(shared_model.fc1.in_features, action_size)
+    local_model.eval()
+    local_version = -1
+    buffer = []
+
+    def put(message):
+        # Evita travar para sempre se o aprendiz já terminou
+        while not stop_event.is_set():
+            try:
+                transition_queue.put(message, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    while not stop_event.is_set():
+        state, info = env.reset()
+        total_reward = 0
+        step_count = 0
+        done = False
+
+        while not done and not stop_event.is_set():
+            # Atualizar a política local se o aprendiz publicou pesos novos
+            if weights_version.value != local_version:
+                with weights_lock:
+                    local_model.load_state_dict(shared_model.state_dict())
+                    local_version = weights_version.value
+
+            if rng.random() <= epsilon_value.value:
+                action = int(rng.integers(action_size))
+            else:
+                with torch.no_grad():
+                    action = int(local_model(torch.from_numpy(np.asarray(state, dtype=np.float32))).argmax())
+
+            step = info["step"]
+            next_state, reward, terminated, truncated, info = env.step(action)
+            done = terminated or truncated
+            buffer.append((state, action, reward, next_state, done, step, info["step"]))
+            if len(buffer) >= TRANSITIONS_PER_MESSAGE:
+                put(("transitions", actor_id, _pack_transitions(buffer)))
+                buffer = []
+
+            state = next_state
+            total_reward += reward
+            step_count += 1
+
+        if done:
+            if buffer:
+                put(("transitions", actor_id, _pack_transitions(buffer)))
+                buffer = []
+            put(("episode", actor_id, {
+                "reward": float(total_reward),
+                "balance": float(info["balance"]),
+                "profit": float(info["accumulated_profit"]),
+                "steps": step_count
+            }))
+
+
+def train_actor_learner(trainer, episodes=100, num_actors=None, save_interval=10,
+                        replay_ratio=REPLAY_RATIO, sync_interval=SYNC_INTERVAL, verbose=True):
+    """
+    Treina o agente do `trainer` com vários processos atores e um aprendiz (este processo).
+
+    Cada ator roda sua própria cópia de `trainer.env` com um snapshot recente da política
+    (lido de uma rede em memória compartilhada) e envia lotes de transições por uma fila
+    limitada. O aprendiz guarda tudo no replay
+    central de `trainer.agent`, executa `replay()` e publica os pesos a cada `sync_interval`
+    atualizações. A coleta de experiência cresce com o número de núcleos; com `replay_ratio`
+    menor que 1 o aprendiz faz menos atualizações por transição que o treino sequencial.
+
+    Args:
+        trainer: Instância de TradingTrainer
+        episodes: Número total de episódios (somando todos os atores)
+        num_actors: Número de processos atores (padrão: núcleos - 1)
+        save_interval: Intervalo (em episódios) para salvar o modelo
+        replay_ratio: Atualizações do aprendiz por transição recebida
+        sync_interval: Atualizações entre duas publicações de pesos para os atores
+        verbose: Se True, exibe informações durante o treinamento
+
+    Returns:
+        Histórico de treinamento
+    """
+    agent = trainer.agent
+    num_actors = num_actors or max(1, (os.cpu_count() or 2) - 1)
+    ctx = mp.get_context("spawn")
+
+    # Política compartilhada lida pelos atores
+    shared_model = DQN(agent.state_size, agent.action_size)
+    shared_model.load_state_dict({k: v.cpu() for k, v in agent.model.state_dict().items()})
+    shared_model.share_memory()
+    weights_version = ctx.Value("i", 0)
+    weights_lock = ctx.Lock()
+    epsilon_value = ctx.Value("d", agent.epsilon)
+    transition_queue = ctx.Queue(maxsize=QUEUE_MAX_MESSAGES)
+    stop_event = ctx.Event()
+
+    actors = []
+    for actor_id in range(num_actors):
+        actor = ctx.Process(
+            target=_actor_process,
+            args=(actor_id, trainer.env, shared_model, weights_version, weights_lock, epsilon_value,
+                  transition_queue, stop_event, actor_id + int(time.time())),
+            daemon=True
+        )
+        actor.start()
+        actors.append(actor)
+
+    if verbose:
+        print(f"Treinamento distribuído: {num_actors} atores, {episodes} episódios")
+
+    start_time = time.time()
+    episodes_done = 0
+    updates = 0
+    pending_updates = 0.0
+    first_episode = len(trainer.training_history["episodes"]) + 1
+
+    try:
+        while episodes_done < episodes:
+            try:
+                kind, actor_id, payload = transition_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("Todos os processos atores terminaram inesperadamente.")
+                continue
+
+            if kind == "transitions":
+                states, actions, rewards, next_states, dones, steps, next_steps = payload
+                for i in range(len(actions)):
+                    agent.remember(states[i], int(actions[i]), float(rewards[i]), next_states[i], bool(dones[i]),
+                                   step=int(steps[i]), next_step=int(next_steps[i]))
+
+                pending_updates += len(actions) * replay_ratio
+                while pending_updates >= 1:
+                    agent.replay()
+                    pending_updates -= 1
+                    updates += 1
+                    if updates % sync_interval == 0:
+                        with weights_lock:
+                            with torch.no_grad():
+                                for shared_param, param in zip(shared_model.parameters(), agent.model.parameters()):
+                                    shared_param.copy_(param.detach().cpu())
+                            weights_version.value += 1
+                        epsilon_value.value = agent.epsilon
+
+            elif kind == "episode":
+                episodes_done += 1
+                episode = first_episode + episodes_done - 1
+                trainer.training_history["episodes"].append(episode)
+                trainer.training_history["rewards"].append(payload["reward"])
+                trainer.training_history["balances"].append(payload["balance"])
+                trainer.training_history["profits"].append(payload["profit"])
+                trainer.training_history["steps"].append(payload["steps"])
+                trainer.training_history["epsilon"].append(agent.epsilon)
+
+                if verbose and (episodes_done % 10 == 0 or episodes_done == 1):
+                    elapsed = time.time() - start_time
+                    print(f"Episódio {episodes_done}/{episodes} (ator {actor_id}) | Recompensa: {payload['reward']:.2f} | "
+                          f"Saldo: {payload['balance']:.2f} | Lucro: {payload['profit']:.2f} | "
+                          f"Passos: {payload['steps']} | Epsilon: {agent.epsilon:.4f} | "
+                          f"Atualizações: {updates} | Tempo: {elapsed:.2f}s")
+
+                if episodes_done % save_interval == 0:
+                    trainer.save_model(f"{trainer.symbol}_{episode}", group=f"{trainer.model_dir}/{trainer.symbol}",
+                                       wait=False)
+    finally:
+        stop_event.set()
+        # Esvaziar a fila para que nenhum ator fique bloqueado em put()
+        deadline = time.time() + ACTOR_JOIN_TIMEOUT
+        while any(actor.is_alive() for actor in actors) and time.time() < deadline:
+            try:
+                transition_queue.get(timeout=0.1)
+            except (queue.Empty, OSError, EOFError):
+                pass
+        for actor in actors:
+            actor.join(timeout=1)
+            if actor.is_alive():
+                actor.terminate()
+
+    # Salvar modelo final
+    trainer.save_model(f"{trainer.symbol}_final")
+
+    # Salvar histórico de treinamento
+    trainer.save_training_history()
+
+    return trainer.training_history
@@ -0,0 +1,227 @@
+# src/rl_agent/checkpoint_writer.py
+
+import atexit
+import copy
+import json
+import os
+import queue
+import threading
+from collections import Counter, defaultdict, deque
+import numpy as np
+import torch
+
+DEFAULT_KEEP_LAST = 3      # Checkpoints periódicos mantidos por grupo (os mais antigos são apagados)
+MAX_PENDING_JOBS = 4       # Gravações na fila; acima disso submit() espera (limita a memória dos snapshots)
+
+
+def snapshot_tensors(state):
+    """Copia (em memória, na CPU) os tensores de um state_dict ou checkpoint para gravação posterior.
+
+    O treinamento pode continuar alterando os pesos enquanto a cópia é gravada em segundo plano.
+    """
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {k: snapshot_tensors(v) for k, v in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot_tensors(v) for v in state)
+    return copy.deepcopy(state)
+
+
+def write_file(filepath, kind, payload):
+    """
+    Grava um arquivo de checkpoint de forma atômica (arquivo temporário + os.replace).
+
+    Args:
+        filepath: Caminho final
+        kind: "torch" (torch.save), "npz" (dicionário de arrays, comprimido) ou "json" (texto já serializado)
+        payload: Conteúdo a gravar
+    """
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    if kind == "torch":
+        torch.save(payload, tmp_path)
+    elif kind == "npz":
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **payload)
+    elif kind == "json":
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+    else:
+        raise ValueError(f"Tipo de arquivo de checkpoint desconhecido: {kind}")
+    os.replace(tmp_path, filepath)
+
+
+class CheckpointJob:
+    """Uma gravação agendada: espera pelo fim e devolve o erro a quem a pediu."""
+
+    def __init__(self, writer, filepaths):
+        self.filepaths = filepaths
+        self.error = None
+        self._writer = writer
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def touches(self, prefix):
+        """True se o job grava o caminho `prefix` ou algum arquivo dentro dele."""
+        prefix = os.path.abspath(prefix)
+        return any(path == prefix or path.startswith(prefix + os.sep)
+                   for path in map(os.path.abspath, self.filepaths))
+
+    def wait(self, timeout=None):
+        """
+        Espera a gravação terminar.
+
+        Raises:
+            O erro da gravação, se ela falhou (a partir daí o erro conta como visto)
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("A gravação do checkpoint não terminou no tempo esperado.")
+        if self.error is not None:
+            self._writer._mark_seen(self)
+            raise self.error
+
+    def add_done_callback(self, fn):
+        """Chama `fn(job)` quando a gravação terminar (com ou sem erro); na hora, se já terminou."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, error=None):
+        self.error = error
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"Erro no callback do checkpoint: {e}")
+
+
+class CheckpointWriter:
+    """Grava checkpoints em uma thread de fundo, fora do laço de treinamento.
+
+    Quem chama tira um snapshot em memória (`snapshot_tensors`) e envia a lista de arquivos;
+    a thread grava cada um com `write_file`, na ordem de chegada. Jobs com `group` entram na
+    retenção: só os arquivos dos `keep_last` jobs mais recentes de cada grupo ficam no disco.
+    `on_done` é chamado na thread de gravação depois que todos os arquivos do job estão no
+    disco. Uma gravação que falha não é esquecida: o erro fica no job e é relançado por
+    `job.wait()` ou `flush()` para quem esperar por ele.
+    """
+
+    def __init__(self, keep_last=DEFAULT_KEEP_LAST, max_pending=MAX_PENDING_JOBS):
+        self.keep_last = keep_last
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._groups = defaultdict(deque)  # grupo -> arquivos dos jobs retidos (mais antigo primeiro)
+        self._group_refs = defaultdict(Counter)  # grupo -> caminho -> jobs retidos que o gravaram
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = []  # Jobs na fila ou em gravação
+        self._failed = []  # Jobs com erro que ninguém esperou ainda
+        self.last_error = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, writes, group=None, on_done=None):
+        """
+        Agenda a gravação de um checkpoint.
+
+        Args:
+            writes: Lista de (caminho, tipo, conteúdo) já copiados em memória (ver write_file)
+            group: Grupo de retenção (ex.: checkpoints periódicos de um ativo) ou None
+            on_done: Função chamada após a gravação com a lista de arquivos apagados pela retenção
+
+        Returns:
+            CheckpointJob (use `job.wait()` para esperar a gravação e receber um eventual erro)
+        """
+        writes = list(writes)
+        job = CheckpointJob(self, [filepath for filepath, _, _ in writes])
+        with self._lock:
+            self._pending.append(job)
+        self._ensure_thread()
+        self._queue.put((job, writes, group, on_done))
+        return job
+
+    def flush(self, prefix=None, raise_errors=True):
+        """
+        Espera as gravações agendadas terminarem.
+
+        Args:
+            prefix: Só espera os jobs que gravam este caminho (arquivo ou diretório); None: todos
+            raise_errors: Se True, relança o primeiro erro ainda não visto entre esses jobs
+        """
+        with self._lock:
+            jobs = [job for job in self._pending + self._failed if prefix is None or job.touches(prefix)]
+        for job in jobs:
+            job._done.wait()
+        if raise_errors:
+            for job in jobs:
+                job.wait()
+
+    def _mark_seen(self, job):
+        with self._lock:
+            if job in self._failed:
+                self._failed.remove(job)
+
+    def _run(self):
+        while True:
+            job, writes, group, on_done = self._queue.get()
+            error = None
+            try:
+                for filepath, kind, payload in writes:
+                    write_file(filepath, kind, payload)
+                removed = []
+                if group is not None:
+                    removed = self._retain(group, job.filepaths)
+                if on_done is not None:
+                    on_done(removed)
+            except Exception as e:
+                error = e
+                self.last_error = str(e)
+                print(f"Erro ao gravar checkpoint: {e}")
+            finally:
+                with self._lock:
+                    self._pending.remove(job)
+                    if error is not None:
+                        self._failed.append(job)
+                job._finish(error)
+                self._queue.task_done()
+
+    def _retain(self, group, filepaths):
+        """
+        Registra os arquivos de um job e, além de `keep_last` jobs no grupo, apaga os arquivos dos
+        mais antigos que nenhum job retido regravou (retorna os apagados).
+        """
+        jobs = self._groups[group]
+        refs = self._group_refs[group]
+        jobs.append(filepaths)
+        refs.update(filepaths)
+        removed = []
+        while len(jobs) > self.keep_last:
+            for old_filepath in jobs.popleft():
+                refs[old_filepath] -= 1
+                if refs[old_filepath] > 0:
+                    continue  # Regravado por um job mais novo que continua retido
+                del refs[old_filepath]
+                try:
+                    os.remove(old_filepath)
+                    removed.append(old_filepath)
+                except OSError:
+                    pass
+        return removed
+
+
+# Instância global (uma thread de gravação por processo)
+checkpoint_writer = CheckpointWriter()
+atexit.register(checkpoint_writer.flush, raise_errors=False)
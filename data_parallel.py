@@ -0,0 +1,238 @@
+# src/rl_agent/data_parallel.py
+
+import io
+import os
+import queue
+import random
+import socket
+import time
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from src.rl_agent.dqn_agent import DQNAgent
+
+RESULT_TIMEOUT = 30  # Segundos esperando o estado final depois que todos os processos terminam
+
+
+def _free_port():
+    """Escolhe uma porta TCP livre para o rendezvous do torch.distributed."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def allreduce_gradients(model):
+    """Faz a média dos gradientes entre todos os processos (um único all-reduce por atualização)."""
+    grads = [p.grad for p in model.parameters() if p.grad is not None]
+    flat = torch.cat([g.view(-1) for g in grads])
+    dist.all_reduce(flat, op=dist.ReduceOp.SUM)
+    flat /= dist.get_world_size()
+    offset = 0
+    for g in grads:
+        g.copy_(flat[offset:offset + g.numel()].view_as(g))
+        offset += g.numel()
+
+
+def _learner_process(rank, world_size, master_port, env, agent_params, agent_state, episodes, result_queue,
+                     compact_replay=False):
+    """Processo aprendiz: coleta a própria experiência (replay local = shard) e treina em sincronia.
+
+    Todos os processos começam com os mesmos pesos, aplicam a mesma média de gradientes e
+    chamam `replay()` o mesmo número de vezes, então `model`, `target_model`, o otimizador e
+    o epsilon permanecem idênticos entre eles.
+    """
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(master_port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    torch.set_num_threads(1)
+
+    # Sementes diferentes por processo: cada um explora e amostra o seu próprio replay
+    seed = int(time.time()) + rank
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    try:
+        agent = DQNAgent(**agent_params)
+        agent.model.load_state_dict(agent_state["model_state_dict"])
+        agent.target_model.load_state_dict(agent_state["target_model_state_dict"])
+        agent.optimizer.load_state_dict(agent_state["optimizer_state_dict"])
+        agent.epsilon = agent_state["epsilon"]
+        agent.update_counter = agent_state["update_counter"]
+        if compact_replay:
+            agent.use_compact_memory(*env.observation_arrays())
+
+        # Garantir pesos idênticos (rank 0 é a referência)
+        for tensor in list(agent.model.state_dict().values()) + list(agent.target_model.state_dict().values()):
+            dist.broadcast(tensor, src=0)
+        agent.gradient_hook = allreduce_gradients
+
+        finished = torch.zeros(1)
+        state, info = env.reset()
+        total_reward = 0
+        step_count = 0
+
+        # Todos os processos executam o mesmo número de passos (e de all-reduces);
+        # o laço termina quando a soma de episódios concluídos atinge o total pedido
+        while True:
+            action = agent.act(state)
+            step = info["step"]
+            next_state, reward, terminated, truncated, info = env.step(action)
+            done = terminated or truncated
+            agent.remember(state, action, reward, next_state, done, step=step, next_step=info["step"])
+            agent.replay()
+
+            state = next_state
+            total_reward += reward
+            step_count += 1
+
+            local_finished = 0
+            if done:
+                local_finished = 1
+                result_queue.put(("episode", rank, {
+                    "reward": float(total_reward),
+                    "balance": float(info["balance"]),
+                    "profit": float(info["accumulated_profit"]),
+                    "steps": step_count,
+                    "epsilon": agent.epsilon
+                }))
+                state, info = env.reset()
+                total_reward = 0
+                step_count = 0
+
+            finished += local_finished
+            total_finished = finished.clone()
+            dist.all_reduce(total_finished, op=dist.ReduceOp.SUM)
+            if total_finished.item() >= episodes:
+                break
+
+        if rank == 0:
+            # Enviado serializado: o processo termina logo depois e não pode manter tensores compartilhados
+            buffer = io.BytesIO()
+            torch.save({
+                "model_state_dict": agent.model.state_dict(),
+                "target_model_state_dict": agent.target_model.state_dict(),
+                "optimizer_state_dict": agent.optimizer.state_dict(),
+                "epsilon": agent.epsilon,
+                "update_counter": agent.update_counter
+            }, buffer)
+            result_queue.put(("state", rank, buffer.getvalue()))
+    finally:
+        dist.destroy_process_group()
+
+
+def train_data_parallel(trainer, episodes=100, world_size=2, save_interval=10, verbose=True):
+    """
+    Treina o agente do `trainer` com vários aprendizes locais em paralelo de dados (gloo, CPU).
+
+    Cada processo roda uma cópia do ambiente, amostra o seu próprio replay (o replay fica
+    dividido entre os processos) e os gradientes são promediados com all-reduce a cada atualização;
+    o lote efetivo é `world_size * batch_size`. Com `trainer.compact_replay` cada processo usa a
+    memória de replay compacta no seu shard. No fim o estado do rank 0 é carregado em
+    `trainer.agent`, então o checkpoint salvo por `DQNAgent.save` é o mesmo de um treino comum.
+
+    Args:
+        trainer: Instância de TradingTrainer
+        episodes: Número total de episódios (somando todos os processos)
+        world_size: Número de processos aprendizes
+        save_interval: Intervalo (em episódios) para salvar o histórico de treinamento
+        verbose: Se True, exibe informações durante o treinamento
+
+    Returns:
+        Histórico de treinamento
+    """
+    agent = trainer.agent
+    agent_params = {
+        "state_size": agent.state_size,
+        "action_size": agent.action_size,
+        "learning_rate": agent.learning_rate,
+        "gamma": agent.gamma,
+        "epsilon": agent.epsilon,
+        "epsilon_min": agent.epsilon_min,
+        "epsilon_decay": agent.epsilon_decay,
+        "memory_size": agent.memory.maxlen,
+        "batch_size": agent.batch_size,
+        "target_update": agent.target_update
+    }
+    agent_state = {
+        "model_state_dict": {k: v.cpu() for k, v in agent.model.state_dict().items()},
+        "target_model_state_dict": {k: v.cpu() for k, v in agent.target_model.state_dict().items()},
+        "optimizer_state_dict": agent.optimizer.state_dict(),
+        "epsilon": agent.epsilon,
+        "update_counter": agent.update_counter
+    }
+
+    ctx = mp.get_context("spawn")
+    result_queue = ctx.Queue()
+    master_port = _free_port()
+    learners = [
+        ctx.Process(target=_learner_process,
+                    args=(rank, world_size, master_port, trainer.env, agent_params, agent_state, episodes, result_queue,
+                          trainer.compact_replay),
+                    daemon=True)
+        for rank in range(world_size)
+    ]
+    for learner in learners:
+        learner.start()
+
+    if verbose:
+        print(f"Treinamento paralelo de dados: {world_size} processos (gloo), {episodes} episódios")
+
+    start_time = time.time()
+    final_state = None
+    episodes_done = 0
+    first_episode = len(trainer.training_history["episodes"]) + 1
+    finished_at = None
+
+    while final_state is None:
+        try:
+            kind, rank, payload = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            if not any(learner.is_alive() for learner in learners):
+                finished_at = finished_at or time.time()
+                if time.time() - finished_at > RESULT_TIMEOUT:
+                    raise RuntimeError("Os processos de treinamento terminaram sem enviar o estado final.")
+            continue
+
+        if kind == "state":
+            final_state = torch.load(io.BytesIO(payload), map_location=agent.device)
+        elif kind == "episode":
+            episodes_done += 1
+            episode = first_episode + episodes_done - 1
+            trainer.training_history["episodes"].append(episode)
+            trainer.training_history["rewards"].append(payload["reward"])
+            trainer.training_history["balances"].append(payload["balance"])
+            trainer.training_history["profits"].append(payload["profit"])
+            trainer.training_history["steps"].append(payload["steps"])
+            trainer.training_history["epsilon"].append(payload["epsilon"])
+
+            if verbose and (episodes_done % 10 == 0 or episodes_done == 1):
+                elapsed = time.time() - start_time
+                print(f"Episódio {episodes_done}/{episodes} (rank {rank}) | Recompensa: {payload['reward']:.2f} | "
+                      f"Saldo: {payload['balance']:.2f} | Lucro: {payload['profit']:.2f} | "
+                      f"Passos: {payload['steps']} | Epsilon: {payload['epsilon']:.4f} | "
+                      f"Tempo: {elapsed:.2f}s")
+
+            if episodes_done % save_interval == 0:
+                trainer.save_training_history()
+
+    for learner in learners:
+        learner.join(timeout=10)
+        if learner.is_alive():
+            learner.terminate()
+
+    # Carregar o estado sincronizado no agente do processo principal
+    agent.model.load_state_dict(final_state["model_state_dict"])
+    agent.target_model.load_state_dict(final_state["target_model_state_dict"])
+    agent.optimizer.load_state_dict(final_state["optimizer_state_dict"])
+    agent.epsilon = final_state["epsilon"]
+    agent.update_counter = final_state["update_counter"]
+
+    # Salvar modelo final
+    trainer.save_model(f"{trainer.symbol}_final")
+
+    # Salvar histórico de treinamento
+    trainer.save_training_history()
+
+    return trainer.training_history
@@ -5,7 +5,12 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import random
-from collections import deque
+import os
+import copy
+import threading
+import sys
+import time
+from collections import deque, OrderedDict
 
 # Rede Neural para o DQN
 class DQN(nn.Module):
@@ -20,6 +25,114 @@ class DQN(nn.Module):
         x = torch.relu(self.fc2(x))
         return self.fc3(x)
 
+# Memória de replay compacta: guarda só índices e o estado mutável do agente
+class CompactReplayMemory:
+    """Memória de replay que reconstrói as observações a partir dos dados do ambiente.
+
+    A observação do TradingEnv é [preço, SMA, posição, saldo]; preço e SMA vêm de um
+    conjunto de dados fixo, então cada transição guarda só o passo (índice nos dados), a
+    posição e o saldo de `state` e de `next_state`, além de ação, recompensa e fim. As
+    observações são remontadas (e limitadas aos mesmos limites do ambiente) na amostragem,
+    idênticas às que o ambiente entregou. A ordem é a de uma deque (mais antigo primeiro),
+    então amostrar os mesmos índices devolve as mesmas transições da memória comum.
+    """
+
+    def __init__(self, maxlen, features, low, high):
+        self.maxlen = maxlen
+        self.set_features(features, low, high)
+        self.steps = np.zeros(maxlen, dtype=np.int32)
+        self.positions = np.zeros(maxlen, dtype=np.int8)
+        self.balances = np.zeros(maxlen, dtype=np.float32)
+        self.next_steps = np.zeros(maxlen, dtype=np.int32)
+        self.next_positions = np.zeros(maxlen, dtype=np.int8)
+        self.next_balances = np.zeros(maxlen, dtype=np.float32)
+        self.actions = np.zeros(maxlen, dtype=np.int8)
+        self.rewards = np.zeros(maxlen, dtype=np.float32)
+        self.dones = np.zeros(maxlen, dtype=np.bool_)
+        self._start = 0  # Posição da transição mais antiga no buffer circular
+        self._size = 0
+
+    def set_features(self, features, low, high):
+        """Define as colunas fixas das observações (N x 2: preço, SMA) e os limites do ambiente."""
+        self.features = np.asarray(features, dtype=np.float32)
+        self.low = np.asarray(low, dtype=np.float32)
+        self.high = np.asarray(high, dtype=np.float32)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos buffers e pelas colunas de observação."""
+        return sum(a.nbytes for a in (self.steps, self.positions, self.balances, self.next_steps,
+                                      self.next_positions, self.next_balances, self.actions,
+                                      self.rewards, self.dones, self.features))
+
+    def append(self, step, state, action, reward, next_step, next_state, done):
+        """Guarda uma transição (posição e saldo são lidos das próprias observações)."""
+        if self._size < self.maxlen:
+            i = (self._start + self._size) % self.maxlen
+            self._size += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.maxlen
+        self.steps[i] = step
+        self.positions[i] = state[2]
+        self.balances[i] = state[3]
+        self.next_steps[i] = next_step
+        self.next_positions[i] = next_state[2]
+        self.next_balances[i] = next_state[3]
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def _observations(self, steps, positions, balances):
+        steps = np.minimum(steps, len(self.features) - 1)
+        observations = np.empty((len(steps), 4), dtype=np.float32)
+        observations[:, :2] = self.features[steps]
+        observations[:, 2] = positions
+        observations[:, 3] = balances
+        return np.clip(observations, self.low, self.high, out=observations)
+
+    def batch(self, indices):
+        """Transições nas posições `indices` (0 = mais antiga) como arrays prontos para tensores."""
+        i = (self._start + np.asarray(indices)) % self.maxlen
+        return (
+            self._observations(self.steps[i], self.positions[i], self.balances[i]),
+            self.actions[i].astype(np.int64),
+            self.rewards[i],
+            self._observations(self.next_steps[i], self.next_positions[i], self.next_balances[i]),
+            self.dones[i].astype(np.float32)
+        )
+
+    def arrays(self):
+        """Conteúdo em ordem (mais antigo primeiro), para o checkpoint completo."""
+        i = (self._start + np.arange(self._size)) % self.maxlen
+        return {
+            "compact_steps": self.steps[i],
+            "compact_positions": self.positions[i],
+            "compact_balances": self.balances[i],
+            "compact_next_steps": self.next_steps[i],
+            "compact_next_positions": self.next_positions[i],
+            "compact_next_balances": self.next_balances[i],
+            "compact_actions": self.actions[i],
+            "compact_rewards": self.rewards[i],
+            "compact_dones": self.dones[i]
+        }
+
+    def load_arrays(self, arrays):
+        """Restaura o conteúdo salvo por `arrays` (mantém as últimas maxlen transições)."""
+        size = min(len(arrays["compact_steps"]), self.maxlen)
+        for name in ("steps", "positions", "balances", "next_steps", "next_positions",
+                     "next_balances", "actions", "rewards", "dones"):
+            getattr(self, name)[:size] = arrays[f"compact_{name}"][-size:] if size else []
+        self._start = 0
+        self._size = size
+
 # Agente DQN
 class DQNAgent:
     def __init__(self, state_size, action_size, learning_rate=0.001, gamma=0.99, 
@@ -49,9 +162,32 @@ class DQNAgent:
         # Otimizador
         self.optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
         self.criterion = nn.MSELoss()
+        self.read_only = False  # True quando usa um modelo compartilhado (somente avaliação)
+        # Chamado com o modelo entre backward() e step() (ex.: all-reduce dos gradientes no treino paralelo)
+        self.gradient_hook = None
+        # PhaseTimer opcional (training_profiler) que recebe o tempo de cada etapa do replay
+        self.profiler = None
+
+    def use_shared_model(self, model):
+        """Usa uma rede compartilhada (ex.: de load_cached_policy) apenas para inferência"""
+        self.model = model
+        self.target_model = model
+        self.optimizer = None
+        self.read_only = True
+        self.epsilon = 0.0
+        
+    def use_compact_memory(self, features, low, high):
+        """Troca a memória de replay pela CompactReplayMemory (mesma capacidade, memória vazia)"""
+        capacity = self.memory.maxlen
+        self.memory = CompactReplayMemory(capacity, features, low, high)
         
-    def remember(self, state, action, reward, next_state, done):
-        """Armazena experiência na memória"""
+    def remember(self, state, action, reward, next_state, done, step=None, next_step=None):
+        """Armazena experiência na memória (step/next_step: índices nos dados, exigidos pela memória compacta)"""
+        if isinstance(self.memory, CompactReplayMemory):
+            if step is None or next_step is None:
+                raise ValueError("A memória de replay compacta precisa dos índices step e next_step.")
+            self.memory.append(step, state, action, reward, next_step, next_state, done)
+            return
         self.memory.append((state, action, reward, next_state, done))
     
     def act(self, state, training=True):
@@ -62,25 +198,44 @@ class DQNAgent:
         
         # Exploitação: melhor ação segundo o modelo
         state = torch.FloatTensor(state).to(self.device)
-        self.model.eval()
+        # Um modelo compartilhado fica sempre em modo eval; não alterar o modo dele aqui
+        # (modelos exportados em TorchScript congelado nem têm o atributo `training`)
+        was_training = getattr(self.model, "training", False)
+        if was_training:
+            self.model.eval()
         with torch.no_grad():
             action_values = self.model(state)
-        self.model.train()
+        if was_training:
+            self.model.train()
         return np.argmax(action_values.cpu().data.numpy())
     
     def replay(self):
         """Treina o modelo com experiências passadas (experience replay)"""
-        if len(self.memory) < self.batch_size:
+        if self.read_only or len(self.memory) < self.batch_size:
             return
         
         # Amostra aleatória da memória
-        minibatch = random.sample(self.memory, self.batch_size)
-        
-        states = torch.FloatTensor([i[0] for i in minibatch]).to(self.device)
-        actions = torch.LongTensor([[i[1]] for i in minibatch]).to(self.device)
-        rewards = torch.FloatTensor([[i[2]] for i in minibatch]).to(self.device)
-        next_states = torch.FloatTensor([i[3] for i in minibatch]).to(self.device)
-        dones = torch.FloatTensor([[i[4]] for i in minibatch]).to(self.device)
+        t_start = time.perf_counter()
+        if isinstance(self.memory, CompactReplayMemory):
+            # Mesmas posições que random.sample escolheria na deque; observações remontadas dos dados
+            indices = random.sample(range(len(self.memory)), self.batch_size)
+            t_sample = time.perf_counter()
+            batch_states, batch_actions, batch_rewards, batch_next_states, batch_dones = self.memory.batch(indices)
+            states = torch.from_numpy(batch_states).to(self.device)
+            actions = torch.from_numpy(batch_actions).unsqueeze(1).to(self.device)
+            rewards = torch.from_numpy(batch_rewards).unsqueeze(1).to(self.device)
+            next_states = torch.from_numpy(batch_next_states).to(self.device)
+            dones = torch.from_numpy(batch_dones).unsqueeze(1).to(self.device)
+        else:
+            minibatch = random.sample(self.memory, self.batch_size)
+            t_sample = time.perf_counter()
+            
+            states = torch.FloatTensor([i[0] for i in minibatch]).to(self.device)
+            actions = torch.LongTensor([[i[1]] for i in minibatch]).to(self.device)
+            rewards = torch.FloatTensor([[i[2]] for i in minibatch]).to(self.device)
+            next_states = torch.FloatTensor([i[3] for i in minibatch]).to(self.device)
+            dones = torch.FloatTensor([[i[4]] for i in minibatch]).to(self.device)
+        t_tensors = time.perf_counter()
         
         # Valores Q atuais (Q(s,a)) para as ações tomadas
         curr_q = self.model(states).gather(1, actions)
@@ -94,11 +249,16 @@ class DQNAgent:
         
         # Calcula a perda
         loss = self.criterion(curr_q, target_q)
+        t_forward = time.perf_counter()
         
         # Otimiza o modelo
         self.optimizer.zero_grad()
         loss.backward()
+        if self.gradient_hook is not None:
+            self.gradient_hook(self.model)
+        t_backward = time.perf_counter()
         self.optimizer.step()
+        t_step = time.perf_counter()
         
         # Atualiza epsilon (reduz exploração gradualmente)
         if self.epsilon > self.epsilon_min:
@@ -108,15 +268,38 @@ class DQNAgent:
         self.update_counter += 1
         if self.update_counter % self.target_update == 0:
             self.target_model.load_state_dict(self.model.state_dict())
+            if self.profiler is not None:
+                self.profiler.record("target_sync", t_step)
+        
+        if self.profiler is not None:
+            self.profiler.add("replay_sample", t_sample - t_start)
+            self.profiler.add("replay_tensors", t_tensors - t_sample)
+            self.profiler.add("replay_forward", t_forward - t_tensors)
+            self.profiler.add("replay_backward", t_backward - t_forward)
+            self.profiler.add("replay_step", t_step - t_backward)
+            self.profiler.updates += 1
             
-    def save(self, filepath):
-        """Salva o modelo treinado"""
+    def save(self, filepath, writer=None):
+        """Salva o modelo treinado (em segundo plano se um CheckpointWriter for passado; retorna o CheckpointJob)"""
+        if self.read_only:
+            raise RuntimeError("Agente usando modelo compartilhado (somente leitura) não pode ser salvo.")
+        if writer is not None:
+            return writer.submit([(filepath, "torch", self.checkpoint_state())])
         torch.save({
             'model_state_dict': self.model.state_dict(),
             'target_model_state_dict': self.target_model.state_dict(),
             'optimizer_state_dict': self.optimizer.state_dict(),
             'epsilon': self.epsilon
         }, filepath)
+    
+    def checkpoint_state(self):
+        """Cópia em memória do checkpoint de `save`; pode ser gravada em outra thread enquanto o treino continua"""
+        return copy.deepcopy({
+            'model_state_dict': self.model.state_dict(),
+            'target_model_state_dict': self.target_model.state_dict(),
+            'optimizer_state_dict': self.optimizer.state_dict(),
+            'epsilon': self.epsilon
+        })
         
     def load(self, filepath):
         """Carrega um modelo treinado"""
@@ -137,3 +320,186 @@ class DQNAgent:
             # A lógica na DQNStrategy irá sobrescrever para 0.0 se train_mode for False.
             self.epsilon = self.epsilon_min 
             print(f"Aviso: 'epsilon' não encontrado no checkpoint. Usando epsilon_min: {self.epsilon_min}")
+
+    def save_full_state(self, dirpath, writer=None):
+        """Salva o estado completo do agente para retomar o treinamento.
+
+        Escreve `agent.pth` (redes, otimizador, epsilon, contador de atualizações e estado
+        do gerador do torch) e `replay.npz` (memória de replay em arrays comprimidos e os
+        estados dos geradores do `random` e do numpy). Cada arquivo é escrito em um
+        temporário e renomeado, então uma falha no meio nunca deixa um arquivo truncado.
+        Com um CheckpointWriter, só o snapshot é feito aqui e a gravação fica em segundo plano
+        (retorna o CheckpointJob, cujo `wait()` relança um eventual erro de gravação).
+        """
+        writes = self.full_state_writes(dirpath)
+        if writer is not None:
+            return writer.submit(writes)
+        os.makedirs(dirpath, exist_ok=True)
+        for filepath, kind, payload in writes:
+            if kind == "torch":
+                torch.save(payload, f"{filepath}.tmp")
+            else:
+                with open(f"{filepath}.tmp", "wb") as f:
+                    np.savez_compressed(f, **payload)
+            os.replace(f"{filepath}.tmp", filepath)
+
+    def full_state_writes(self, dirpath):
+        """Snapshot do estado completo como lista de (caminho, tipo, conteúdo) para o CheckpointWriter."""
+        if self.read_only:
+            raise RuntimeError("Agente usando modelo compartilhado (somente leitura) não pode ser salvo.")
+        agent_state = self.checkpoint_state()
+        agent_state['update_counter'] = self.update_counter
+        agent_state['torch_rng_state'] = torch.get_rng_state()
+        return [
+            (os.path.join(dirpath, "agent.pth"), "torch", agent_state),
+            (os.path.join(dirpath, "replay.npz"), "npz", {**self._memory_arrays(), **_rng_arrays()})
+        ]
+
+    def load_full_state(self, dirpath, restore_rng=True):
+        """Restaura o estado salvo por `save_full_state` (redes, replay, contadores e, se restore_rng, geradores)."""
+        checkpoint = torch.load(os.path.join(dirpath, "agent.pth"), map_location=self.device)
+        self.model.load_state_dict(checkpoint['model_state_dict'])
+        self.target_model.load_state_dict(checkpoint['target_model_state_dict'])
+        self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        self.epsilon = checkpoint['epsilon']
+        self.update_counter = checkpoint['update_counter']
+        if restore_rng:
+            torch.set_rng_state(checkpoint['torch_rng_state'].cpu())
+
+        with np.load(os.path.join(dirpath, "replay.npz")) as arrays:
+            self._load_memory_arrays(arrays)
+            if restore_rng:
+                _set_rng_arrays(arrays)
+
+    def memory_footprint(self):
+        """Estimativa (bytes) da memória do agente: redes, estado do otimizador e memória de replay."""
+        tensors = list(self.model.state_dict().values()) + list(self.target_model.state_dict().values())
+        for state in self.optimizer.state.values():
+            tensors.extend(v for v in state.values() if torch.is_tensor(v))
+        total = sum(t.numel() * t.element_size() for t in tensors)
+
+        if isinstance(self.memory, CompactReplayMemory):
+            total += self.memory.nbytes
+        elif self.memory:
+            # Transições da deque: tupla + estados (arrays) + escalares; estimadas pela primeira
+            sample = self.memory[0]
+            total += len(self.memory) * (sys.getsizeof(sample) + sum(sys.getsizeof(v) for v in sample))
+        return total
+
+    def _memory_arrays(self):
+        """Converte a memória de replay em arrays contíguos (um por campo da transição)."""
+        if isinstance(self.memory, CompactReplayMemory):
+            return self.memory.arrays()
+        if not self.memory:
+            return {
+                "states": np.zeros((0, self.state_size), dtype=np.float32),
+                "actions": np.zeros(0, dtype=np.int64),
+                "rewards": np.zeros(0, dtype=np.float32),
+                "next_states": np.zeros((0, self.state_size), dtype=np.float32),
+                "dones": np.zeros(0, dtype=np.bool_)
+            }
+        states, actions, rewards, next_states, dones = zip(*self.memory)
+        return {
+            "states": np.asarray(states, dtype=np.float32),
+            "actions": np.asarray(actions, dtype=np.int64),
+            "rewards": np.asarray(rewards, dtype=np.float32),
+            "next_states": np.asarray(next_states, dtype=np.float32),
+            "dones": np.asarray(dones, dtype=np.bool_)
+        }
+
+    def _load_memory_arrays(self, arrays):
+        """Recria a memória de replay a partir dos arrays de `_memory_arrays`."""
+        self.memory.clear()
+        compact_checkpoint = "compact_steps" in arrays
+        if isinstance(self.memory, CompactReplayMemory) != compact_checkpoint:
+            # Os índices não podem ser recuperados de observações completas (nem o inverso sem os dados)
+            print("Aviso: modo da memória de replay do checkpoint diferente do atual. Memória de replay não restaurada.")
+            return
+        if compact_checkpoint:
+            self.memory.load_arrays(arrays)
+            return
+        for state, action, reward, next_state, done in zip(arrays["states"], arrays["actions"], arrays["rewards"],
+                                                           arrays["next_states"], arrays["dones"]):
+            self.memory.append((state, int(action), float(reward), next_state, bool(done)))
+
+
+def _rng_arrays():
+    """Estados dos geradores do `random` e do numpy como arrays (para o replay.npz)."""
+    version, internal_state, gauss_next = random.getstate()
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "python_rng_state": np.asarray(internal_state, dtype=np.int64),
+        "python_rng_meta": np.asarray([version, np.nan if gauss_next is None else gauss_next], dtype=np.float64),
+        "numpy_rng_keys": keys,
+        "numpy_rng_meta": np.asarray([pos, has_gauss, cached_gaussian], dtype=np.float64)
+    }
+
+
+def _set_rng_arrays(arrays):
+    """Restaura os geradores do `random` e do numpy salvos por `_rng_arrays`."""
+    version, gauss_next = arrays["python_rng_meta"]
+    random.setstate((int(version), tuple(int(v) for v in arrays["python_rng_state"]),
+                     None if np.isnan(gauss_next) else float(gauss_next)))
+    pos, has_gauss, cached_gaussian = arrays["numpy_rng_meta"]
+    np.random.set_state(("MT19937", arrays["numpy_rng_keys"], int(pos), int(has_gauss), float(cached_gaussian)))
+
+
+# Cache de redes somente leitura compartilhadas por todo o processo (LRU).
+# Chave: (caminho absoluto, mtime, state_size, action_size) -> DQN em modo eval
+POLICY_CACHE_SIZE = 8  # Redes mantidas; cada backtest de um modelo novo (ex.: por execução) ocupa uma entrada
+_policy_cache = OrderedDict()
+_policy_cache_lock = threading.Lock()
+
+def exported_policy_path(filepath):
+    """Caminho do modelo de inferência exportado (TorchScript, ver policy_export) de um checkpoint .pth"""
+    return f"{os.path.splitext(filepath)[0]}.ts.pt"
+
+def load_exported_policy(filepath):
+    """Carrega o modelo exportado de um checkpoint, se existir e não for mais antigo que o checkpoint.
+
+    Returns:
+        ScriptModule congelado (aceita um estado ou um lote de estados) ou None
+    """
+    exported_path = exported_policy_path(filepath)
+    if not os.path.exists(exported_path):
+        return None
+    if os.path.exists(filepath) and os.path.getmtime(exported_path) < os.path.getmtime(filepath):
+        return None  # Checkpoint regravado depois da exportação: o exportado está desatualizado
+    return torch.jit.load(exported_path, map_location=torch.device('cpu'))
+
+def load_cached_policy(filepath, state_size, action_size):
+    """Carrega a rede de um checkpoint uma única vez por processo, para inferência.
+
+    Vários backtests de avaliação (ou threads) usando o mesmo checkpoint recebem a mesma
+    instância, sem ler o arquivo de novo. Se o arquivo mudar (mtime diferente), a versão
+    antiga é descartada e a nova é carregada. Se houver um modelo exportado atualizado
+    (`exported_policy_path`), ele é usado no lugar da rede comum.
+    """
+    path = os.path.abspath(filepath)
+    exported_path = exported_policy_path(path)
+    if os.path.exists(exported_path) and os.path.getmtime(exported_path) >= os.path.getmtime(path):
+        key = (path, os.path.getmtime(exported_path), state_size, action_size)
+    else:
+        exported_path = None
+        key = (path, os.path.getmtime(path), state_size, action_size)
+    with _policy_cache_lock:
+        model = _policy_cache.get(key)
+        if model is not None:
+            _policy_cache.move_to_end(key)
+        else:
+            if exported_path is not None:
+                model = torch.jit.load(exported_path, map_location=torch.device('cpu'))
+            else:
+                checkpoint = torch.load(path, map_location=torch.device('cpu'))
+                model = DQN(state_size, action_size)
+                model.load_state_dict(checkpoint['model_state_dict'])
+                model.eval()
+                for param in model.parameters():
+                    param.requires_grad_(False)
+            # Remover versões antigas do mesmo arquivo
+            for stale_key in [k for k in _policy_cache if k[0] == path]:
+                del _policy_cache[stale_key]
+            _policy_cache[key] = model
+            while len(_policy_cache) > POLICY_CACHE_SIZE:
+                _policy_cache.popitem(last=False)
+    return model
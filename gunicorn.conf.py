@@ -0,0 +1,21 @@
+# gunicorn.conf.py
+"""Configuração do gunicorn, lida automaticamente por `gunicorn wsgi:app` na raiz do projeto.
+
+Os endpoints de eventos (SSE: /api/ai/events e /api/backtest_events) mantêm a conexão aberta
+enquanto o cliente acompanha o progresso. Com o worker padrão (sync) cada conexão ocuparia um
+worker inteiro e poucos dashboards abertos travariam a API, então os workers usam threads
+(gthread): cada stream ocupa só uma thread. Não use `--worker-class sync`; gevent
+(`--worker-class gevent`, requer o pacote gevent) também funciona.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Acima de event_bus.MAX_SUBSCRIBERS (200), para sobrar threads às requisições comuns com todos os streams abertos
+threads = int(os.environ.get("GUNICORN_THREADS", 256))
+# No gthread o timeout vale para workers travados, não para a duração de uma requisição (os streams enviam keep-alive)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+if worker_class == "sync":
+    raise RuntimeError("Os endpoints SSE exigem workers gthread ou gevent (GUNICORN_WORKER_CLASS).")
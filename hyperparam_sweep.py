@@ -0,0 +1,223 @@
+# src/rl_agent/hyperparam_sweep.py
+
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+import torch
+
+# Espaço de busca padrão (valores em torno dos usados em train_viktor_ia.py e TradingTrainer)
+DEFAULT_SEARCH_SPACE = {
+    "learning_rate": [0.0005, 0.001, 0.002],
+    "gamma": [0.95, 0.99],
+    "epsilon_decay": [0.99, 0.995],
+    "batch_size": [32, 64],
+    "sma_window": [15, 20]
+}
+
+# Chaves do espaço de busca que pertencem ao ambiente; as demais vão para agent_params
+ENV_KEYS = ("sma_window",)
+
+
+def build_configs(search_space=None, num_configs=None, seed=None):
+    """
+    Gera as configurações do sweep a partir do espaço de busca.
+
+    Args:
+        search_space: Dicionário {parâmetro: lista de valores}
+        num_configs: Se definido, sorteia esse número de combinações (sem repetição)
+        seed: Semente do sorteio
+
+    Returns:
+        Lista de dicionários de configuração
+    """
+    search_space = search_space or DEFAULT_SEARCH_SPACE
+    keys = list(search_space)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(search_space[k] for k in keys))]
+    if num_configs is not None and num_configs < len(configs):
+        configs = random.Random(seed).sample(configs, num_configs)
+    return configs
+
+
+def _run_trial(trial, trainer_kwargs, episodes, test_episodes, torch_threads):
+    """
+    Continua o treinamento de uma configuração até `episodes` episódios acumulados e avalia.
+    Executado em um processo do pool. Entre rodadas o estado completo do treinador (pesos,
+    otimizador, epsilon, memória de replay e geradores aleatórios) fica em `<trial>/state`,
+    então a rodada seguinte continua exatamente de onde a anterior parou, como um treino
+    sem interrupções de `episodes` episódios.
+    """
+    # Import local: cada processo do pool carrega o treinador (e os dados) por conta própria
+    from src.rl_agent.trainer import TradingTrainer
+
+    torch.set_num_threads(torch_threads)
+    config = trial["config"]
+    env_params = {k: v for k, v in config.items() if k in ENV_KEYS}
+    agent_params = {k: v for k, v in config.items() if k not in ENV_KEYS}
+
+    trainer = TradingTrainer(**{**trainer_kwargs, **env_params}, model_dir=trial["dir"], agent_params=agent_params)
+    checkpoint_name = f"{trainer.symbol}_final"
+    state_dir = os.path.join(trial["dir"], "state")
+    if os.path.exists(os.path.join(state_dir, "trainer.json")):
+        # Processo próprio do trial: os geradores aleatórios globais também são restaurados
+        trainer.agent.load_full_state(state_dir)
+        with open(os.path.join(state_dir, "trainer.json"), "r") as f:
+            trainer.training_history = json.load(f)["training_history"]
+
+    start_time = time.time()
+    new_episodes = episodes - trial["episodes_trained"]
+    trainer.train(episodes=new_episodes, save_interval=new_episodes + 1, verbose=False)
+    trainer.save_state(state_dir)
+    test_results = trainer.test(episodes=test_episodes, verbose=False)
+
+    return {
+        "trial_id": trial["trial_id"],
+        "episodes_trained": episodes,
+        "score": float(np.mean(test_results["profits"])),
+        "success_rate": test_results["success_rate"],
+        "mean_reward": float(np.mean(test_results["rewards"])),
+        "elapsed_seconds": time.time() - start_time,
+        "checkpoint": os.path.join(trial["dir"], f"{checkpoint_name}.pth")
+    }
+
+
+def run_successive_halving(trainer_kwargs, configs=None, min_episodes=5, max_episodes=45, eta=3,
+                           test_episodes=1, max_workers=None, torch_threads=1,
+                           output_dir="/home/ubuntu/ia_trader_app/models/sweeps", verbose=True):
+    """
+    Sweep de hiperparâmetros com successive halving.
+
+    Todas as configurações treinam `min_episodes` episódios; a cada rodada só a melhor fração
+    (1/eta) continua, com orçamento eta vezes maior, até `max_episodes`. Cada rodada roda as
+    configurações em paralelo em um pool de processos e a pontuação é o lucro médio do test().
+
+    Args:
+        trainer_kwargs: Parâmetros do TradingTrainer (symbol, region, interval, range_period, ...)
+        configs: Lista de configurações (padrão: build_configs())
+        min_episodes: Orçamento (episódios) da primeira rodada
+        max_episodes: Orçamento máximo de uma configuração
+        eta: Fator de redução (mantém 1/eta das configurações por rodada)
+        test_episodes: Episódios de teste usados na pontuação
+        max_workers: Número de processos do pool (padrão: núcleos / torch_threads)
+        torch_threads: Threads do torch por processo
+        output_dir: Diretório onde cada sweep cria sua pasta (trials e leaderboard)
+        verbose: Se True, exibe o progresso
+
+    Returns:
+        Leaderboard (dicionário com os trials ordenados e o vencedor)
+    """
+    configs = configs or build_configs()
+    sweep_id = f"{trainer_kwargs.get('symbol', 'sweep')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    sweep_dir = os.path.join(output_dir, sweep_id)
+    os.makedirs(sweep_dir, exist_ok=True)
+    max_workers = max_workers or max(1, (os.cpu_count() or 1) // torch_threads)
+
+    trials = []
+    for trial_id, config in enumerate(configs):
+        trial_dir = os.path.join(sweep_dir, f"trial_{trial_id:03d}")
+        os.makedirs(trial_dir, exist_ok=True)
+        trials.append({
+            "trial_id": trial_id,
+            "config": config,
+            "dir": trial_dir,
+            "episodes_trained": 0,
+            "rungs": [],
+            "status": "running"
+        })
+
+    survivors = list(trials)
+    budget = min_episodes
+    rung = 0
+    mp_context = multiprocessing.get_context("spawn")
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        while survivors:
+            if verbose:
+                print(f"Rodada {rung}: {len(survivors)} configurações com {budget} episódios")
+
+            futures = {
+                executor.submit(_run_trial, trial, trainer_kwargs, budget, test_episodes, torch_threads): trial
+                for trial in survivors
+            }
+            for future in as_completed(futures):
+                trial = futures[future]
+                try:
+                    result = future.result()
+                    trial["episodes_trained"] = result["episodes_trained"]
+                    trial["score"] = result["score"]
+                    trial["checkpoint"] = result["checkpoint"]
+                    trial["rungs"].append({"rung": rung, **result})
+                except Exception as e:
+                    print(f"Erro no trial {trial['trial_id']}: {e}")
+                    trial["status"] = "failed"
+                    trial["error"] = str(e)
+                    trial["score"] = -math.inf
+
+            ranked = sorted((t for t in survivors if t["status"] != "failed"), key=lambda t: t["score"], reverse=True)
+            if budget >= max_episodes or len(ranked) <= 1:
+                for trial in ranked:
+                    trial["status"] = "completed"
+                break
+
+            keep = max(1, len(ranked) // eta)
+            for trial in ranked[keep:]:
+                trial["status"] = f"stopped_rung_{rung}"
+            survivors = ranked[:keep]
+            budget = min(budget * eta, max_episodes)
+            rung += 1
+
+    leaderboard = sorted(
+        ({k: v for k, v in t.items() if k != "dir"} for t in trials),
+        key=lambda t: (t["episodes_trained"], t.get("score", -math.inf)),
+        reverse=True
+    )
+    for trial in leaderboard:
+        if trial.get("score") == -math.inf:
+            trial["score"] = None
+    winner = leaderboard[0] if leaderboard and leaderboard[0]["status"] == "completed" else None
+
+    # Copiar o checkpoint vencedor (e seus parâmetros) para a pasta do sweep
+    if winner is not None:
+        best_checkpoint = os.path.join(sweep_dir, "best.pth")
+        shutil.copyfile(winner["checkpoint"], best_checkpoint)
+        params_file = winner["checkpoint"].replace(".pth", "_params.json")
+        if os.path.exists(params_file):
+            shutil.copyfile(params_file, os.path.join(sweep_dir, "best_params.json"))
+        winner = {**winner, "best_checkpoint": best_checkpoint}
+
+    result = {
+        "sweep_id": sweep_id,
+        "trainer_kwargs": trainer_kwargs,
+        "min_episodes": min_episodes,
+        "max_episodes": max_episodes,
+        "eta": eta,
+        "elapsed_seconds": time.time() - start_time,
+        "winner": winner,
+        "leaderboard": leaderboard
+    }
+    with open(os.path.join(sweep_dir, "leaderboard.json"), "w") as f:
+        json.dump(result, f, indent=4, default=str)
+
+    if verbose and winner is not None:
+        print(f"Melhor configuração: {winner['config']} | Lucro médio: {winner['score']:.2f}")
+        print(f"Leaderboard salvo em {os.path.join(sweep_dir, 'leaderboard.json')}")
+
+    return result
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    run_successive_halving(
+        trainer_kwargs={"symbol": "BTC-USD", "region": "US", "interval": "1d", "range_period": "1y"},
+        configs=build_configs(num_configs=9, seed=42),
+        min_episodes=3,
+        max_episodes=27
+    )
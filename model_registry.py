@@ -0,0 +1,230 @@
+# src/rl_agent/model_registry.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+
+REGISTRY_FILENAME = "model_registry.db"
+BUSY_TIMEOUT_SECONDS = 30    # Espera máxima por um lock de escrita do SQLite
+RANKING_METRICS = ("profit", "reward")  # Métricas com índice próprio (melhor modelo por métrica)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    name TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    region TEXT,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    params TEXT,
+    metrics TEXT,
+    episode INTEGER,
+    profit REAL,
+    reward REAL,
+    sha256 TEXT,
+    size_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS models_latest ON models (symbol, region, created_at);
+CREATE INDEX IF NOT EXISTS models_profit ON models (symbol, region, profit);
+CREATE INDEX IF NOT EXISTS models_reward ON models (symbol, region, reward);
+"""
+
+_registries = {}  # Diretório de modelos -> ModelRegistry (um por processo)
+_registries_lock = threading.Lock()
+
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Índice dos modelos salvos em um diretório (SQLite no próprio diretório de modelos).
+
+    Cada `TradingTrainer.save_model` registra o modelo (símbolo, região, data, parâmetros,
+    métricas do último episódio, hash e tamanho do arquivo) em uma única transação, depois
+    que os arquivos estão no disco; checkpoints apagados pela retenção saem do índice na
+    mesma transação. As consultas (modelo mais recente e melhor modelo por métrica de um
+    ativo) usam índices, sem listar o diretório nem abrir os arquivos de parâmetros.
+
+    O diretório só é varrido automaticamente quando o registro está vazio. Modelos copiados
+    ou apagados por fora depois disso (ex.: restauração de backup) entram no índice com
+    `reindex()`, também disponível pela linha de comando:
+    `python -m src.rl_agent.model_registry <diretório de modelos>`.
+    """
+
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.db_path = os.path.join(model_dir, REGISTRY_FILENAME)
+        os.makedirs(model_dir, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            empty = conn.execute("SELECT 1 FROM models LIMIT 1").fetchone() is None
+        if empty:
+            # Diretório com modelos salvos antes do registro: indexar uma única vez
+            self.import_directory()
+
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads (a gravação roda na thread do checkpoint_writer)
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def register(self, name, filepath, params, metrics=None, removed_paths=()):
+        """
+        Registra (ou substitui) um modelo gravado e remove do índice os arquivos apagados.
+
+        Args:
+            name: Nome do modelo (arquivo sem extensão)
+            filepath: Caminho do arquivo .pth já gravado
+            params: Parâmetros do ambiente e do agente (TradingTrainer.model_params)
+            metrics: Métricas do modelo (ex.: do último episódio de treinamento) ou None
+            removed_paths: Arquivos de outros modelos apagados pela retenção de checkpoints
+        """
+        metrics = metrics or {}
+        row = (
+            name, params.get("symbol"), params.get("region"), filepath, os.path.getmtime(filepath),
+            json.dumps(params), json.dumps(metrics), metrics.get("episode"), metrics.get("profit"),
+            metrics.get("reward"), file_sha256(filepath), os.path.getsize(filepath)
+        )
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO models (name, symbol, region, path, created_at, params, metrics, "
+                "episode, profit, reward, sha256, size_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+            for removed in removed_paths:
+                if removed.endswith(".pth"):
+                    conn.execute("DELETE FROM models WHERE path = ?", (removed,))
+
+    def remove(self, name):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM models WHERE name = ?", (name,))
+
+    def get(self, name):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM models WHERE name = ?", (name,)).fetchone()
+        return self._model_dict(row) if row else None
+
+    def latest_model(self, symbol, region=None):
+        """Modelo mais recente de um ativo (símbolo exato), ou None."""
+        models = self.list_models(symbol, region, order_by="created_at", limit=1)
+        return models[0] if models else None
+
+    def best_model(self, symbol, region=None, metric="profit"):
+        """Modelo com o maior valor de uma métrica (profit ou reward) para um ativo, ou None."""
+        models = self.list_models(symbol, region, order_by=metric, limit=1)
+        return models[0] if models else None
+
+    def list_models(self, symbol=None, region=None, order_by="created_at", limit=None, offset=0):
+        """
+        Lista os modelos registrados.
+
+        Args:
+            symbol: Filtra pelo símbolo exato (ex.: "BTC-USD" não inclui "BTC")
+            region: Filtra pela região
+            order_by: "created_at" (mais recentes primeiro) ou uma métrica de RANKING_METRICS (maiores primeiro)
+            limit: Número máximo de modelos (None: todos)
+            offset: Modelos pulados (paginação)
+
+        Returns:
+            Lista de dicionários de modelo
+        """
+        if order_by != "created_at" and order_by not in RANKING_METRICS:
+            raise ValueError(f"Ordenação desconhecida: {order_by}")
+        conditions, args = [], []
+        if symbol is not None:
+            conditions.append("symbol = ?")
+            args.append(symbol)
+        if region is not None:
+            conditions.append("region = ?")
+            args.append(region)
+        if order_by != "created_at":
+            conditions.append(f"{order_by} IS NOT NULL")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT * FROM models {where} ORDER BY {order_by} DESC LIMIT ? OFFSET ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, (*args, -1 if limit is None else limit, offset)).fetchall()
+        return [self._model_dict(row) for row in rows]
+
+    def reindex(self):
+        """
+        Sincroniza o índice com o diretório: remove os modelos cujo arquivo não existe mais
+        e indexa os arquivos .pth que ainda não estão no registro.
+
+        Returns:
+            Dicionário com o número de modelos removidos e indexados
+        """
+        with closing(self._connect()) as conn, conn:
+            missing = [row["name"] for row in conn.execute("SELECT name, path FROM models")
+                       if not os.path.exists(row["path"])]
+            conn.executemany("DELETE FROM models WHERE name = ?", [(name,) for name in missing])
+        return {"removed": len(missing), "imported": self.import_directory()}
+
+    def import_directory(self):
+        """
+        Indexa os modelos .pth do diretório que ainda não estão no registro (ex.: salvos antes dele).
+
+        Returns:
+            Número de modelos indexados
+        """
+        with closing(self._connect()) as conn:
+            known = {row["name"] for row in conn.execute("SELECT name FROM models")}
+        imported = 0
+        for filename in os.listdir(self.model_dir):
+            name = filename[:-len(".pth")]
+            if not filename.endswith(".pth") or name in known:
+                continue
+            params = {}
+            params_filepath = os.path.join(self.model_dir, f"{name}_params.json")
+            if os.path.exists(params_filepath):
+                try:
+                    with open(params_filepath, "r") as f:
+                        params = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            params.setdefault("symbol", name.split("_")[0])
+            try:
+                self.register(name, os.path.join(self.model_dir, filename), params)
+                imported += 1
+            except OSError:
+                pass
+        return imported
+
+    @staticmethod
+    def _model_dict(row):
+        return {
+            "name": row["name"],
+            "symbol": row["symbol"],
+            "region": row["region"],
+            "file": os.path.basename(row["path"]),
+            "created_at": row["created_at"],
+            "params": json.loads(row["params"]) if row["params"] else {},
+            "metrics": json.loads(row["metrics"]) if row["metrics"] else {},
+            "sha256": row["sha256"],
+            "size_bytes": row["size_bytes"]
+        }
+
+
+def get_model_registry(model_dir):
+    """Registro do diretório de modelos (uma instância por diretório e processo)."""
+    key = os.path.abspath(model_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = ModelRegistry(model_dir)
+        return registry
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m src.rl_agent.model_registry <diretório de modelos>")
+        sys.exit(1)
+    print(ModelRegistry(sys.argv[1]).reindex())
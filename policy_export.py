@@ -0,0 +1,148 @@
+# src/rl_agent/policy_export.py
+
+import json
+import os
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from src.rl_agent.dqn_agent import DQN, exported_policy_path
+
+LATENCY_ITERATIONS = 1000     # Chamadas usadas na comparação de latência
+MIN_ACTION_AGREEMENT = 0.99   # Fração mínima de ações iguais às do modelo original para aceitar a exportação
+
+
+class InferencePolicy(nn.Module):
+    """Envolve a rede para inferência: aceita um estado (1D) ou um lote de estados (2D).
+
+    As camadas quantizadas só aceitam entradas 2D; o agente chama o modelo com um único estado.
+    """
+
+    def __init__(self, policy):
+        super().__init__()
+        self.policy = policy
+
+    def forward(self, x):
+        if x.dim() == 1:
+            return self.policy(x.unsqueeze(0)).squeeze(0)
+        return self.policy(x)
+
+
+def build_inference_model(model, quantize=False):
+    """
+    Gera um modelo de inferência em TorchScript congelado (pesos como constantes, sem autograd).
+
+    Args:
+        model: Rede DQN treinada
+        quantize: Se True, aplica quantização dinâmica int8 às camadas nn.Linear
+
+    Returns:
+        ScriptModule congelado
+    """
+    model = model.cpu().eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    scripted = torch.jit.script(InferencePolicy(model).eval())
+    return torch.jit.freeze(scripted)
+
+
+def check_parity(eager_model, exported_model, states):
+    """
+    Compara as saídas do modelo exportado com as do modelo original.
+
+    Args:
+        eager_model: Rede DQN original
+        exported_model: Modelo gerado por build_inference_model
+        states: Estados de referência (N x state_size), de preferência observações reais do ambiente
+
+    Returns:
+        Dicionário com a maior diferença absoluta dos valores Q e a fração de ações iguais
+    """
+    states = torch.as_tensor(np.asarray(states, dtype=np.float32))
+    with torch.no_grad():
+        eager_q = eager_model.cpu().eval()(states)
+        exported_q = exported_model(states)
+    return {
+        "max_abs_diff": float((eager_q - exported_q).abs().max()),
+        "action_agreement": float((eager_q.argmax(dim=1) == exported_q.argmax(dim=1)).float().mean())
+    }
+
+
+def benchmark_latency(model, states, iterations=LATENCY_ITERATIONS):
+    """
+    Mede a latência de inferência (um estado por chamada, como no agente) e de um lote.
+
+    Returns:
+        Dicionário com a latência média por decisão e por lote, em microssegundos
+    """
+    states = torch.as_tensor(np.asarray(states, dtype=np.float32))
+    single = states[0]
+    with torch.no_grad():
+        model(single)  # Aquecimento
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(single)
+        single_us = (time.perf_counter() - start) / iterations * 1e6
+
+        batch_iterations = max(1, iterations // 10)
+        start = time.perf_counter()
+        for _ in range(batch_iterations):
+            model(states)
+        batch_us = (time.perf_counter() - start) / batch_iterations * 1e6
+    return {"single_us": round(single_us, 2), "batch_us": round(batch_us, 2), "batch_size": len(states)}
+
+
+def export_policy(checkpoint_path, state_size, action_size, sample_states, quantize=True,
+                  min_action_agreement=MIN_ACTION_AGREEMENT, iterations=LATENCY_ITERATIONS):
+    """
+    Exporta a rede de um checkpoint para inferência rápida em CPU.
+
+    O modelo exportado só é gravado (em `exported_policy_path(checkpoint_path)`, lido
+    automaticamente por `load_cached_policy`) se escolher as mesmas ações que o modelo
+    original em pelo menos `min_action_agreement` dos estados de referência. O relatório
+    com a paridade e a comparação de latência é salvo em `<checkpoint>_export.json`.
+
+    Args:
+        checkpoint_path: Checkpoint .pth gerado por DQNAgent.save
+        state_size: Tamanho do estado
+        action_size: Número de ações
+        sample_states: Estados de referência (N x state_size) para paridade e latência
+        quantize: Se True, quantiza as camadas lineares para int8 (quantização dinâmica)
+        min_action_agreement: Fração mínima de ações iguais para aceitar a exportação
+        iterations: Chamadas usadas na medição de latência
+
+    Returns:
+        Relatório da exportação
+    """
+    checkpoint = torch.load(checkpoint_path, map_location=torch.device('cpu'))
+    eager_model = DQN(int(state_size), int(action_size))
+    eager_model.load_state_dict(checkpoint['model_state_dict'])
+    eager_model.eval()
+
+    exported_model = build_inference_model(eager_model, quantize=quantize)
+    parity = check_parity(eager_model, exported_model, sample_states)
+    latency = {
+        "eager": benchmark_latency(eager_model, sample_states, iterations),
+        "exported": benchmark_latency(exported_model, sample_states, iterations)
+    }
+    passed = parity["action_agreement"] >= min_action_agreement
+
+    exported_path = exported_policy_path(checkpoint_path)
+    if passed:
+        tmp_path = f"{exported_path}.tmp"
+        torch.jit.save(exported_model, tmp_path)
+        os.replace(tmp_path, exported_path)
+
+    report = {
+        "checkpoint": checkpoint_path,
+        "exported_path": exported_path if passed else None,
+        "quantized": quantize,
+        "passed": passed,
+        "parity": parity,
+        "latency": latency,
+        "speedup": round(latency["eager"]["single_us"] / latency["exported"]["single_us"], 2),
+        "size_bytes": os.path.getsize(exported_path) if passed else None
+    }
+    with open(f"{os.path.splitext(checkpoint_path)[0]}_export.json", "w") as f:
+        json.dump(report, f, indent=4)
+    return report
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+project_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+ARTIFACT_ROOT = os.path.join(project_root_dir, "artifacts")
+MAX_ARTIFACT_BYTES = 512 * 1024 * 1024       # 512 MB somando execuções e objetos
+MAX_ARTIFACT_AGE_SECONDS = 7 * 24 * 3600     # Artefatos sem uso há mais de 7 dias são removidos
+CLEANUP_INTERVAL_SECONDS = 60                # Intervalo mínimo entre duas limpezas automáticas
+
+
+class ArtifactStore:
+    """Armazena os arquivos gerados pelos backtests sem que execuções concorrentes se sobrescrevam.
+
+    Cada execução recebe um diretório próprio (`runs/<run_id>`) para escrever o que quiser; os
+    arquivos finais (gráficos, modelos) são movidos para `objects/` com o nome igual ao hash
+    do conteúdo, então duas execuções nunca disputam o mesmo caminho e arquivos idênticos são
+    guardados uma única vez. A data de modificação marca o último uso e a limpeza remove os
+    artefatos mais antigos por idade e depois por tamanho total (LRU).
+    """
+
+    def __init__(self, root=ARTIFACT_ROOT, max_bytes=MAX_ARTIFACT_BYTES, max_age_seconds=MAX_ARTIFACT_AGE_SECONDS):
+        self.root = root
+        self.runs_dir = os.path.join(root, "runs")
+        self.objects_dir = os.path.join(root, "objects")
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._last_cleanup = 0
+
+    def create_run(self, prefix="run"):
+        """Cria um diretório exclusivo para uma execução.
+
+        Returns:
+            tuple: (run_id, caminho do diretório)
+        """
+        os.makedirs(self.runs_dir, exist_ok=True)
+        run_id = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        run_dir = os.path.join(self.runs_dir, run_id)
+        os.makedirs(run_dir, exist_ok=False)
+        return run_id, run_dir
+
+    def run_dir(self, run_id):
+        """Retorna o diretório de uma execução (ou None se já foi removido)."""
+        run_dir = os.path.join(self.runs_dir, os.path.basename(run_id))
+        return run_dir if os.path.isdir(run_dir) else None
+
+    def store_file(self, filepath):
+        """Move um arquivo para o armazenamento endereçado por conteúdo.
+
+        Args:
+            filepath (str): Arquivo gerado (normalmente dentro do diretório da execução).
+
+        Returns:
+            dict: {"sha256", "path", "size"} do objeto armazenado.
+        """
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        extension = os.path.splitext(filepath)[1]
+        object_dir = os.path.join(self.objects_dir, sha256[:2])
+        os.makedirs(object_dir, exist_ok=True)
+        object_path = os.path.join(object_dir, f"{sha256}{extension}")
+
+        if os.path.exists(object_path):
+            # Mesmo conteúdo já armazenado: descarta a cópia e marca o objeto como usado
+            os.remove(filepath)
+            self.touch(object_path)
+        else:
+            os.replace(filepath, object_path)
+        return {"sha256": sha256, "path": object_path, "size": os.path.getsize(object_path)}
+
+    def write_manifest(self, run_id, manifest):
+        """Grava o manifesto (JSON) da execução com os artefatos e metadados dela."""
+        run_dir = self.run_dir(run_id)
+        if run_dir is None:
+            return None
+        manifest_path = os.path.join(run_dir, "manifest.json")
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4, default=str)
+        os.replace(tmp_path, manifest_path)
+        return manifest_path
+
+    def touch(self, path):
+        """Marca um artefato como usado agora (base do LRU)."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """Lista (caminho, tamanho, último uso, é_diretório) de cada execução e objeto."""
+        entries = []
+        if os.path.isdir(self.runs_dir):
+            for name in os.listdir(self.runs_dir):
+                run_dir = os.path.join(self.runs_dir, name)
+                size = 0
+                last_used = os.path.getmtime(run_dir)
+                for dirpath, _, filenames in os.walk(run_dir):
+                    for filename in filenames:
+                        file_stat = os.stat(os.path.join(dirpath, filename))
+                        size += file_stat.st_size
+                        last_used = max(last_used, file_stat.st_mtime)
+                entries.append((run_dir, size, last_used, True))
+        if os.path.isdir(self.objects_dir):
+            for dirpath, _, filenames in os.walk(self.objects_dir):
+                for filename in filenames:
+                    object_path = os.path.join(dirpath, filename)
+                    file_stat = os.stat(object_path)
+                    entries.append((object_path, file_stat.st_size, file_stat.st_mtime, False))
+        return entries
+
+    def cleanup(self, force=False):
+        """Remove artefatos antigos (idade) e, se ainda passar do limite, os menos usados (tamanho).
+
+        Args:
+            force (bool): Se False, não faz nada se a última limpeza foi há menos de
+                          CLEANUP_INTERVAL_SECONDS.
+
+        Returns:
+            int: Número de execuções/objetos removidos.
+        """
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_cleanup < CLEANUP_INTERVAL_SECONDS:
+                return 0
+            self._last_cleanup = now
+
+            try:
+                entries = sorted(self._entries(), key=lambda entry: entry[2])
+            except OSError as e:
+                # Outro processo pode ter removido algo durante a varredura; tenta na próxima
+                print(f"Erro ao varrer artefatos: {e}")
+                return 0
+
+            total_bytes = sum(entry[1] for entry in entries)
+            removed = 0
+            for path, size, last_used, is_dir in entries:
+                expired = now - last_used > self.max_age_seconds
+                if not expired and total_bytes <= self.max_bytes:
+                    break
+                try:
+                    if is_dir:
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                    total_bytes -= size
+                    removed += 1
+                except OSError as e:
+                    print(f"Erro ao remover artefato {path}: {e}")
+            if removed:
+                print(f"Limpeza de artefatos: {removed} removidos, {total_bytes / 1024 / 1024:.1f} MB em uso.")
+            return removed
+
+
+# Instância global do armazenamento
+artifact_store = ArtifactStore()
@@ -11,8 +11,12 @@ sys.path.insert(0, project_root_dir)
 
 try:
     # Now imports starting from 'src' should work when running this script directly
+    from src.backtesting_logic.artifact_store import artifact_store
+    from src.backtesting_logic.result_cache import backtest_cache
     from src.backtesting_logic.data_loader import load_data_from_json
     from src.backtesting_logic.dqn_strategy import DQNStrategy
+    from src.backtesting_logic.monte_carlo import run_monte_carlo, DEFAULT_SIMULATIONS
+    from src.services.event_bus import event_bus
 except ImportError as e:
     print(f"Erro ao importar módulos de backtesting_logic: {e}")
     # Define dummy functions/classes if import fails
@@ -21,28 +25,94 @@ except ImportError as e:
         return None
     class DQNStrategy:
         def __init__(self, *args, **kwargs): pass
+    DEFAULT_SIMULATIONS = 5000
+    event_bus = None
 
 # Definir o diretório de trabalho e o caminho do arquivo de dados
 WORK_DIR = project_root_dir # Use the calculated project root
 DATA_FILE = os.path.join(WORK_DIR, "btc_usd_data.json")
-OUTPUT_HTML_FILENAME = "dqn_strategy_backtest.html"
-# Ensure output path is within src/static for Flask access
-OUTPUT_HTML_PATH = os.path.join(WORK_DIR, "src", "static", OUTPUT_HTML_FILENAME)
+PROGRESS_EVENTS_PER_RUN = 100 # Eventos de progresso (por barra) publicados por backtest
 
-def run_backtest_simulation(data_filepath=DATA_FILE, output_html_path=OUTPUT_HTML_PATH, strategy_class=DQNStrategy):
-    """Carrega os dados, executa um backtest com a estratégia especificada e retorna estatísticas/caminho do gráfico.
+def with_progress_events(strategy_class, topic, total_bars, events_per_run=PROGRESS_EVENTS_PER_RUN):
+    """Subclasse da estratégia que publica o avanço das barras no `event_bus`.
+
+    O evento "progress" sai a cada `total_bars // events_per_run` barras (e na última), com a
+    barra atual e o patrimônio; o `next` original da estratégia roda sem alteração.
+
+    Args:
+        strategy_class (Type[Strategy]): Estratégia a ser executada.
+        topic (str): Tópico dos eventos (ex.: "backtest:<id>").
+        total_bars (int): Número de barras dos dados.
+        events_per_run (int): Número aproximado de eventos por execução.
+
+    Returns:
+        Type[Strategy]: Subclasse com o mesmo nome da estratégia.
+    """
+    every = max(1, total_bars // events_per_run)
+
+    def next(self):
+        strategy_class.next(self)
+        bar = len(self.data)
+        if bar % every == 0 or bar == total_bars:
+            event_bus.publish(topic, "progress", {
+                "bar": bar,
+                "bars": total_bars,
+                "fraction": round(bar / total_bars, 4),
+                "equity": float(self.equity)
+            })
+
+    return type(strategy_class.__name__, (strategy_class,), {"next": next, "__module__": strategy_class.__module__})
+
+def serialize_stats(stats):
+    """Converte as estatísticas do Backtesting.py em um dicionário serializável em JSON.
+
+    Args:
+        stats (pd.Series | dict): Estatísticas retornadas por `bt.run()`.
+
+    Returns:
+        dict: Estatísticas sem os objetos internos (`_strategy`, `_equity_curve`, `_trades`).
+    """
+    stats_serializable = dict(stats)
+    stats_serializable.pop("_strategy", None)
+    stats_serializable.pop("_equity_curve", None)
+    stats_serializable.pop("_trades", None)
+
+    # Converter tipos numpy/pandas para tipos Python nativos
+    for key, value in stats_serializable.items():
+        if hasattr(value, 'item'): # Numpy types
+            value = value.item()
+            stats_serializable[key] = value
+        if isinstance(value, pd.Timestamp):
+             stats_serializable[key] = value.isoformat()
+        # Add handling for Timedelta
+        elif isinstance(value, pd.Timedelta):
+             stats_serializable[key] = str(value) # Convert Timedelta to string
+        # Use np.isfinite instead of pd.isfinite
+        elif isinstance(value, float) and (pd.isna(value) or not np.isfinite(value)):
+             stats_serializable[key] = None # Convert NaN/inf to None
+    return stats_serializable
+
+def run_backtest_simulation(data_filepath=DATA_FILE, strategy_class=DQNStrategy, keep_result=True, progress_id=None):
+    """Carrega os dados, executa um backtest com a estratégia especificada e retorna as estatísticas.
+
+    O gráfico não é gerado aqui: o resultado fica no `backtest_cache` e o HTML só é
+    renderizado quando `plot_path` (ou `/static/dqn_strategy_backtest.html`) é requisitado.
+    Cada execução tem um diretório próprio no `artifact_store` (o modelo salvo pela estratégia
+    vai para lá), então vários backtests podem rodar ao mesmo tempo sem conflito de arquivos.
 
     Args:
         data_filepath (str): Caminho para o arquivo de dados JSON.
-        output_html_path (str): Caminho completo para salvar o arquivo HTML do gráfico.
         strategy_class (Type[Strategy]): A classe da estratégia a ser usada no backtest.
+        keep_result (bool): Se False, o resultado não é guardado no cache (ex.: execução em
+                            outro processo), e não há gráfico.
+        progress_id (str): Identificador escolhido pelo cliente para acompanhar o progresso
+                           (SSE) em "backtest:<progress_id>"; sem ele, o tópico usa o run_id.
 
     Returns:
-        dict: Um dicionário contendo estatísticas e o caminho relativo do gráfico em caso de sucesso,
-              ou uma mensagem de erro em caso de falha.
+        dict: Um dicionário contendo estatísticas, o identificador do resultado e o caminho do
+              gráfico sob demanda em caso de sucesso, ou uma mensagem de erro em caso de falha.
     """
-    plot_path_relative = None # Initialize plot path as None
-    plot_error_message = None # Initialize plot error message
+    topic = f"backtest:{progress_id}" if progress_id else None
     try:
         print(f"Carregando dados de {data_filepath}...")
         data = load_data_from_json(data_filepath)
@@ -57,77 +127,125 @@ def run_backtest_simulation(data_filepath=DATA_FILE, output_html_path=OUTPUT_HTM
              return {"error": f"Dados carregados não contêm as colunas OHLCV necessárias: {required_cols}", "success": False}
 
         print(f"Dados carregados. Iniciando backtest com {strategy_class.__name__}...")
-        # Certificar que o diretório de saída existe
-        output_dir = os.path.dirname(output_html_path)
-        os.makedirs(output_dir, exist_ok=True)
+
+        # Diretório exclusivo desta execução
+        run_id, run_dir = artifact_store.create_run(prefix=strategy_class.__name__)
+        strategy_params = {}
+        if hasattr(strategy_class, "model_save_path"):
+            # O modelo treinado durante o backtest é salvo no diretório da execução
+            strategy_params["model_save_path"] = os.path.join(run_dir, "model.pth")
+
+        # Progresso ao vivo (barra a barra) para quem assina "backtest" ou "backtest:<id>"
+        topic = f"backtest:{progress_id or run_id}"
+        run_strategy = strategy_class
+        if event_bus is not None:
+            run_strategy = with_progress_events(strategy_class, topic, len(data))
+            event_bus.publish(topic, "started", {"run_id": run_id, "strategy": strategy_class.__name__, "bars": len(data)})
 
         # Instanciar o Backtest
-        bt = Backtest(data, strategy_class, cash=10000, commission=.002)
+        bt = Backtest(data, run_strategy, cash=10000, commission=.002)
 
         # Executar o backtest
-        stats = bt.run()
+        stats = bt.run(**strategy_params)
 
         print("\nEstatísticas do Backtest:")
         print(stats)
 
-        # Salvar o gráfico interativo - Wrap in try-except and disable superimpose
-        try:
-            print(f"Salvando gráfico do backtest em {output_html_path}...")
-            # Disable superimpose to avoid the upsampling error
-            bt.plot(filename=output_html_path, open_browser=False, superimpose=False)
-            print("Gráfico salvo com sucesso.")
-            plot_path_relative = f"/static/{OUTPUT_HTML_FILENAME}" # Set relative path if plot succeeds
-        except ValueError as ve:
-            # Catch potential plotting errors (though superimpose=False should help)
-            plot_error_message = f"Erro ao gerar gráfico: {ve}. As estatísticas ainda estão disponíveis."
-            print(f"\n{plot_error_message}\n")
-        except Exception as plot_e:
-            # Catch other potential plotting errors
-            plot_error_message = f"Erro inesperado ao gerar gráfico: {plot_e}. As estatísticas ainda estão disponíveis."
-            print(f"\n{plot_error_message}\n")
-
         # Preparar o resultado para retornar (converter o que não for serializável)
         strategy_instance = stats._strategy
         episode_rewards = getattr(strategy_instance, 'episode_rewards', [])
 
-        stats_serializable = stats.to_dict()
-        stats_serializable.pop("_strategy", None)
-        stats_serializable.pop("_equity_curve", None)
-        stats_serializable.pop("_trades", None)
-
-        # Converter tipos numpy/pandas para tipos Python nativos
-        for key, value in stats_serializable.items():
-            if hasattr(value, 'item'): # Numpy types
-                stats_serializable[key] = value.item()
-            elif isinstance(value, pd.Timestamp):
-                 stats_serializable[key] = value.isoformat()
-            # Add handling for Timedelta
-            elif isinstance(value, pd.Timedelta):
-                 stats_serializable[key] = str(value) # Convert Timedelta to string
-            # Use np.isfinite instead of pd.isfinite
-            elif isinstance(value, float) and (pd.isna(value) or not np.isfinite(value)):
-                 stats_serializable[key] = None # Convert NaN/inf to None
+        # Mover os arquivos gerados para o armazenamento endereçado por conteúdo
+        artifacts = {}
+        model_file = strategy_params.get("model_save_path")
+        writer = getattr(strategy_instance, "checkpoint_writer", None)
+        if model_file and writer is not None:
+            writer.flush(model_file)  # O modelo pode ainda estar sendo gravado em segundo plano
+        if model_file and os.path.exists(model_file):
+            artifacts["model"] = artifact_store.store_file(model_file)
 
         result_dict = {
             "success": True,
             "message": f"Backtest com {strategy_class.__name__} concluído.",
-            "stats": stats_serializable,
-            "plot_path": plot_path_relative, # Use the variable which might be None
+            "run_id": run_id,
+            "stats": serialize_stats(stats),
+            "plot_path": None,
+            "artifacts": artifacts,
             "episode_rewards": episode_rewards
         }
-        if plot_error_message:
-            result_dict["plot_warning"] = plot_error_message # Add warning if plot failed
 
+        if keep_result:
+            # Guardar o resultado (curva de patrimônio e trades inclusos) para gerar o gráfico depois
+            backtest_cache.add(run_id, bt, stats, strategy_name=strategy_class.__name__, data_filepath=data_filepath)
+            result_dict["plot_path"] = f"/api/backtest_plot/{run_id}" # Gerado sob demanda no primeiro acesso
+
+        artifact_store.write_manifest(run_id, {
+            "run_id": run_id,
+            "strategy": strategy_class.__name__,
+            "data_filepath": data_filepath,
+            "stats": result_dict["stats"],
+            "artifacts": artifacts
+        })
+        artifact_store.cleanup()
+
+        if event_bus is not None:
+            event_bus.publish(topic, "finished", {"run_id": run_id, "success": True, "stats": result_dict["stats"]})
         return result_dict
 
     except Exception as e:
         print(f"Erro durante o backtest: {e}")
         print(traceback.format_exc())
+        if event_bus is not None and topic is not None:
+            event_bus.publish(topic, "finished", {"success": False, "error": str(e)})
         return {"error": f"Erro durante a execução do backtest: {str(e)}", "success": False}
 
+def run_backtest_monte_carlo(run_id, n_simulations=DEFAULT_SIMULATIONS, method="bootstrap", seed=None):
+    """Executa a análise de robustez (Monte Carlo) sobre os trades de um backtest já executado.
+
+    Usa o resultado guardado no `backtest_cache`, sem executar a estratégia de novo, e
+    guarda a análise junto do resultado para chamadas repetidas com os mesmos parâmetros.
+    Sem `seed`, uma semente nova é sorteada a cada chamada e devolvida na resposta (repetir
+    a chamada com ela reproduz a análise).
+
+    Args:
+        run_id (str): Identificador retornado por `run_backtest_simulation`.
+        n_simulations (int): Número de reamostragens.
+        method (str): "bootstrap" ou "permutation".
+        seed (int): Semente para resultados reprodutíveis (None: sorteada).
+
+    Returns:
+        dict: Percentis de retorno e drawdown em caso de sucesso, ou uma mensagem de erro.
+    """
+    entry = backtest_cache.get(run_id)
+    if entry is None:
+        return {"error": f"Backtest {run_id} não encontrado no cache. Execute o backtest novamente.", "success": False}
+
+    if seed is None:
+        seed = int(np.random.default_rng().integers(2**32))
+    cache_key = ("monte_carlo", method, int(n_simulations), seed)
+    analysis = backtest_cache.get_analysis(run_id, cache_key)
+    if analysis is None:
+        try:
+            initial_cash = float(entry["equity_curve"]["Equity"].iloc[0])
+            analysis = run_monte_carlo(entry["trades"], n_simulations=int(n_simulations),
+                                       method=method, initial_cash=initial_cash, seed=seed)
+        except ValueError as ve:
+            return {"error": str(ve), "success": False}
+        except Exception as e:
+            print(f"Erro durante a análise de Monte Carlo: {e}")
+            print(traceback.format_exc())
+            return {"error": f"Erro durante a análise de Monte Carlo: {str(e)}", "success": False}
+        backtest_cache.add_analysis(run_id, cache_key, analysis)
+
+    return {"success": True, "run_id": run_id, "seed": seed, "monte_carlo": analysis}
+
 # Bloco principal para teste direto do script
 if __name__ == "__main__":
     results = run_backtest_simulation()
+    if results.get("success"):
+        # Ao rodar pelo terminal, gerar o gráfico imediatamente
+        plot_file, plot_error = backtest_cache.render_plot(results["run_id"])
+        print(f"Gráfico: {plot_file or plot_error}")
     print("\nResultado da simulação:")
     import json
     print(json.dumps(results, indent=2))
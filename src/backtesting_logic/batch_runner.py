@@ -0,0 +1,118 @@
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+project_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+sys.path.insert(0, project_root_dir)
+
+from src.backtesting_logic.backtest_runner import run_backtest_simulation
+
+# Mesmo diretório e sufixo usados por fetch_multi_asset_data.py
+ASSET_DATA_DIR = "/home/ubuntu/asset_data"
+ASSET_FILE_SUFFIX = "_data.json"
+
+# Colunas das estatísticas incluídas na tabela resumo
+SUMMARY_COLUMNS = [
+    "Return [%]",
+    "Buy & Hold Return [%]",
+    "Max. Drawdown [%]",
+    "Sharpe Ratio",
+    "# Trades",
+    "Win Rate [%]",
+    "Equity Final [$]"
+]
+
+
+def list_asset_files(data_dir=ASSET_DATA_DIR):
+    """Lista os arquivos de dados gerados por fetch_multi_asset_data.py."""
+    return sorted(glob.glob(os.path.join(data_dir, f"*{ASSET_FILE_SUFFIX}")))
+
+
+def asset_name_from_path(data_filepath):
+    """Extrai o símbolo do nome do arquivo (ex.: '.../PETR4.SA_data.json' -> 'PETR4.SA')."""
+    filename = os.path.basename(data_filepath)
+    if filename.endswith(ASSET_FILE_SUFFIX):
+        return filename[:-len(ASSET_FILE_SUFFIX)]
+    return os.path.splitext(filename)[0]
+
+
+def _run_asset_backtest(data_filepath, strategy_class):
+    """Executa o backtest de um ativo dentro de um processo do pool."""
+    start_time = time.time()
+    result = run_backtest_simulation(data_filepath=data_filepath, strategy_class=strategy_class, keep_result=False)
+    result["asset"] = asset_name_from_path(data_filepath)
+    result["data_filepath"] = data_filepath
+    result["elapsed_seconds"] = time.time() - start_time
+    return result
+
+
+def iter_batch_backtests(data_filepaths, strategy_class, max_workers=None):
+    """Executa o backtest de vários ativos em paralelo, entregando cada resultado ao terminar.
+
+    Args:
+        data_filepaths (list): Arquivos de dados JSON (um por ativo).
+        strategy_class (Type[Strategy]): Estratégia usada em todos os ativos.
+        max_workers (int): Número de processos (padrão: um por ativo, limitado aos núcleos).
+
+    Yields:
+        dict: Resultado de `run_backtest_simulation` com 'asset' e 'elapsed_seconds', na ordem de término.
+    """
+    if not data_filepaths:
+        return
+    workers = min(max_workers or os.cpu_count() or 1, len(data_filepaths))
+    # "spawn" evita herdar threads do Flask/torch do processo pai
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        futures = {executor.submit(_run_asset_backtest, path, strategy_class): path for path in data_filepaths}
+        for future in as_completed(futures):
+            data_filepath = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {
+                    "success": False,
+                    "error": f"Erro no processo de backtest: {str(e)}",
+                    "asset": asset_name_from_path(data_filepath),
+                    "data_filepath": data_filepath
+                }
+
+
+def summarize_batch(results):
+    """Monta a tabela resumo (uma linha por ativo), ordenada pelo retorno.
+
+    Args:
+        results (list): Resultados entregues por `iter_batch_backtests`.
+
+    Returns:
+        list: Linhas com 'asset', as colunas de SUMMARY_COLUMNS e 'error' quando houver falha.
+    """
+    rows = []
+    for result in results:
+        row = {"asset": result.get("asset")}
+        if result.get("success"):
+            stats = result.get("stats", {})
+            row.update({column: stats.get(column) for column in SUMMARY_COLUMNS})
+        else:
+            row.update({column: None for column in SUMMARY_COLUMNS})
+            row["error"] = result.get("error")
+        rows.append(row)
+
+    def sort_key(row):
+        value = row.get("Return [%]")
+        return (value is None, -(value or 0))
+    return sorted(rows, key=sort_key)
+
+
+def run_batch_backtests(data_filepaths, strategy_class, max_workers=None):
+    """Versão não-streaming: executa todos os ativos e retorna os resultados e o resumo."""
+    start_time = time.time()
+    results = list(iter_batch_backtests(data_filepaths, strategy_class, max_workers=max_workers))
+    return {
+        "success": True,
+        "results": results,
+        "summary": summarize_batch(results),
+        "elapsed_seconds": time.time() - start_time
+    }
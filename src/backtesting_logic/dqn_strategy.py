@@ -19,12 +19,14 @@ sys.path.insert(0, project_root) # Add project root to path
 try:
     # Assuming dqn_agent.py might be in src/services after restructuring
     # Let's try importing directly first, assuming it's accessible
-    from dqn_agent import DQNAgent # Check if dqn_agent.py is in the root or accessible path
+    from dqn_agent import DQNAgent, load_cached_policy # Check if dqn_agent.py is in the root or accessible path
+    from checkpoint_writer import checkpoint_writer
 except ImportError:
     print("Failed to import DQNAgent directly. Trying from src/services...")
     try:
         # Adjust based on actual final location after restructuring
-        from src.services.dqn_agent import DQNAgent 
+        from src.services.dqn_agent import DQNAgent, load_cached_policy
+        from src.services.checkpoint_writer import checkpoint_writer
     except ImportError:
          print("ERROR: Could not find DQNAgent. Ensure dqn_agent.py is in the correct path (e.g., src/services) and accessible.")
          # Define a dummy class to avoid crashing if import fails
@@ -35,6 +37,8 @@ except ImportError:
              def replay(self, *args, **kwargs): pass
              def save(self, *args, **kwargs): pass
              def load(self, *args, **kwargs): pass
+         load_cached_policy = None
+         checkpoint_writer = None
 
 class DQNStrategy(Strategy):
     """ A trading strategy using a Deep Q-Network agent. """
@@ -51,17 +55,10 @@ class DQNStrategy(Strategy):
     batch_size = 32
     target_update = 10      # Update target network every 10 steps
     model_save_path = os.path.join(project_root, "viktor_ia_dqn_model_bt.pth") # Save in project root
+    model_load_path = None  # Checkpoint to load when load_model is True (defaults to model_save_path)
+    checkpoint_writer = checkpoint_writer  # Writes the final save in the background (None = synchronous)
     load_model = False      # Set to True to load a pre-trained model
     train_mode = True       # Set to False for evaluation only (no exploration, no training)
-    
-    # --- Internal State --- 
-    agent = None
-    last_state = None
-    last_action = None
-    last_portfolio_value = None
-    episode_rewards = []
-    current_episode_reward = 0
-    step_count = 0
 
     def init(self):
         print(f"Initializing DQNStrategy... State window: {self.state_window_size}, Actions: {self.action_size}")
@@ -69,6 +66,15 @@ class DQNStrategy(Strategy):
         if len(self.data.Close) <= self.state_window_size:
             raise ValueError("Data length must be greater than state_window_size")
 
+        # --- Internal State ---
+        # Kept per instance (not as class attributes) so repeated and parallel runs don't share it
+        self.last_state = None
+        self.last_action = None
+        self.last_portfolio_value = None
+        self.episode_rewards = []
+        self.current_episode_reward = 0
+        self.step_count = 0
+
         # Initialize the DQN agent
         self.agent = DQNAgent(
             state_size=self.state_window_size,
@@ -84,17 +90,25 @@ class DQNStrategy(Strategy):
         )
 
         # Load pre-trained model if specified
-        if self.load_model and os.path.exists(self.model_save_path):
+        model_load_path = self.model_load_path or self.model_save_path
+        if self.load_model and not self.train_mode and load_cached_policy is not None and os.path.exists(model_load_path):
+            # Evaluation only: share one read-only network per checkpoint across the whole process
+            try:
+                self.agent.use_shared_model(load_cached_policy(model_load_path, self.state_window_size, self.action_size))
+                print(f"Using shared evaluation model from {model_load_path}")
+            except Exception as e:
+                print(f"Error loading model: {e}. Starting with a new model.")
+        elif self.load_model and os.path.exists(model_load_path):
             try:
-                print(f"Loading pre-trained model from {self.model_save_path}")
-                self.agent.load(self.model_save_path)
+                print(f"Loading pre-trained model from {model_load_path}")
+                self.agent.load(model_load_path)
                 if not self.train_mode:
                     self.agent.epsilon = 0.0 # Ensure no exploration in eval mode
                 print("Model loaded successfully.")
             except Exception as e:
                 print(f"Error loading model: {e}. Starting with a new model.")
         elif self.load_model:
-            print(f"Model file not found at {self.model_save_path}. Starting with a new model.")
+            print(f"Model file not found at {model_load_path}. Starting with a new model.")
 
         # Initial portfolio value
         self.last_portfolio_value = self.equity # self.equity is provided by Backtesting.py
@@ -163,7 +177,7 @@ class DQNStrategy(Strategy):
                 # Optionally save the model at the end
                 if self.train_mode:
                     try:
-                        self.agent.save(self.model_save_path)
+                        self.agent.save(self.model_save_path, writer=self.checkpoint_writer)
                         print(f"Model saved to {self.model_save_path}")
                     except Exception as e:
                         print(f"Error saving model: {e}")
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIMULATIONS = 5000
+CHUNK_SIZE = 5000            # Reamostragens por bloco (limita a memória de cada matriz)
+PARALLEL_THRESHOLD = 20000   # A partir daqui os blocos são distribuídos entre processos
+PERCENTILES = (5, 25, 50, 75, 95)
+METHODS = ("bootstrap", "permutation")
+
+
+def _simulate_chunk(trade_returns, n_simulations, method, seed):
+    """Gera `n_simulations` caminhos de patrimônio a partir dos retornos dos trades.
+
+    Args:
+        trade_returns (np.ndarray): Retorno fracionário de cada trade, na ordem original.
+        n_simulations (int): Número de reamostragens deste bloco.
+        method (str): "bootstrap" (sorteio com reposição) ou "permutation" (embaralha a ordem).
+        seed: Semente (ou SeedSequence) do gerador deste bloco.
+
+    Returns:
+        tuple: (retorno final de cada caminho, drawdown máximo de cada caminho)
+    """
+    rng = np.random.default_rng(seed)
+    n_trades = len(trade_returns)
+    if method == "bootstrap":
+        idx = rng.integers(0, n_trades, size=(n_simulations, n_trades))
+    else:
+        idx = rng.permuted(np.tile(np.arange(n_trades), (n_simulations, 1)), axis=1)
+
+    paths = np.cumprod(1 + trade_returns[idx], axis=1)
+    # O pico inclui o capital inicial (1.0), então uma perda no primeiro trade já conta como drawdown
+    peaks = np.maximum(np.maximum.accumulate(paths, axis=1), 1.0)
+    max_drawdown = (1 - paths / peaks).max(axis=1)
+    return paths[:, -1] - 1, max_drawdown
+
+
+def _percentiles(values):
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def run_monte_carlo(trades, n_simulations=DEFAULT_SIMULATIONS, method="bootstrap",
+                    initial_cash=10000, seed=None, max_workers=None):
+    """Análise de robustez por Monte Carlo sobre a lista de trades de um backtest.
+
+    Com "permutation" o retorno final é sempre o mesmo (só a ordem muda), então a
+    informação útil está na distribuição do drawdown.
+
+    Args:
+        trades (pd.DataFrame | array-like): `stats._trades` (usa a coluna 'ReturnPct') ou os retornos.
+        n_simulations (int): Número total de reamostragens.
+        method (str): "bootstrap" ou "permutation".
+        initial_cash (float): Capital inicial, usado para o patrimônio final.
+        seed (int): Semente para resultados reprodutíveis.
+        max_workers (int): Processos usados quando `n_simulations` passa de PARALLEL_THRESHOLD.
+
+    Returns:
+        dict: Percentis de retorno, drawdown máximo e patrimônio final.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método inválido: {method}. Use um de {METHODS}.")
+    if n_simulations < 1:
+        raise ValueError(f"n_simulations deve ser pelo menos 1 (recebido: {n_simulations}).")
+    if isinstance(trades, pd.DataFrame):
+        trades = trades["ReturnPct"]
+    trade_returns = np.asarray(trades, dtype=float)
+    trade_returns = trade_returns[np.isfinite(trade_returns)]
+    if len(trade_returns) == 0:
+        raise ValueError("O backtest não possui trades fechados para reamostrar.")
+
+    chunk_sizes = [CHUNK_SIZE] * (n_simulations // CHUNK_SIZE)
+    if n_simulations % CHUNK_SIZE:
+        chunk_sizes.append(n_simulations % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if n_simulations >= PARALLEL_THRESHOLD and len(chunk_sizes) > 1:
+        workers = min(max_workers or os.cpu_count() or 1, len(chunk_sizes))
+        # "spawn": chamado de threads do servidor (com torch carregado), onde fork pode travar os filhos
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            chunks = list(executor.map(_simulate_chunk, [trade_returns] * len(chunk_sizes),
+                                       chunk_sizes, [method] * len(chunk_sizes), seeds))
+    else:
+        chunks = [_simulate_chunk(trade_returns, size, method, s) for size, s in zip(chunk_sizes, seeds)]
+
+    final_returns = np.concatenate([c[0] for c in chunks])
+    max_drawdowns = np.concatenate([c[1] for c in chunks])
+
+    # Caminho original (ordem real dos trades) para comparação
+    original_path = np.cumprod(1 + trade_returns)
+    original_return = original_path[-1] - 1
+    original_drawdown = float((1 - original_path / np.maximum(np.maximum.accumulate(original_path), 1.0)).max())
+
+    return {
+        "method": method,
+        "n_simulations": int(n_simulations),
+        "n_trades": int(len(trade_returns)),
+        "return_pct_percentiles": _percentiles(final_returns * 100),
+        "max_drawdown_pct_percentiles": _percentiles(max_drawdowns * 100),
+        "final_equity_percentiles": _percentiles(initial_cash * (1 + final_returns)),
+        "probability_of_loss": float((final_returns < 0).mean()),
+        "original": {
+            "return_pct": float(original_return * 100),
+            "max_drawdown_pct": original_drawdown * 100
+        }
+    }
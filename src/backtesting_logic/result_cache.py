@@ -0,0 +1,130 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from src.backtesting_logic.artifact_store import artifact_store
+
+MAX_CACHED_RESULTS = 32 # Número máximo de backtests mantidos em memória
+
+
+class BacktestResultCache:
+    """Cache limitado (LRU) de resultados de backtest e dos gráficos gerados a partir deles.
+
+    O backtest guarda apenas o objeto `Backtest` e as estatísticas (que já contêm a curva de
+    patrimônio e a lista de trades). O HTML do bokeh só é gerado na primeira vez que alguém
+    pede o gráfico e é guardado no `artifact_store`, que cuida da limpeza por idade e tamanho.
+    """
+
+    def __init__(self, max_results=MAX_CACHED_RESULTS, store=artifact_store):
+        self.max_results = max_results
+        self.store = store
+        self._results = OrderedDict() # run_id -> entrada do backtest
+        self._plots = {}              # run_id -> caminho do HTML gerado (objeto no artifact_store)
+        self._lock = threading.Lock()
+        self._render_locks = {}       # run_id -> lock (evita gerar o mesmo gráfico duas vezes)
+
+    def add(self, run_id, bt, stats, strategy_name=None, data_filepath=None):
+        """Registra o resultado de um backtest.
+
+        Args:
+            run_id (str): Identificador da execução (o mesmo do diretório no `artifact_store`).
+            bt (Backtest): Instância usada para executar o backtest (necessária para o gráfico).
+            stats (pd.Series): Resultado de `bt.run()`, incluindo `_equity_curve` e `_trades`.
+            strategy_name (str): Nome da estratégia, apenas para referência.
+            data_filepath (str): Arquivo de dados usado no backtest.
+
+        Returns:
+            str: O próprio `run_id`.
+        """
+        entry = {
+            "run_id": run_id,
+            "bt": bt,
+            "stats": stats,
+            "equity_curve": stats.get("_equity_curve"),
+            "trades": stats.get("_trades"),
+            "strategy_name": strategy_name,
+            "data_filepath": data_filepath,
+            "created_at": datetime.now().isoformat(),
+            "analyses": {}  # Análises calculadas sobre o resultado (chave -> resultado)
+        }
+        with self._lock:
+            self._results[run_id] = entry
+            while len(self._results) > self.max_results:
+                old_run_id, _ = self._results.popitem(last=False)
+                self._render_locks.pop(old_run_id, None)
+                self._plots.pop(old_run_id, None)
+        return run_id
+
+    def get(self, run_id):
+        """Retorna a entrada de um backtest (ou None) e a marca como usada recentemente."""
+        with self._lock:
+            entry = self._results.get(run_id)
+            if entry is not None:
+                self._results.move_to_end(run_id)
+            return entry
+
+    def get_analysis(self, run_id, key):
+        """Retorna uma análise já calculada sobre um backtest (ex.: Monte Carlo), ou None."""
+        with self._lock:
+            entry = self._results.get(run_id)
+            return entry["analyses"].get(key) if entry is not None else None
+
+    def add_analysis(self, run_id, key, analysis):
+        """Guarda uma análise junto do resultado do backtest (ignorada se ele já saiu do cache)."""
+        with self._lock:
+            entry = self._results.get(run_id)
+            if entry is not None:
+                entry["analyses"][key] = analysis
+
+    def latest_run_id(self):
+        """Retorna o identificador do backtest mais recente ainda em cache."""
+        with self._lock:
+            return next(reversed(self._results), None)
+
+    def render_plot(self, run_id):
+        """Gera (ou reaproveita) o gráfico HTML de um backtest.
+
+        Args:
+            run_id (str): Identificador retornado por `add`.
+
+        Returns:
+            tuple: (caminho do arquivo HTML ou None, mensagem de erro ou None)
+        """
+        with self._lock:
+            entry = self._results.get(run_id)
+            if entry is None:
+                return None, f"Backtest {run_id} não encontrado no cache."
+            render_lock = self._render_locks.setdefault(run_id, threading.Lock())
+
+        with render_lock:
+            with self._lock:
+                plot_path = self._plots.get(run_id)
+            if plot_path and os.path.exists(plot_path):
+                self.store.touch(plot_path)
+                return plot_path, None
+
+            # O diretório da execução pode ter sido removido pela limpeza; nesse caso usa um novo
+            run_dir = self.store.run_dir(run_id)
+            if run_dir is None:
+                _, run_dir = self.store.create_run(prefix="plot")
+            tmp_plot_path = os.path.join(run_dir, "plot.html")
+            try:
+                print(f"Gerando gráfico do backtest {run_id} em {tmp_plot_path}...")
+                # Disable superimpose to avoid the upsampling error
+                entry["bt"].plot(results=entry["stats"], filename=tmp_plot_path,
+                                 open_browser=False, superimpose=False)
+                plot_path = self.store.store_file(tmp_plot_path)["path"]
+            except ValueError as ve:
+                return None, f"Erro ao gerar gráfico: {ve}. As estatísticas ainda estão disponíveis."
+            except Exception as plot_e:
+                return None, f"Erro inesperado ao gerar gráfico: {plot_e}. As estatísticas ainda estão disponíveis."
+
+            with self._lock:
+                self._plots[run_id] = plot_path
+            self.store.cleanup()
+            return plot_path, None
+
+
+# Instância global do cache
+backtest_cache = BacktestResultCache()
@@ -8,12 +8,32 @@ from backtesting.lib import crossover
 # Esta estratégia usa médias móveis como exemplo.
 # Posteriormente, adaptaremos o agente DQN para interagir aqui.
 
+def crossover_positions(fast, slow):
+    """ Versão vetorizada da regra de cruzamento: 1 após cruzar para cima, -1 após cruzar para baixo.
+
+    Usa a mesma comparação estrita de `backtesting.lib.crossover` e mantém a posição até o
+    próximo cruzamento (0 antes do primeiro sinal).
+    """
+    diff = np.asarray(fast, dtype=float) - np.asarray(slow, dtype=float)
+    prev_diff = np.empty_like(diff)
+    prev_diff[0] = np.nan
+    prev_diff[1:] = diff[:-1]
+    signal = np.where((prev_diff < 0) & (diff > 0), 1.0,
+                      np.where((prev_diff > 0) & (diff < 0), -1.0, np.nan))
+    return pd.Series(signal).ffill().fillna(0).to_numpy()
+
 class SimpleMovingAverageStrategy(Strategy):
     """ Uma estratégia simples baseada no cruzamento de médias móveis. """
     # Definir os períodos das duas médias móveis
     n1 = 10  # Média curta
     n2 = 20  # Média longa
 
+    @classmethod
+    def signals(cls, data):
+        """ Posições alvo por barra, para o backtest vetorizado (vector_backtest.py). """
+        close = pd.Series(data["Close"], dtype=float)
+        return crossover_positions(close.rolling(cls.n1).mean(), close.rolling(cls.n2).mean())
+
     def init(self):
         # Pré-calcular as médias móveis
         close = self.data.Close
@@ -30,5 +50,5 @@ class SimpleMovingAverageStrategy(Strategy):
             self.sell()
 
 # Import necessário para o cálculo dentro da estratégia
+import numpy as np
 import pandas as pd
-
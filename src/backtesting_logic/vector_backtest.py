@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+# Mesmos valores usados pelos backtests com Backtesting.py (backtest_runner.py / run_backtest.py)
+DEFAULT_CASH = 10000
+DEFAULT_COMMISSION = .002
+
+
+def _periods_per_year(index):
+    """Estima quantas barras existem em um ano a partir do índice dos dados."""
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return 252
+    spacing_days = np.median(np.diff(index.values).astype("timedelta64[s]").astype(float)) / 86400
+    if spacing_days <= 0:
+        return 252
+    if 0.5 <= spacing_days <= 1.5:
+        # Dados diários: sem fins de semana -> mercado tradicional (252), com -> cripto (365)
+        return 365 if (index.dayofweek >= 5).any() else 252
+    return 365.25 / spacing_days
+
+
+def _shift_positions(target):
+    """Converte o sinal decidido no fechamento da barra t em posição executada na abertura de t+1.
+
+    Args:
+        target (np.ndarray): Posições alvo, shape (n_barras,) ou (n_barras, n_estrategias).
+
+    Returns:
+        tuple: (posição mantida em cada barra, posição da barra anterior)
+    """
+    pos = np.zeros_like(target)
+    pos[1:] = target[:-1]
+    prev_pos = np.zeros_like(pos)
+    prev_pos[1:] = pos[:-1]
+    return pos, prev_pos
+
+
+def equity_from_positions(open_, close, target, cash=DEFAULT_CASH, commission=DEFAULT_COMMISSION):
+    """Calcula a curva de patrimônio de uma ou várias séries de posições em uma única passada.
+
+    A ordem é executada na abertura da barra seguinte ao sinal (como no Backtesting.py) e a
+    comissão é cobrada sobre o volume negociado (uma reversão long->short paga duas vezes).
+
+    Args:
+        open_ (np.ndarray): Preços de abertura, shape (n_barras,).
+        close (np.ndarray): Preços de fechamento, shape (n_barras,).
+        target (np.ndarray): Posições alvo em fração do patrimônio (-1, 0, 1, ...),
+                             shape (n_barras,) ou (n_barras, n_estrategias).
+        cash (float): Capital inicial.
+        commission (float): Comissão proporcional por operação.
+
+    Returns:
+        tuple: (patrimônio, posição mantida em cada barra), ambos com o shape de `target`.
+    """
+    target = np.asarray(target, dtype=float)
+    pos, prev_pos = _shift_positions(target)
+    if target.ndim == 2:
+        open_ = open_[:, None]
+        close = close[:, None]
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = open_[0]
+    prev_close[1:] = close[:-1]
+
+    gap_return = prev_pos * (open_ / prev_close - 1)    # Posição anterior carregada até a abertura
+    fill_cost = commission * np.abs(pos - prev_pos)     # Comissão na execução da abertura
+    bar_return = pos * (close / open_ - 1)              # Posição nova da abertura ao fechamento
+    equity = cash * np.cumprod((1 + gap_return) * (1 - fill_cost) * (1 + bar_return), axis=0)
+    return equity, pos
+
+
+def _trades_from_positions(data, pos, commission):
+    """Monta a tabela de trades fechados no mesmo formato de `stats._trades` do Backtesting.py."""
+    open_ = data["Open"].to_numpy(dtype=float)
+    prev_pos = np.zeros_like(pos)
+    prev_pos[1:] = pos[:-1]
+    changed = pos != prev_pos
+    entries = np.flatnonzero(changed & (pos != 0))
+    exits = np.flatnonzero(changed & (prev_pos != 0))
+
+    # Os segmentos não se sobrepõem, então o k-ésimo fechamento pertence à k-ésima entrada.
+    # Trades ainda abertos no fim dos dados não entram nas estatísticas (como no Backtesting.py).
+    entries = entries[:len(exits)]
+    direction = np.sign(pos[entries])
+    entry_price = open_[entries] * (1 + commission * direction)
+    exit_price = open_[exits] * (1 - commission * direction)
+    return_pct = direction * (exit_price / entry_price - 1)
+
+    return pd.DataFrame({
+        "Size": pos[entries],
+        "EntryBar": entries,
+        "ExitBar": exits,
+        "EntryPrice": entry_price,
+        "ExitPrice": exit_price,
+        "ReturnPct": return_pct,
+        "EntryTime": data.index[entries],
+        "ExitTime": data.index[exits],
+        "Duration": data.index[exits] - data.index[entries]
+    })
+
+
+def run_vectorized_backtest(data, positions, cash=DEFAULT_CASH, commission=DEFAULT_COMMISSION):
+    """Executa um backtest vetorizado (NumPy) a partir de um array de posições.
+
+    Diferenças em relação ao Backtesting.py: o tamanho da posição é uma fração do patrimônio
+    (não há arredondamento para unidades inteiras), então resultados divergem quando o preço
+    do ativo é maior que o capital disponível; e uma troca de sinal sempre inverte a posição
+    (no Backtesting.py um `sell()` com todo o margem já comprometida não é executado).
+    "Buy & Hold Return [%]" é medido a partir da primeira barra.
+
+    Args:
+        data (pd.DataFrame): Dados OHLCV (colunas 'Open', 'High', 'Low', 'Close', 'Volume').
+        positions (array-like): Posição alvo decidida no fechamento de cada barra.
+        cash (float): Capital inicial.
+        commission (float): Comissão proporcional por operação.
+
+    Returns:
+        dict: Estatísticas com as mesmas chaves principais de `stats.to_dict()`, incluindo
+              `_equity_curve` e `_trades`.
+    """
+    open_ = data["Open"].to_numpy(dtype=float)
+    close = data["Close"].to_numpy(dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    if positions.shape != close.shape:
+        raise ValueError(f"positions deve ter {len(close)} elementos, recebeu {positions.shape}")
+
+    equity, pos = equity_from_positions(open_, close, positions, cash=cash, commission=commission)
+    running_peak = np.maximum.accumulate(equity)
+    drawdown = 1 - equity / running_peak
+    trades = _trades_from_positions(data, pos, commission)
+
+    periods = _periods_per_year(data.index)
+    bar_returns = np.diff(equity) / equity[:-1]
+    total_return = equity[-1] / cash - 1
+    years = len(equity) / periods
+    annual_return = (1 + total_return) ** (1 / years) - 1 if years > 0 and total_return > -1 else -1.0
+    annual_volatility = bar_returns.std(ddof=1) * np.sqrt(periods) if len(bar_returns) > 1 else np.nan
+
+    trade_returns = trades["ReturnPct"].to_numpy()
+    gains = trade_returns[trade_returns > 0].sum()
+    losses = -trade_returns[trade_returns < 0].sum()
+
+    stats = {
+        "Start": data.index[0],
+        "End": data.index[-1],
+        "Duration": data.index[-1] - data.index[0],
+        "Exposure Time [%]": (pos != 0).mean() * 100,
+        "Equity Final [$]": equity[-1],
+        "Equity Peak [$]": running_peak[-1],
+        "Return [%]": total_return * 100,
+        "Buy & Hold Return [%]": (close[-1] / close[0] - 1) * 100,
+        "Return (Ann.) [%]": annual_return * 100,
+        "Volatility (Ann.) [%]": annual_volatility * 100,
+        "Sharpe Ratio": annual_return / annual_volatility if annual_volatility else np.nan,
+        "Max. Drawdown [%]": -drawdown.max() * 100,
+        "# Trades": len(trades),
+        "Win Rate [%]": (trade_returns > 0).mean() * 100 if len(trades) else np.nan,
+        "Best Trade [%]": trade_returns.max() * 100 if len(trades) else np.nan,
+        "Worst Trade [%]": trade_returns.min() * 100 if len(trades) else np.nan,
+        "Avg. Trade [%]": (np.prod(1 + trade_returns) ** (1 / len(trades)) - 1) * 100 if len(trades) else np.nan,
+        "Profit Factor": gains / losses if losses else np.nan,
+        "Expectancy [%]": trade_returns.mean() * 100 if len(trades) else np.nan,
+        "_equity_curve": pd.DataFrame({"Equity": equity, "DrawdownPct": drawdown}, index=data.index),
+        "_trades": trades
+    }
+    return stats
+
+
+def run_signal_backtest(data, strategy_class, cash=DEFAULT_CASH, commission=DEFAULT_COMMISSION):
+    """Executa o backtest vetorizado de uma estratégia que expõe `signals(data)`.
+
+    Args:
+        data (pd.DataFrame): Dados OHLCV.
+        strategy_class (Type[Strategy]): Estratégia com o classmethod `signals`.
+
+    Returns:
+        dict: Estatísticas no formato de `run_vectorized_backtest`.
+    """
+    if not hasattr(strategy_class, "signals"):
+        raise TypeError(f"{strategy_class.__name__} não define signals() e precisa do Backtesting.py")
+    return run_vectorized_backtest(data, strategy_class.signals(data), cash=cash, commission=commission)
+
+
+def run_sma_sweep(data, pairs, cash=DEFAULT_CASH, commission=DEFAULT_COMMISSION):
+    """Avalia muitos pares de médias móveis de uma vez, com uma matriz (barras x pares).
+
+    Cada janela é calculada uma única vez e todas as curvas de patrimônio saem de um único
+    `cumprod`, sem o loop `next()` do Backtesting.py.
+
+    Args:
+        data (pd.DataFrame): Dados OHLCV.
+        pairs (list): Lista de tuplas (n1, n2) com as janelas curta e longa.
+        cash (float): Capital inicial.
+        commission (float): Comissão proporcional por operação.
+
+    Returns:
+        pd.DataFrame: Uma linha por par, ordenada por 'Return [%]'.
+    """
+    # Import local para evitar dependência circular com a estratégia
+    from src.backtesting_logic.simple_strategy import crossover_positions
+
+    close_series = data["Close"].astype(float)
+    sma_cache = {}
+    def sma(window):
+        if window not in sma_cache:
+            sma_cache[window] = close_series.rolling(window).mean().to_numpy()
+        return sma_cache[window]
+
+    targets = np.column_stack([crossover_positions(sma(n1), sma(n2)) for n1, n2 in pairs])
+    open_ = data["Open"].to_numpy(dtype=float)
+    close = close_series.to_numpy()
+    equity, pos = equity_from_positions(open_, close, targets, cash=cash, commission=commission)
+
+    prev_pos = np.zeros_like(pos)
+    prev_pos[1:] = pos[:-1]
+    drawdown = 1 - equity / np.maximum.accumulate(equity, axis=0)
+    bar_returns = np.diff(equity, axis=0) / equity[:-1]
+    volatility = bar_returns.std(axis=0, ddof=1) * np.sqrt(_periods_per_year(data.index))
+
+    results = pd.DataFrame({
+        "n1": [n1 for n1, _ in pairs],
+        "n2": [n2 for _, n2 in pairs],
+        "Equity Final [$]": equity[-1],
+        "Return [%]": (equity[-1] / cash - 1) * 100,
+        "Max. Drawdown [%]": -drawdown.max(axis=0) * 100,
+        "Exposure Time [%]": (pos != 0).mean(axis=0) * 100,
+        "Volatility (Ann.) [%]": volatility * 100,
+        "# Trades": ((prev_pos != 0) & (pos != prev_pos)).sum(axis=0)
+    })
+    return results.sort_values("Return [%]", ascending=False).reset_index(drop=True)
@@ -4,19 +4,28 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, redirect
 # Remove or comment out unused imports if db is not used initially
 # from src.models.user import db
 # from src.routes.user import user_bp
 
 # Import the new trading blueprint
 from src.routes.trading_routes import trading_bp
+# AI training/simulation endpoints (DQN agent); the app still serves backtests without them
+try:
+    from src.routes.ai_routes import ai_bp
+except ImportError as e:
+    print(f"ERROR importing AI routes in main: {e}")
+    ai_bp = None
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'a_secure_random_secret_key_for_ia_trader' # Use a better secret key in production
 
 # Register the trading blueprint with a suitable prefix, e.g., /api
 app.register_blueprint(trading_bp, url_prefix='/api')
+# AI endpoints under /api/ai (e.g. /api/ai/train, /api/ai/events)
+if ai_bp is not None:
+    app.register_blueprint(ai_bp, url_prefix='/api/ai')
 
 # Database configuration remains commented out for now
 # app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{os.getenv('DB_USERNAME', 'root')}:{os.getenv('DB_PASSWORD', 'password')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '3306')}/{os.getenv('DB_NAME', 'mydb')}"
@@ -25,6 +34,11 @@ app.register_blueprint(trading_bp, url_prefix='/api')
 # with app.app_context():
 #     db.create_all()
 
+# Legacy plot URL: the backtest plot is now rendered on demand by the trading blueprint
+@app.route('/static/dqn_strategy_backtest.html')
+def serve_latest_backtest_plot():
+    return redirect('/api/backtest_plot/latest')
+
 # Route to serve the main index.html and other static files
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
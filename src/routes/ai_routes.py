@@ -1,6 +1,6 @@
 # src/routes/ai_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from src.services.ai_service import ai_service
 
 ai_bp = Blueprint('ai', __name__)
@@ -22,6 +22,8 @@ def train_ai():
     trade_amount = float(data.get('trade_amount', 1000))
     target_profit_abs = float(data.get('target_profit_abs', 330))
     stop_loss_abs = float(data.get('stop_loss_abs', 600))
+    resume = bool(data.get('resume', False))
+    priority = int(data.get('priority', 0))
     
     # Iniciar treinamento
     result = ai_service.start_training(
@@ -31,7 +33,9 @@ def train_ai():
         initial_balance=initial_balance,
         trade_amount=trade_amount,
         target_profit_abs=target_profit_abs,
-        stop_loss_abs=stop_loss_abs
+        stop_loss_abs=stop_loss_abs,
+        resume=resume,
+        priority=priority
     )
     
     return jsonify(result)
@@ -45,9 +49,53 @@ def get_training_status():
     if not symbol:
         return jsonify({"status": "error", "message": "Símbolo do ativo é obrigatório."}), 400
     
-    status = ai_service.get_training_status(symbol, region)
+    # Consulta incremental: histórico a partir do cursor, resumo ou séries reduzidas para gráficos
+    since_episode = request.args.get('since_episode', type=int)
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary', 'chart'):
+        return jsonify({"status": "error", "message": "view deve ser full, summary ou chart."}), 400
+    max_points = request.args.get('max_points', 200, type=int)
+    
+    status = ai_service.get_training_status(symbol, region, since_episode=since_episode,
+                                            view=view, max_points=max(1, max_points))
     return jsonify(status)
 
+@ai_bp.route('/cancel', methods=['POST'])
+def cancel_training():
+    """Cancela o treinamento da IA (na fila ou em andamento) para um ativo específico."""
+    data = request.json
+    
+    # Validar dados
+    if not data or 'symbol' not in data:
+        return jsonify({"status": "error", "message": "Símbolo do ativo é obrigatório."}), 400
+    
+    result = ai_service.cancel_training(data.get('symbol'), data.get('region', 'US'))
+    return jsonify(result)
+
+@ai_bp.route('/jobs', methods=['GET'])
+def list_training_jobs():
+    """Lista os treinamentos agendados e seus estados."""
+    jobs = ai_service.list_training_jobs(request.args.get('status'))
+    return jsonify({"status": "success", "jobs": jobs})
+
+@ai_bp.route('/events', methods=['GET'])
+def training_events():
+    """Stream SSE com o progresso dos treinamentos (por episódio) e mudanças de estado.
+    
+    Query: symbol (opcional; sem ele, todos os treinamentos deste worker) e region.
+    Cada conexão fica aberta: em produção use workers gthread ou gevent (ver gunicorn.conf.py).
+    """
+    symbol = request.args.get('symbol')
+    region = request.args.get('region', 'US')
+    
+    subscription, initial_events = ai_service.subscribe_training_events(symbol, region)
+    if subscription is None:
+        return jsonify({"status": "error", "message": "Limite de conexões de eventos atingido."}), 503
+    
+    stream = ai_service.events.stream(subscription, initial_events)
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @ai_bp.route('/simulate', methods=['POST'])
 def run_simulation():
     """Executa uma simulação com a IA treinada."""
@@ -75,8 +123,77 @@ def run_simulation():
     
     return jsonify(result)
 
+@ai_bp.route('/simulate_grid', methods=['POST'])
+def run_simulation_grid():
+    """Simula uma grade de parâmetros de operação (todas as combinações) com a IA treinada."""
+    data = request.json
+    
+    # Validar dados
+    if not data or 'symbol' not in data:
+        return jsonify({"status": "error", "message": "Símbolo do ativo é obrigatório."}), 400
+    
+    # Cada parâmetro aceita um valor ou uma lista de valores
+    def values(name, default):
+        value = data.get(name, default)
+        return [float(v) for v in (value if isinstance(value, list) else [value])]
+    
+    try:
+        trade_amounts = values('trade_amount', 1000)
+        target_profits_abs = values('target_profit_abs', 330)
+        stop_losses_abs = values('stop_loss_abs', 600)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Os parâmetros da grade devem ser números."}), 400
+    
+    result = ai_service.run_simulation_grid(
+        symbol=data.get('symbol'),
+        region=data.get('region', 'US'),
+        trade_amounts=trade_amounts,
+        target_profits_abs=target_profits_abs,
+        stop_losses_abs=stop_losses_abs
+    )
+    
+    return jsonify(result)
+
+@ai_bp.route('/simulations/<simulation_id>', methods=['GET'])
+def get_simulation(simulation_id):
+    """Obtém o resultado de uma simulação já executada pelo seu ID."""
+    result = ai_service.get_simulation(simulation_id)
+    if result is None:
+        return jsonify({"status": "error", "message": "Simulação não encontrada."}), 404
+    return jsonify(result)
+
+@ai_bp.route('/export', methods=['POST'])
+def export_model():
+    """Exporta o modelo treinado de um ativo para inferência rápida (TorchScript/int8)."""
+    data = request.json
+    
+    # Validar dados
+    if not data or 'symbol' not in data:
+        return jsonify({"status": "error", "message": "Símbolo do ativo é obrigatório."}), 400
+    
+    result = ai_service.export_model(
+        symbol=data.get('symbol'),
+        region=data.get('region', 'US'),
+        quantize=bool(data.get('quantize', True))
+    )
+    
+    return jsonify(result)
+
 @ai_bp.route('/models', methods=['GET'])
 def get_available_models():
-    """Obtém a lista de modelos disponíveis."""
-    models = ai_service.get_available_models()
+    """Obtém a lista de modelos disponíveis.
+    
+    Query: symbol e region (filtros exatos), order_by (created_at, profit ou reward),
+    limit e offset (paginação).
+    """
+    try:
+        models = ai_service.get_available_models(
+            symbol=request.args.get('symbol'),
+            region=request.args.get('region'),
+            order_by=request.args.get('order_by', 'created_at'),
+            limit=request.args.get('limit', type=int),
+            offset=request.args.get('offset', 0, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     return jsonify({"status": "success", "models": models})
@@ -1,8 +1,9 @@
 # src/routes/trading_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 import os
 import sys
+import json
 import traceback
 
 # Adjust path to import from sibling directories (services, backtesting_logic)
@@ -11,26 +12,50 @@ sys.path.insert(0, project_root_dir)
 
 try:
     # Import the actual backtest runner function
-    from src.backtesting_logic.backtest_runner import run_backtest_simulation
+    from src.backtesting_logic.backtest_runner import run_backtest_simulation, run_backtest_monte_carlo
     # Import the data loader for chart data
     from src.backtesting_logic.data_loader import load_data_from_json
     # Import the strategy class to pass to the runner
     from src.backtesting_logic.dqn_strategy import DQNStrategy
+    # Cache of backtest results, used to render plots on demand
+    from src.backtesting_logic.result_cache import backtest_cache
+    # Multi-asset batch mode (process pool)
+    from src.backtesting_logic.batch_runner import (
+        ASSET_DATA_DIR, ASSET_FILE_SUFFIX, list_asset_files, iter_batch_backtests, run_batch_backtests,
+        summarize_batch
+    )
+    from src.backtesting_logic.simple_strategy import SimpleMovingAverageStrategy
+    # Live progress (SSE) of backtests run by this worker
+    from src.services.event_bus import event_bus
 except ImportError as e:
     print(f"ERROR importing necessary modules in trading_routes: {e}")
     # Define dummy functions if imports fail to avoid crashing Flask app
     def run_backtest_simulation(*args, **kwargs):
         return {"error": "Backtest runner not loaded", "success": False}
+    def run_backtest_monte_carlo(*args, **kwargs):
+        return {"error": "Backtest runner not loaded", "success": False}
     def load_data_from_json(*args, **kwargs):
         return None
     class DQNStrategy: pass
+    class SimpleMovingAverageStrategy: pass
+    backtest_cache = None
+    iter_batch_backtests = None
+    run_batch_backtests = None
+    event_bus = None
 
 trading_bp = Blueprint("trading", __name__)
 
 # Define data file path relative to project root
 DATA_FILE_PATH = os.path.join(project_root_dir, "btc_usd_data.json")
-OUTPUT_HTML_FILENAME = "dqn_strategy_backtest.html"
-OUTPUT_HTML_PATH = os.path.join(project_root_dir, "src", "static", OUTPUT_HTML_FILENAME)
+
+# Strategies selectable by name in the batch endpoint
+BATCH_STRATEGIES = {
+    "dqn": DQNStrategy,
+    "sma": SimpleMovingAverageStrategy
+}
+
+# Upper bound on Monte Carlo resamplings per request (CPU and memory of the analysis)
+MAX_MONTE_CARLO_SIMULATIONS = 100000
 
 @trading_bp.route("/start_backtest", methods=["POST"])
 def start_backtest_endpoint():
@@ -47,6 +72,8 @@ def start_backtest_endpoint():
     entry_value = data.get("entryValue")
     target_value = data.get("targetValue")
     stop_loss = data.get("stopLoss")
+    # Optional client-chosen id to follow the run live on /api/backtest_events?progress_id=...
+    progress_id = data.get("progress_id")
 
     print(f"Received request to start backtest for asset: {asset}")
     print(f"Parameters received: AI={ai_model}, Strategy={strategy_param}, Entry={entry_value}, Target={target_value}, StopLoss={stop_loss}")
@@ -60,8 +87,8 @@ def start_backtest_endpoint():
         # Run the backtest simulation using the imported function and strategy
         result = run_backtest_simulation(
             data_filepath=DATA_FILE_PATH,
-            output_html_path=OUTPUT_HTML_PATH,
-            strategy_class=DQNStrategy # Pass the actual strategy class
+            strategy_class=DQNStrategy, # Pass the actual strategy class
+            progress_id=progress_id
         )
         return jsonify(result), 200
     except Exception as e:
@@ -69,6 +96,127 @@ def start_backtest_endpoint():
         print(traceback.format_exc())
         return jsonify({"error": f"Ocorreu um erro interno durante a simulação: {str(e)}"}), 500
 
+@trading_bp.route("/start_batch_backtest", methods=["POST"])
+def start_batch_backtest_endpoint():
+    """Endpoint to backtest one strategy on several assets at once, in a process pool.
+
+    Body: {"assets": ["PETR4.SA", ...] (default: every file in ASSET_DATA_DIR),
+           "strategy": "dqn" | "sma", "max_workers": int, "stream": bool}
+    With stream=true (default) the response is NDJSON: one line per asset as it finishes,
+    then a final line with the cross-asset summary table.
+    """
+    if iter_batch_backtests is None:
+        return jsonify({"error": "Batch runner not loaded", "success": False}), 500
+
+    data = request.get_json(silent=True) or {}
+    strategy_key = data.get("strategy", "dqn")
+    strategy_class = BATCH_STRATEGIES.get(strategy_key)
+    if strategy_class is None:
+        return jsonify({"error": f"Estratégia desconhecida: {strategy_key}. Opções: {list(BATCH_STRATEGIES)}"}), 400
+
+    assets = data.get("assets")
+    if assets:
+        data_filepaths = [os.path.join(ASSET_DATA_DIR, f"{os.path.basename(asset)}{ASSET_FILE_SUFFIX}") for asset in assets]
+        missing = [path for path in data_filepaths if not os.path.exists(path)]
+        if missing:
+            return jsonify({"error": f"Arquivos de dados não encontrados: {missing}"}), 404
+    else:
+        data_filepaths = list_asset_files()
+        if not data_filepaths:
+            return jsonify({"error": f"Nenhum arquivo de dados em {ASSET_DATA_DIR}"}), 404
+
+    # Validated here: in stream mode a bad value would only fail after the NDJSON headers were sent
+    max_workers = data.get("max_workers")
+    if max_workers is not None:
+        cpu_count = os.cpu_count() or 1
+        try:
+            max_workers = int(max_workers)
+        except (TypeError, ValueError):
+            max_workers = 0
+        if not 1 <= max_workers <= cpu_count:
+            return jsonify({"error": f"max_workers deve ser um inteiro entre 1 e {cpu_count}.", "success": False}), 400
+    print(f"Batch backtest: {strategy_class.__name__} em {len(data_filepaths)} ativos")
+
+    if not data.get("stream", True):
+        return jsonify(run_batch_backtests(data_filepaths, strategy_class, max_workers=max_workers)), 200
+
+    def generate():
+        results = []
+        for result in iter_batch_backtests(data_filepaths, strategy_class, max_workers=max_workers):
+            results.append(result)
+            yield json.dumps({"type": "result", **result}) + "\n"
+        yield json.dumps({"type": "summary", "summary": summarize_batch(results)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@trading_bp.route("/backtest_events", methods=["GET"])
+def backtest_events_endpoint():
+    """Server-Sent Events stream with bar-by-bar backtest progress.
+
+    Query: progress_id (the id sent to /start_backtest); without it, every backtest run by
+    this worker. Events: "started", "progress" (bar, bars, fraction, equity) and "finished".
+    The connection stays open, so deploy with gthread or gevent workers (see gunicorn.conf.py).
+    """
+    if event_bus is None:
+        return jsonify({"error": "Event bus not loaded", "success": False}), 500
+
+    progress_id = request.args.get("progress_id")
+    subscription = event_bus.subscribe(f"backtest:{progress_id}" if progress_id else "backtest")
+    if subscription is None:
+        return jsonify({"error": "Limite de conexões de eventos atingido.", "success": False}), 503
+
+    return Response(stream_with_context(event_bus.stream(subscription)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@trading_bp.route("/backtest_plot/<run_id>", methods=["GET"])
+def get_backtest_plot(run_id):
+    """Endpoint que gera (na primeira chamada) e serve o gráfico HTML de um backtest.
+
+    Use "latest" como run_id para o backtest mais recente.
+    """
+    if backtest_cache is None:
+        return jsonify({"error": "Cache de backtests não carregado"}), 500
+
+    if run_id == "latest":
+        run_id = backtest_cache.latest_run_id()
+        if run_id is None:
+            return jsonify({"error": "Nenhum backtest executado ainda"}), 404
+
+    if backtest_cache.get(run_id) is None:
+        return jsonify({"error": f"Backtest {run_id} não encontrado no cache."}), 404
+
+    try:
+        plot_file, plot_error = backtest_cache.render_plot(run_id)
+        if plot_file is None:
+            # The run exists: failing to render it is a server error
+            return jsonify({"error": plot_error}), 500
+        return send_file(plot_file, mimetype="text/html")
+    except Exception as e:
+        print(f"Erro ao gerar gráfico do backtest {run_id}: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Erro ao gerar gráfico do backtest"}), 500
+
+@trading_bp.route("/backtest_monte_carlo/<run_id>", methods=["GET", "POST"])
+def backtest_monte_carlo_endpoint(run_id):
+    """Endpoint for the Monte Carlo robustness analysis of a cached backtest."""
+    params = request.get_json(silent=True) or request.args
+    try:
+        n_simulations = int(params.get("n_simulations", 5000))
+        method = params.get("method", "bootstrap")
+        seed = params.get("seed")
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parâmetros inválidos: {e}", "success": False}), 400
+    if not 1 <= n_simulations <= MAX_MONTE_CARLO_SIMULATIONS:
+        return jsonify({"error": f"n_simulations deve estar entre 1 e {MAX_MONTE_CARLO_SIMULATIONS}.",
+                        "success": False}), 400
+    if backtest_cache is not None and backtest_cache.get(run_id) is None:
+        return jsonify({"error": f"Backtest {run_id} não encontrado no cache. Execute o backtest novamente.",
+                        "success": False}), 404
+
+    result = run_backtest_monte_carlo(run_id, n_simulations=n_simulations, method=method, seed=seed)
+    return jsonify(result), (200 if result.get("success") else 400)
+
 @trading_bp.route("/chart-data", methods=["GET"])
 def get_chart_data():
     """Endpoint para obter dados históricos OHLCV para o gráfico."""
@@ -1,30 +1,62 @@
 # src/services/ai_service.py
 
 import os
-import json
-import threading
 import time
+import itertools
 from datetime import datetime
 import numpy as np
 from src.rl_agent.trainer import TradingTrainer
+from src.rl_agent.model_registry import get_model_registry
+from src.services.training_scheduler import training_scheduler, DONE, ACTIVE_STATUSES
+from src.services.training_worker import run_training_process
+from src.services.shared_state import SharedAIState
+from src.services.event_bus import event_bus
+from src.services.trainer_cache import TrainerCache, DEFAULT_MAX_BYTES
+from src.services.simulation_store import (SimulationStore, JsonSimulationFiles, DEFAULT_MAX_IN_MEMORY,
+                                           simulation_id_for)
+from src.services.training_history import (DEFAULT_CHART_POINTS, history_since, downsample_history,
+                                           summarize_history, last_episode)
+
+MAX_GRID_COMBINATIONS = 10000  # Combinações por chamada de run_simulation_grid
 
 class AIService:
     """Serviço para gerenciar a IA de trading."""
     
-    def __init__(self, model_dir="/home/ubuntu/ia_trader_app/models"):
+    def __init__(self, model_dir="/home/ubuntu/ia_trader_app/models", scheduler=None, training_processes=True,
+                 shared_state=True, events=None, trainer_cache_bytes=DEFAULT_MAX_BYTES,
+                 max_cached_simulations=DEFAULT_MAX_IN_MEMORY):
         """
         Inicializa o serviço de IA.
         
         Args:
             model_dir: Diretório para salvar/carregar modelos
+            scheduler: Agendador de treinamentos (padrão: o agendador global)
+            training_processes: Se True, cada treinamento roda em um processo separado (fora do GIL
+                                do servidor); se False, roda na própria thread do agendador
+            shared_state: Se True, jobs, versões de modelo e simulações ficam em um SQLite no
+                          diretório de modelos, visível a todos os workers do gunicorn
+            events: EventBus do progresso ao vivo dos treinamentos (padrão: o barramento global)
+            trainer_cache_bytes: Memória máxima dos treinadores; acima dela os ociosos menos usados
+                                 são gravados em disco e recarregados quando forem pedidos de novo
+            max_cached_simulations: Resultados de simulação mantidos em memória; os demais ficam
+                                    em disco (no SQLite compartilhado ou em arquivos JSON)
         """
         self.model_dir = model_dir
-        self.trainers = {}  # Dicionário de treinadores por símbolo
-        self.training_threads = {}  # Threads de treinamento em andamento
-        self.simulation_results = {}  # Resultados de simulações recentes
+        # Treinadores por símbolo (LRU com orçamento de memória; treinadores com job ativo ficam)
+        self.trainers = TrainerCache(os.path.join(model_dir, "trainer_cache"), max_bytes=trainer_cache_bytes,
+                                     is_busy=self._training_active)
+        self.scheduler = scheduler or training_scheduler  # Fila limitada de treinamentos
+        self.training_processes = training_processes
+        self.events = events or event_bus  # Progresso ao vivo (SSE) dos treinamentos deste worker
+        self.model_versions = {}  # Versão publicada do modelo carregado em cada treinador
         
         # Criar diretório de modelos se não existir
         os.makedirs(self.model_dir, exist_ok=True)
+        self.model_registry = get_model_registry(self.model_dir)  # Índice dos modelos salvos
+        self.shared_state = SharedAIState(os.path.join(self.model_dir, "ai_state.db")) if shared_state else None
+        # Resultados de simulação memoizados pela chave (modelo, dados e parâmetros)
+        backing = self.shared_state or JsonSimulationFiles(os.path.join(self.model_dir, "simulations"))
+        self.simulations = SimulationStore(backing, max_in_memory=max_cached_simulations)
     
     def get_trainer(self, symbol, region="US", create_if_missing=True):
         """
@@ -39,9 +71,12 @@ class AIService:
             Instância de TradingTrainer
         """
         trainer_key = f"{symbol}_{region}"
+        # Modelo publicado por um treinamento (possivelmente feito em outro worker)
+        published = self.shared_state.model_version(trainer_key) if self.shared_state else None
         
-        if trainer_key not in self.trainers and create_if_missing:
-            # Criar novo treinador
+        trainer = self.trainers.get(trainer_key)
+        if trainer is None and (create_if_missing or published is not None):
+            # Criar novo treinador (também quando o removido da memória não pôde ser recarregado do disco)
             trainer = TradingTrainer(
                 symbol=symbol,
                 region=region,
@@ -55,28 +90,58 @@ class AIService:
                 model_dir=self.model_dir
             )
             
-            # Tentar carregar modelo existente
-            model_files = [f for f in os.listdir(self.model_dir) 
-                          if f.startswith(symbol) and f.endswith(".pth")]
+            # Tentar carregar o modelo mais recente do ativo (da região; senão, de qualquer região)
+            latest = (self.model_registry.latest_model(symbol, region)
+                      or self.model_registry.latest_model(symbol, region=None))
             
-            if model_files:
-                # Carregar o modelo mais recente
-                latest_model = sorted(model_files)[-1].replace(".pth", "")
+            if latest is not None:
                 try:
-                    trainer.load_model(latest_model)
-                    print(f"Modelo carregado: {latest_model}")
+                    trainer.load_model(latest["name"])
+                    print(f"Modelo carregado: {latest['name']}")
                 except Exception as e:
-                    print(f"Erro ao carregar modelo {latest_model}: {e}")
+                    print(f"Erro ao carregar modelo {latest['name']}: {e}")
             
             self.trainers[trainer_key] = trainer
         
-        return self.trainers.get(trainer_key)
+        if trainer is not None and published is not None:
+            self._sync_model(trainer_key, trainer, published)
+        return trainer
+    
+    def _sync_model(self, trainer_key, trainer, published):
+        """Recarrega o modelo publicado se ele for mais novo que o carregado neste worker."""
+        if self.model_versions.get(trainer_key) == published["version"]:
+            return
+        if self._training_active(trainer_key):
+            return  # Treinando neste worker: a versão nova será publicada por ele mesmo
+        try:
+            trainer.load_model(published["model_name"])
+            self.model_versions[trainer_key] = published["version"]
+            print(f"Modelo publicado carregado: {published['model_name']} (versão {published['version']})")
+        except Exception as e:
+            print(f"Erro ao carregar modelo publicado {published['model_name']}: {e}")
+    
+    def _training_active(self, trainer_key):
+        """True se este worker tem um treinamento na fila ou em andamento para a chave."""
+        job = self.scheduler.latest_job(trainer_key)
+        return job is not None and job.status in ACTIVE_STATUSES
+    
+    def _latest_job(self, trainer_key, include_result=False):
+        """Último job de treinamento de um ativo (de qualquer worker, com estado compartilhado)."""
+        if self.shared_state is not None:
+            return self.shared_state.latest_job(trainer_key, include_result=include_result)
+        job = self.scheduler.latest_job(trainer_key)
+        if job is None:
+            return None
+        job_dict = job.to_dict()
+        if include_result:
+            job_dict["result"] = job.result
+        return job_dict
     
     def start_training(self, symbol, region="US", episodes=100, 
                       initial_balance=10000, trade_amount=1000,
-                      target_profit_abs=330, stop_loss_abs=600):
+                      target_profit_abs=330, stop_loss_abs=600, resume=False, priority=0):
         """
-        Inicia o treinamento da IA em uma thread separada.
+        Agenda o treinamento da IA no agendador de treinamentos.
         
         Args:
             symbol: Símbolo do ativo
@@ -86,91 +151,198 @@ class AIService:
             trade_amount: Valor de cada operação
             target_profit_abs: Meta de lucro em valor absoluto (R$)
             stop_loss_abs: Stop loss em valor absoluto (R$)
+            resume: Se True, retoma o último treinamento interrompido (checkpoint completo)
+            priority: Prioridade na fila (menor sai primeiro)
             
         Returns:
             ID do treinamento
         """
         trainer_key = f"{symbol}_{region}"
         
-        # Verificar se já existe um treinamento em andamento
-        if trainer_key in self.training_threads and self.training_threads[trainer_key].is_alive():
+        # Verificar se já existe um treinamento na fila ou em andamento
+        active = self._latest_job(trainer_key)
+        if active is not None and active["status"] in ACTIVE_STATUSES:
             return {"status": "error", "message": "Já existe um treinamento em andamento para este ativo."}
         
         # Obter ou criar treinador
         trainer = self.get_trainer(symbol, region)
         
-        # Atualizar parâmetros
-        trainer.initial_balance = initial_balance
-        trainer.trade_amount = trade_amount
-        trainer.target_profit_abs = target_profit_abs
-        trainer.stop_loss_abs = stop_loss_abs
-        
-        # Recriar ambiente com os novos parâmetros
-        trainer.env = trainer.env.__class__(
-            symbol=symbol,
-            region=region,
-            interval=trainer.interval,
-            range_period=trainer.range_period,
+        # Atualizar parâmetros (o ambiente reaproveita os dados já preparados)
+        trainer.configure_env(
             initial_balance=initial_balance,
             trade_amount=trade_amount,
             target_profit_abs=target_profit_abs,
-            stop_loss_abs=stop_loss_abs,
-            sma_window=trainer.sma_window,
-            max_steps=trainer.max_steps
+            stop_loss_abs=stop_loss_abs
         )
         
-        # Criar thread de treinamento
+        # Agendar o treinamento (executado quando houver um worker livre)
         training_id = f"{symbol}_{region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        def training_thread():
-            try:
-                print(f"Iniciando treinamento {training_id}...")
-                trainer.train(episodes=episodes)
-                print(f"Treinamento {training_id} concluído.")
-            except Exception as e:
-                print(f"Erro no treinamento {training_id}: {e}")
-        
-        thread = threading.Thread(target=training_thread)
-        thread.daemon = True  # Thread será encerrada quando o programa principal terminar
-        thread.start()
+        def run_training(job):
+            print(f"Iniciando treinamento {training_id}...")
+            if self.training_processes:
+                history = run_training_process(trainer, job, {"episodes": episodes, "resume": resume},
+                                               torch_threads=self.scheduler.torch_threads)
+            else:
+                history = trainer.train(episodes=episodes, resume=resume,
+                                        progress_callback=job.report_progress, should_stop=job.should_stop)
+            if not job.should_stop() and self.shared_state is not None:
+                # Os outros workers recarregam o modelo ao ver a versão nova
+                version = self.shared_state.publish_model(trainer_key, f"{symbol}_final")
+                self.model_versions[trainer_key] = version
+            print(f"Treinamento {training_id} encerrado.")
+            return history
         
-        self.training_threads[trainer_key] = thread
+        try:
+            job = self.scheduler.submit(trainer_key, run_training, priority=priority, description=training_id,
+                                        store=self.shared_state, events=self.events)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
         
         return {
             "status": "success", 
             "training_id": training_id,
-            "message": f"Treinamento iniciado com {episodes} episódios."
+            "job_id": job.job_id,
+            "message": f"Treinamento agendado com {episodes} episódios."
+        }
+    
+    def cancel_training(self, symbol, region="US"):
+        """
+        Cancela o treinamento de um ativo (na fila ou em andamento).
+        
+        Args:
+            symbol: Símbolo do ativo
+            region: Região do mercado
+            
+        Returns:
+            Status do cancelamento
+        """
+        job = self._latest_job(f"{symbol}_{region}")
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return {"status": "error", "message": "Nenhum treinamento em andamento para este ativo."}
+        
+        # Job deste worker: cancelado direto; de outro worker: o pedido fica no estado compartilhado
+        if self.scheduler.cancel(job["job_id"]) is None and self.shared_state is not None:
+            self.shared_state.request_cancel(job["job_id"])
+        return {
+            "status": "success",
+            "message": "Cancelamento solicitado; o treinamento para no próximo episódio.",
+            "job": job
         }
     
-    def get_training_status(self, symbol, region="US"):
+    def list_training_jobs(self, status=None):
+        """
+        Lista os treinamentos agendados (mais recentes primeiro).
+        
+        Args:
+            status: Filtra pelo estado (queued, running, done, failed, cancelled)
+            
+        Returns:
+            Lista de jobs
+        """
+        if self.shared_state is not None:
+            return self.shared_state.list_jobs(status)
+        return self.scheduler.list_jobs(status)
+    
+    def get_training_status(self, symbol, region="US", since_episode=None, view="full",
+                            max_points=DEFAULT_CHART_POINTS):
         """
         Verifica o status de um treinamento em andamento.
         
         Args:
             symbol: Símbolo do ativo
             region: Região do mercado
+            since_episode: Cursor: só os episódios posteriores a este vêm no histórico (também
+                           durante o treinamento); use o "cursor" da resposta anterior
+            view: "full" (séries completas ou a partir do cursor), "summary" (resumo de tamanho
+                  fixo, sem séries) ou "chart" (séries reduzidas a `max_points` pontos)
+            max_points: Pontos por série na visão "chart"
             
         Returns:
             Status do treinamento
         """
         trainer_key = f"{symbol}_{region}"
+        job = self._latest_job(trainer_key, include_result=True)
         
-        if trainer_key in self.training_threads and self.training_threads[trainer_key].is_alive():
-            return {"status": "running", "message": "Treinamento em andamento."}
+        if job is not None:
+            history = job.pop("result", None)
+            messages = {
+                "queued": "Treinamento na fila.",
+                "running": "Treinamento em andamento.",
+                "done": "Treinamento concluído.",
+                "failed": f"Erro no treinamento: {job['error']}",
+                "cancelled": "Treinamento cancelado."
+            }
+            active = job["status"] in ACTIVE_STATUSES
+            if active:
+                # Histórico ao vivo: só existe no worker que executa o treinamento
+                local_job = self.scheduler.get(job["job_id"])
+                trainer = self.trainers.get(trainer_key)
+                history = trainer.training_history if local_job is not None and trainer is not None else None
+            status = {
+                # "completed" mantido por compatibilidade com os clientes existentes
+                "status": "completed" if job["status"] == DONE else job["status"],
+                "message": messages[job["status"]],
+                "job": job,
+                # Tempo por fase e taxas (passos/s, atualizações/s) do treinamento
+                "timings": (history or {}).get("timings") or job["progress"].get("timings")
+            }
         elif trainer_key in self.trainers:
-            return {
+            active = False
+            history = self.trainers[trainer_key].training_history
+            status = {
                 "status": "completed", 
                 "message": "Treinamento concluído.",
-                "history": self.trainers[trainer_key].training_history
+                "timings": history.get("timings")
             }
         else:
             return {"status": "not_found", "message": "Nenhum treinamento encontrado para este ativo."}
+        
+        if history is None:
+            return status
+        if view == "summary":
+            status["summary"] = summarize_history(history)
+        elif view == "chart":
+            status["history"] = downsample_history(history, max_points)
+        elif since_episode is not None or not active:
+            status["history"] = history_since(history, since_episode)
+        # Último episódio disponível: enviar como since_episode na próxima consulta
+        status["cursor"] = last_episode(history)
+        return status
+    
+    def subscribe_training_events(self, symbol=None, region="US"):
+        """
+        Assina os eventos ao vivo de treinamento (um ativo ou todos).
+        
+        Args:
+            symbol: Símbolo do ativo (None: todos os treinamentos deste worker)
+            region: Região do mercado
+            
+        Returns:
+            Tupla (assinatura, eventos iniciais) para EventBus.stream, ou (None, None) se o
+            limite de assinantes foi atingido
+        """
+        topic = f"training:{symbol}_{region}" if symbol else "training"
+        subscription = self.events.subscribe(topic)
+        if subscription is None:
+            return None, None
+        
+        # Estado atual primeiro, para o cliente não depender de um evento futuro
+        initial_events = []
+        if symbol:
+            job = self._latest_job(f"{symbol}_{region}")
+            if job is not None:
+                initial_events.append(("status", {"topic": topic, **job}))
+        return subscription, initial_events
     
     def run_simulation(self, symbol, region="US", 
                       trade_amount=1000, target_profit_abs=330, stop_loss_abs=600):
         """
         Executa uma simulação com a IA treinada.
         
+        Simulações repetidas (mesma versão do modelo, mesmos dados e mesmos parâmetros) devolvem
+        o resultado já calculado, com "cached": True, sem simular de novo.
+        
         Args:
             symbol: Símbolo do ativo
             region: Região do mercado
@@ -191,6 +363,14 @@ class AIService:
             }
         
         try:
+            # Resultado já calculado para o mesmo modelo, dados e parâmetros
+            simulation_key = trainer.simulation_key(trade_amount, target_profit_abs, stop_loss_abs)
+            simulation_id = simulation_id_for(simulation_key)
+            cached = self.simulations.get(simulation_id)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+            
             # Executar simulação
             results = trainer.run_simulation(
                 trade_amount=trade_amount,
@@ -199,16 +379,16 @@ class AIService:
                 verbose=False
             )
             
-            # Armazenar resultados
-            simulation_id = f"{symbol}_{region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            self.simulation_results[simulation_id] = results
-            
             # Adicionar informações adicionais
             results["simulation_id"] = simulation_id
             results["status"] = "success"
             results["message"] = "Simulação concluída com sucesso."
+            results["created_at"] = datetime.now().isoformat()
+            
+            # Armazenar resultados
+            self.simulations.put(simulation_id, f"{symbol}_{region}", results)
             
-            return results
+            return {**results, "cached": False}
             
         except Exception as e:
             return {
@@ -216,45 +396,123 @@ class AIService:
                 "message": f"Erro ao executar simulação: {str(e)}"
             }
     
-    def get_available_models(self):
+    def run_simulation_grid(self, symbol, region="US", trade_amounts=(1000,),
+                            target_profits_abs=(330,), stop_losses_abs=(600,)):
         """
-        Obtém a lista de modelos disponíveis.
+        Simula todas as combinações de uma grade de parâmetros de operação com a IA treinada.
         
+        Args:
+            symbol: Símbolo do ativo
+            region: Região do mercado
+            trade_amounts: Valores de cada operação
+            target_profits_abs: Metas de lucro em valor absoluto (R$)
+            stop_losses_abs: Stop losses em valor absoluto (R$)
+            
         Returns:
-            Lista de modelos disponíveis
+            Tabela com uma linha por combinação (trade_amount x target_profit_abs x stop_loss_abs)
+            e a combinação de maior lucro
         """
-        models = []
+        combinations = list(itertools.product(trade_amounts, target_profits_abs, stop_losses_abs))
+        if not combinations:
+            return {"status": "error", "message": "A grade de parâmetros está vazia."}
+        if len(combinations) > MAX_GRID_COMBINATIONS:
+            return {
+                "status": "error",
+                "message": f"A grade tem {len(combinations)} combinações (máximo: {MAX_GRID_COMBINATIONS})."
+            }
+        
+        trainer = self.get_trainer(symbol, region, create_if_missing=False)
         
-        if os.path.exists(self.model_dir):
-            model_files = [f for f in os.listdir(self.model_dir) if f.endswith(".pth")]
+        if trainer is None:
+            return {
+                "status": "error", 
+                "message": "Nenhum modelo treinado encontrado para este ativo."
+            }
+        
+        try:
+            start_time = time.perf_counter()
+            table = trainer.run_simulation_grid(combinations)
+            elapsed = time.perf_counter() - start_time
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Erro ao executar simulação: {str(e)}"
+            }
+        
+        best = int(np.argmax(table["accumulated_profit"]))
+        return {
+            "status": "success",
+            "message": f"{len(combinations)} combinações simuladas.",
+            "initial_balance": trainer.initial_balance,
+            "combinations": len(combinations),
+            "elapsed_seconds": round(elapsed, 4),
+            "table": table,
+            "best": {column: values[best] for column, values in table.items()}
+        }
+    
+    def get_simulation(self, simulation_id):
+        """
+        Obtém o resultado de uma simulação já executada (da memória ou do disco).
+        
+        Args:
+            simulation_id: ID retornado por run_simulation
+            
+        Returns:
+            Resultados da simulação, ou None se não existir
+        """
+        return self.simulations.get(simulation_id)
+    
+    def export_model(self, symbol, region="US", quantize=True):
+        """
+        Exporta o modelo final de um ativo para inferência rápida (TorchScript, int8 opcional).
+        
+        Args:
+            symbol: Símbolo do ativo
+            region: Região do mercado
+            quantize: Se True, aplica quantização dinâmica int8
             
-            for model_file in model_files:
-                model_name = model_file.replace(".pth", "")
-                
-                # Tentar extrair símbolo e data
-                parts = model_name.split("_")
-                if len(parts) >= 2:
-                    symbol = parts[0]
-                    
-                    # Verificar se há arquivo de parâmetros
-                    params_file = os.path.join(self.model_dir, f"{model_name}_params.json")
-                    params = {}
-                    
-                    if os.path.exists(params_file):
-                        try:
-                            with open(params_file, "r") as f:
-                                params = json.load(f)
-                        except:
-                            pass
-                    
-                    models.append({
-                        "name": model_name,
-                        "symbol": symbol,
-                        "file": model_file,
-                        "params": params
-                    })
-        
-        return models
+        Returns:
+            Relatório da exportação (paridade e latência)
+        """
+        trainer = self.get_trainer(symbol, region, create_if_missing=False)
+        
+        if trainer is None:
+            return {
+                "status": "error", 
+                "message": "Nenhum modelo treinado encontrado para este ativo."
+            }
+        
+        try:
+            report = trainer.export_policy(quantize=quantize)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Erro ao exportar modelo: {str(e)}"
+            }
+        
+        if not report["passed"]:
+            return {
+                "status": "error",
+                "message": "Modelo exportado diverge do original; exportação descartada.",
+                "report": report
+            }
+        return {"status": "success", "message": "Modelo exportado com sucesso.", "report": report}
+    
+    def get_available_models(self, symbol=None, region=None, order_by="created_at", limit=None, offset=0):
+        """
+        Obtém a lista de modelos disponíveis (do registro de modelos, sem listar o diretório).
+        
+        Args:
+            symbol: Filtra pelo símbolo exato
+            region: Filtra pela região
+            order_by: "created_at" (mais recentes primeiro), "profit" ou "reward" (melhores primeiro)
+            limit: Número máximo de modelos (None: todos)
+            offset: Modelos pulados (paginação)
+            
+        Returns:
+            Lista de modelos disponíveis
+        """
+        return self.model_registry.list_models(symbol, region, order_by=order_by, limit=limit, offset=offset)
 
 # Instância global do serviço
 ai_service = AIService()
@@ -274,7 +532,7 @@ if __name__ == "__main__":
     
     # Aguardar conclusão
     print("Aguardando conclusão do treinamento...")
-    while ai_service.get_training_status("BTC-USD")["status"] == "running":
+    while ai_service.get_training_status("BTC-USD")["status"] in ACTIVE_STATUSES:
         time.sleep(1)
     
     # Executar simulação
@@ -0,0 +1,132 @@
+# src/services/event_bus.py
+
+import itertools
+import json
+import queue
+import threading
+from src.services.shared_state import json_default
+
+MAX_QUEUED_EVENTS = 256      # Eventos pendentes por assinante; acima disso o assinante é desconectado
+MAX_SUBSCRIBERS = 200        # Conexões simultâneas (ex.: dashboards com SSE abertos)
+KEEPALIVE_SECONDS = 15       # Intervalo do comentário de keep-alive quando não há eventos
+
+
+class Subscription:
+    """Fila limitada de eventos de um assinante (um cliente SSE)."""
+
+    def __init__(self, topic, max_queue):
+        self.topic = topic
+        self.dropped = False
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def matches(self, topic):
+        """Assinar "training" recebe "training" e qualquer "training:<chave>"."""
+        return topic == self.topic or topic.startswith(f"{self.topic}:")
+
+    def offer(self, message):
+        """Entrega sem bloquear; se a fila estiver cheia, o assinante é marcado como lento."""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+    def get(self, timeout=None):
+        """Próxima mensagem SSE já formatada, ou None se nada chegou no intervalo."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Pub/sub em memória para eventos de progresso (treinamento e backtests).
+
+    `publish` formata o evento SSE uma única vez e só o copia para a fila de cada assinante,
+    sem nunca bloquear quem publica: o custo por espectador é só um `put_nowait`. Um
+    assinante que não consome rápido o bastante (fila cheia) é desconectado, e o cliente
+    reconecta e recomeça do estado atual. Sem assinantes, publicar não custa nada.
+    """
+
+    def __init__(self, max_queue=MAX_QUEUED_EVENTS, max_subscribers=MAX_SUBSCRIBERS):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.dropped_subscribers = 0
+
+    def subscribe(self, topic):
+        """
+        Registra um assinante de um tópico (e dos seus subtópicos "<tópico>:...").
+
+        Returns:
+            Subscription, ou None se o limite de assinantes foi atingido
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(topic, self.max_queue)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, topic, event_type, data):
+        """
+        Publica um evento para os assinantes do tópico.
+
+        Args:
+            topic: Tópico (ex.: "training:BTC-USD_US", "backtest:<id>")
+            event_type: Nome do evento SSE (ex.: "episode", "status", "progress")
+            data: Conteúdo serializável em JSON
+
+        Returns:
+            Número de assinantes que receberam o evento
+        """
+        with self._lock:
+            targets = [s for s in self._subscribers if s.matches(topic)]
+        if not targets:
+            return 0
+
+        payload = json.dumps({"topic": topic, **data}, default=json_default)
+        message = f"id: {next(self._ids)}\nevent: {event_type}\ndata: {payload}\n\n"
+        delivered = 0
+        for subscription in targets:
+            if subscription.offer(message):
+                delivered += 1
+            else:
+                self.unsubscribe(subscription)
+                self.dropped_subscribers += 1
+        return delivered
+
+    def stream(self, subscription, initial_events=(), keepalive=KEEPALIVE_SECONDS):
+        """
+        Gerador de texto SSE para uma resposta HTTP (`text/event-stream`).
+
+        Args:
+            subscription: Assinatura criada com subscribe()
+            initial_events: Eventos (tipo, dados) enviados antes dos publicados (ex.: estado atual)
+            keepalive: Segundos sem eventos até enviar um comentário de keep-alive
+        """
+        try:
+            yield f"retry: {keepalive * 1000}\n\n"
+            for event_type, data in initial_events:
+                yield f"event: {event_type}\ndata: {json.dumps(data, default=json_default)}\n\n"
+            while True:
+                if subscription.dropped:
+                    # Desconectado por lentidão: o cliente reconecta e recebe o estado atual
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                message = subscription.get(timeout=keepalive)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+# Instância global (eventos do processo atual)
+event_bus = EventBus()
@@ -0,0 +1,279 @@
+# src/services/shared_state.py
+
+import json
+import os
+import socket
+import sqlite3
+import time
+import numpy as np
+
+BUSY_TIMEOUT_SECONDS = 30    # Espera máxima por um lock de escrita do SQLite
+MAX_SIMULATIONS = 500        # Resultados de simulação mantidos (os mais antigos são apagados)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    description TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    progress TEXT,
+    error TEXT,
+    result TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_host TEXT NOT NULL,
+    owner_pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created_at);
+CREATE TABLE IF NOT EXISTS models (
+    key TEXT PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS simulations (
+    simulation_id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+_ACTIVE_STATUSES = ("queued", "running")
+
+
+def json_default(value):
+    """Converte tipos do numpy (np.float64, np.bool_, arrays) para JSON."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, default=json_default)
+
+
+def _loads(text):
+    return None if text is None else json.loads(text)
+
+
+class SharedAIState:
+    """Estado da IA compartilhado entre os processos do servidor (workers do gunicorn).
+
+    Um banco SQLite local (modo WAL) guarda os jobs de treinamento, a versão publicada do
+    modelo de cada ativo e os resultados das simulações. Qualquer worker pode consultar o
+    status de um treinamento iniciado em outro, pedir o seu cancelamento e recarregar o
+    modelo quando outro worker publica uma versão nova. Verificações seguidas de escrita
+    (um job ativo por ativo) rodam em transações `BEGIN IMMEDIATE`, serializadas pelo
+    lock de arquivo do próprio SQLite.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.host = socket.gethostname()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads e processos
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    # Jobs de treinamento
+
+    def claim_job(self, job):
+        """
+        Registra um job novo, desde que não haja outro ativo para o mesmo ativo em nenhum worker.
+
+        Args:
+            job: Dicionário de TrainingJob.to_dict()
+
+        Returns:
+            True se o job foi registrado; False se já existe um job ativo para a chave
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reap_orphans(conn)
+            active = conn.execute(
+                "SELECT 1 FROM jobs WHERE key = ? AND status IN (?, ?)", (job["key"], *_ACTIVE_STATUSES)
+            ).fetchone()
+            if active is not None:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO jobs (job_id, key, description, priority, status, progress, error, "
+                "owner_host, owner_pid, created_at, started_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["job_id"], job["key"], job["description"], job["priority"], job["status"],
+                 _dumps(job["progress"]), job["error"], self.host, os.getpid(),
+                 job["created_at"], job["started_at"], job["finished_at"])
+            )
+            conn.execute("COMMIT")
+        return True
+
+    def update_job(self, job, result=None):
+        """Atualiza estado, progresso e (no fim) o resultado de um job."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, error = ?, started_at = ?, finished_at = ?, "
+                "result = COALESCE(?, result) WHERE job_id = ?",
+                (job["status"], _dumps(job["progress"]), job["error"], job["started_at"],
+                 job["finished_at"], _dumps(result), job["job_id"])
+            )
+
+    def request_cancel(self, job_id):
+        """Marca o pedido de cancelamento; o worker dono do job o encerra. Retorna False se o job não está ativo."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status IN (?, ?)",
+                (job_id, *_ACTIVE_STATUSES)
+            )
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get_job(self, job_id, include_result=False):
+        with self._connect() as conn:
+            self._reap_orphans(conn)
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job_dict(row, include_result) if row else None
+
+    def latest_job(self, key, include_result=False):
+        """Job mais recente de uma chave (de qualquer worker), ou None."""
+        with self._connect() as conn:
+            self._reap_orphans(conn)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            ).fetchone()
+        return self._job_dict(row, include_result) if row else None
+
+    def list_jobs(self, status=None, limit=100):
+        """Lista os jobs de todos os workers (mais recentes primeiro)."""
+        with self._connect() as conn:
+            self._reap_orphans(conn)
+            if status is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def _reap_orphans(self, conn):
+        """Marca como falhos os jobs ativos cujo processo dono (nesta máquina) não existe mais."""
+        rows = conn.execute(
+            "SELECT job_id, owner_pid FROM jobs WHERE owner_host = ? AND status IN (?, ?)",
+            (self.host, *_ACTIVE_STATUSES)
+        ).fetchall()
+        for row in rows:
+            if not _pid_alive(row["owner_pid"]):
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                    ("O processo do servidor que executava o treinamento foi encerrado.", time.time(),
+                     row["job_id"], *_ACTIVE_STATUSES)
+                )
+
+    @staticmethod
+    def _job_dict(row, include_result=False):
+        job = {
+            "job_id": row["job_id"],
+            "key": row["key"],
+            "description": row["description"],
+            "priority": row["priority"],
+            "status": row["status"],
+            "progress": _loads(row["progress"]),
+            "error": row["error"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "owner": f"{row['owner_host']}:{row['owner_pid']}",
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+        if include_result:
+            job["result"] = _loads(row["result"])
+        return job
+
+    # Versões de modelo
+
+    def publish_model(self, key, model_name):
+        """Publica um modelo novo para a chave e retorna o número da versão."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT version FROM models WHERE key = ?", (key,)).fetchone()
+            version = (row["version"] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO models (key, model_name, version, updated_at) VALUES (?, ?, ?, ?)",
+                (key, model_name, version, time.time())
+            )
+            conn.execute("COMMIT")
+        return version
+
+    def model_version(self, key):
+        """Versão publicada do modelo de uma chave: {"model_name", "version", "updated_at"} ou None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM models WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"model_name": row["model_name"], "version": row["version"], "updated_at": row["updated_at"]}
+
+    # Resultados de simulação
+
+    def save_simulation(self, simulation_id, key, results):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO simulations (simulation_id, key, results, created_at) VALUES (?, ?, ?, ?)",
+                (simulation_id, key, _dumps(results), time.time())
+            )
+            conn.execute(
+                "DELETE FROM simulations WHERE simulation_id NOT IN "
+                "(SELECT simulation_id FROM simulations ORDER BY created_at DESC LIMIT ?)",
+                (MAX_SIMULATIONS,)
+            )
+
+    def get_simulation(self, simulation_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT results FROM simulations WHERE simulation_id = ?", (simulation_id,)).fetchone()
+        return _loads(row["results"]) if row else None
+
+
+class _Connection:
+    """Conexão SQLite usada como contexto: sempre fechada na saída (e a transação desfeita em caso de erro)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, *args):
+        return self._conn.execute(*args)
+
+    def executescript(self, script):
+        return self._conn.executescript(script)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+        self._conn.close()
+        return False
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,129 @@
+# src/services/simulation_store.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from src.services.shared_state import json_default
+
+DEFAULT_MAX_IN_MEMORY = 64   # Resultados mantidos em memória (os demais ficam só em disco)
+DEFAULT_MAX_ON_DISK = 1000   # Arquivos de resultado mantidos em disco (os mais antigos são apagados)
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+def simulation_id_for(key):
+    """
+    ID determinístico de uma simulação a partir da sua chave (TradingTrainer.simulation_key).
+
+    Chaves iguais (mesmo modelo, mesmos dados, mesmos parâmetros) dão o mesmo ID, então o
+    ID serve tanto para consultar o resultado quanto para reaproveitá-lo.
+    """
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=json_default).encode()).hexdigest()[:16]
+    symbol, region = (re.sub(r"[^A-Za-z0-9.-]", "-", str(key[name])) for name in ("symbol", "region"))
+    return f"{symbol}_{region}_{digest}"
+
+
+class JsonSimulationFiles:
+    """Resultados de simulação em arquivos JSON (um por simulação), usado sem o estado compartilhado.
+
+    Mesma interface de SharedAIState (`save_simulation`/`get_simulation`); os arquivos são
+    gravados de forma atômica e só os `max_files` mais recentes são mantidos.
+    """
+
+    def __init__(self, directory, max_files=DEFAULT_MAX_ON_DISK):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, simulation_id):
+        return os.path.join(self.directory, f"{simulation_id}.json")
+
+    def save_simulation(self, simulation_id, key, results):
+        path = self._path(simulation_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "results": results}, f, default=json_default)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def get_simulation(self, simulation_id):
+        try:
+            with open(self._path(simulation_id), "r") as f:
+                return json.load(f)["results"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _prune(self):
+        with os.scandir(self.directory) as entries:
+            files = [entry for entry in entries if entry.name.endswith(".json")]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SimulationStore:
+    """Memoização dos resultados de simulação, com memória limitada.
+
+    Os resultados ficam em um LRU de no máximo `max_in_memory` entradas; cada resultado novo
+    também é gravado no armazenamento em disco (`backing`: o SQLite compartilhado entre os
+    workers ou JsonSimulationFiles), de onde os que saíram da memória são relidos. Como o
+    ID da simulação é derivado da sua chave, repetir uma simulação é só uma consulta.
+    """
+
+    def __init__(self, backing, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+        self.backing = backing
+        self.max_in_memory = max_in_memory
+        self._results = OrderedDict()  # simulation_id -> resultados (menos usado primeiro)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, simulation_id):
+        """
+        Resultado de uma simulação (da memória ou do disco).
+
+        Returns:
+            Cópia do dicionário de resultados, ou None se não existir
+        """
+        if not simulation_id or not _SAFE_ID.match(simulation_id):
+            return None
+        with self._lock:
+            results = self._results.get(simulation_id)
+            if results is not None:
+                self._results.move_to_end(simulation_id)
+        if results is None:
+            results = self.backing.get_simulation(simulation_id)
+            if results is None:
+                self.misses += 1
+                return None
+            self._remember(simulation_id, results)
+        self.hits += 1
+        return dict(results)
+
+    def put(self, simulation_id, key, results):
+        """Guarda um resultado novo (memória e disco)."""
+        self.backing.save_simulation(simulation_id, key, results)
+        self._remember(simulation_id, results)
+
+    def _remember(self, simulation_id, results):
+        with self._lock:
+            self._results[simulation_id] = results
+            self._results.move_to_end(simulation_id)
+            while len(self._results) > self.max_in_memory:
+                self._results.popitem(last=False)
+
+    def stats(self):
+        return {
+            "in_memory": len(self._results),
+            "max_in_memory": self.max_in_memory,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,148 @@
+# src/services/trainer_cache.py
+
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from src.rl_agent.trainer import TradingTrainer
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024   # 1 GB somando os treinadores em memória
+
+
+class TrainerCache:
+    """Treinadores em memória com orçamento de bytes e remoção do menos usado (LRU).
+
+    Acima do orçamento, os treinadores ociosos usados há mais tempo são gravados em
+    `spill_dir/<chave>` (`TradingTrainer.save_state`: agente completo, parâmetros e histórico)
+    e saem da memória; o próximo acesso os recria com `TradingTrainer.load_state`. Enquanto a
+    gravação não termina o treinador continua acessível, e se ela falhar ele volta para a
+    memória (só gravações concluídas contam como "em disco"). Treinadores
+    com job ativo (`is_busy(chave)`) e o último acessado nunca são removidos. O tamanho de
+    cada treinador é reestimado a cada verificação, pois a memória de replay cresce no treino.
+    Tem a interface de dicionário usada pelo AIService (`in`, `get`, `[]`).
+    """
+
+    def __init__(self, spill_dir, max_bytes=DEFAULT_MAX_BYTES, is_busy=None):
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.is_busy = is_busy or (lambda key: False)
+        self._trainers = OrderedDict()  # chave -> treinador (menos usado primeiro)
+        self._spilling = {}  # chave -> gravação em disco em andamento ({"trainer", "done", "error"})
+        self._spilled = set()  # chaves gravadas em disco por este processo
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.rehydrations = 0
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, key.replace(os.sep, "_"))
+
+    def __contains__(self, key):
+        with self._lock:
+            self._collect_spills()
+            return key in self._trainers or key in self._spilling or key in self._spilled
+
+    def __getitem__(self, key):
+        trainer = self.get(key)
+        if trainer is None:
+            raise KeyError(key)
+        return trainer
+
+    def __setitem__(self, key, trainer):
+        with self._lock:
+            self._collect_spills()
+            self._spilling.pop(key, None)
+            self._trainers[key] = trainer
+            self._trainers.move_to_end(key)
+            self._spilled.discard(key)
+            self._enforce_budget()
+
+    def get(self, key, default=None):
+        """Treinador da chave (recriado do disco se tinha sido removido da memória)."""
+        with self._lock:
+            self._collect_spills()
+            if key in self._trainers:
+                self._trainers.move_to_end(key)
+                return self._trainers[key]
+            if key in self._spilling:
+                # Ainda sendo gravado: volta para a memória (a gravação em andamento é descartada)
+                trainer = self._spilling.pop(key)["trainer"]
+                self[key] = trainer
+                return trainer
+            if key not in self._spilled:
+                return default
+
+            try:
+                trainer = TradingTrainer.load_state(self._spill_path(key))
+            except Exception as e:
+                print(f"Erro ao recarregar treinador {key}: {e}")
+                self._spilled.discard(key)
+                return default
+            self.rehydrations += 1
+            self[key] = trainer
+            return trainer
+
+    def memory_usage(self):
+        """Bytes estimados de cada treinador em memória."""
+        with self._lock:
+            self._collect_spills()
+            return {key: trainer.memory_footprint() for key, trainer in self._trainers.items()}
+
+    def stats(self):
+        usage = self.memory_usage()
+        return {
+            "in_memory": len(usage),
+            "spilled": len(self._spilled),
+            "bytes": sum(usage.values()),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations
+        }
+
+    def _enforce_budget(self):
+        usage = self.memory_usage()
+        total = sum(usage.values())
+        most_recent = next(reversed(self._trainers), None)
+        for key in list(self._trainers):
+            if total <= self.max_bytes:
+                break
+            if key == most_recent or self.is_busy(key):
+                continue
+            self._evict(key)
+            total -= usage[key]
+
+    def _evict(self, key):
+        """Grava o treinador em disco (em segundo plano); ele sai da memória quando a gravação termina."""
+        trainer = self._trainers.pop(key)
+        spill_path = self._spill_path(key)
+        self._spilled.discard(key)
+        spill = {"trainer": trainer, "done": threading.Event(), "error": None}
+        self._spilling[key] = spill
+        try:
+            shutil.rmtree(spill_path, ignore_errors=True)
+            trainer.save_state(spill_path, wait=False, done_callback=lambda job: _spill_done(spill, job))
+        except Exception as e:
+            spill["error"] = e
+            spill["done"].set()
+        self.evictions += 1
+
+    def _collect_spills(self):
+        """Processa as gravações concluídas: a chave passa a estar em disco, ou o treinador volta à memória se a gravação falhou."""
+        for key, spill in list(self._spilling.items()):
+            if not spill["done"].is_set():
+                continue
+            del self._spilling[key]
+            if spill["error"] is None:
+                self._spilled.add(key)
+                continue
+            print(f"Erro ao gravar treinador {key} antes de removê-lo da memória: {spill['error']}")
+            self._trainers[key] = spill["trainer"]
+            self._trainers.move_to_end(key, last=False)
+
+
+def _spill_done(spill, job):
+    """Callback da gravação (thread do checkpoint_writer): só registra o resultado, sem tomar o lock do cache."""
+    try:
+        job.wait()
+    except Exception as e:
+        spill["error"] = e
+    spill["done"].set()
@@ -0,0 +1,96 @@
+# src/services/training_history.py
+
+from bisect import bisect_right
+import numpy as np
+
+# Séries por episódio do histórico de treinamento (TradingTrainer.training_history)
+HISTORY_SERIES = ("episodes", "rewards", "balances", "profits", "steps", "epsilon")
+DEFAULT_CHART_POINTS = 200   # Pontos por série no histórico reduzido para gráficos
+SUMMARY_WINDOW = 10          # Episódios usados nas médias recentes do resumo
+
+
+def _complete_length(history):
+    """Número de episódios com todas as séries preenchidas (o treinamento pode estar acrescentando um agora)."""
+    return min(len(history.get(key, [])) for key in HISTORY_SERIES)
+
+
+def last_episode(history):
+    """Último episódio completo do histórico (o cursor para a próxima consulta), ou None."""
+    count = _complete_length(history)
+    return history["episodes"][count - 1] if count else None
+
+
+def history_since(history, since_episode=None):
+    """
+    Entradas do histórico posteriores a um episódio (cursor).
+
+    Args:
+        history: Histórico de treinamento
+        since_episode: Último episódio que o cliente já tem (None: histórico inteiro)
+
+    Returns:
+        Dicionário com as mesmas séries, só com os episódios > since_episode
+    """
+    end = _complete_length(history)
+    episodes = history.get("episodes", [])[:end]
+    start = 0 if since_episode is None else bisect_right(episodes, since_episode)
+    return {key: list(history.get(key, [])[start:end]) for key in HISTORY_SERIES}
+
+
+def downsample_history(history, max_points=DEFAULT_CHART_POINTS):
+    """
+    Reduz o histórico a no máximo `max_points` pontos por série, para gráficos.
+
+    Os episódios são agrupados em blocos consecutivos; cada ponto é a média do bloco
+    (o episódio do ponto é o último do bloco, e o mínimo e o máximo do lucro são mantidos).
+
+    Returns:
+        Dicionário com as séries reduzidas e "profits_min"/"profits_max" por bloco
+    """
+    count = _complete_length(history)
+    episodes = history.get("episodes", [])[:count]
+    if count <= max_points:
+        reduced = {key: list(history.get(key, [])[:count]) for key in HISTORY_SERIES}
+        reduced["profits_min"] = reduced["profits_max"] = reduced["profits"]
+        return reduced
+
+    bounds = np.linspace(0, count, max_points + 1).astype(int)
+    reduced = {"episodes": [int(episodes[end - 1]) for end in bounds[1:]]}
+    for key in HISTORY_SERIES[1:]:
+        values = np.asarray(history.get(key, [])[:count], dtype=np.float64)
+        reduced[key] = np.add.reduceat(values, bounds[:-1]) / np.diff(bounds)
+        reduced[key] = reduced[key].round(6).tolist()
+    profits = np.asarray(history.get("profits", [])[:count], dtype=np.float64)
+    reduced["profits_min"] = np.minimum.reduceat(profits, bounds[:-1]).tolist()
+    reduced["profits_max"] = np.maximum.reduceat(profits, bounds[:-1]).tolist()
+    return reduced
+
+
+def summarize_history(history, window=SUMMARY_WINDOW):
+    """
+    Resumo compacto do histórico (tamanho fixo, independente do número de episódios).
+
+    Returns:
+        Dicionário com o último episódio, métricas do último episódio, médias recentes,
+        melhor lucro e as taxas do treinamento
+    """
+    count = _complete_length(history)
+    if count == 0:
+        return {"episodes_done": 0, "last_episode": None}
+
+    episodes = history["episodes"][:count]
+    profits = history["profits"][:count]
+    best = int(np.argmax(profits))
+    timings = history.get("timings") or {}
+    return {
+        "episodes_done": count,
+        "last_episode": episodes[-1],
+        "last": {key: history[key][count - 1] for key in HISTORY_SERIES[1:]},
+        "recent_mean_reward": float(np.mean(history["rewards"][max(0, count - window):count])),
+        "recent_mean_profit": float(np.mean(profits[max(0, count - window):])),
+        "best_profit": float(profits[best]),
+        "best_episode": episodes[best],
+        "elapsed_seconds": timings.get("elapsed_seconds"),
+        "steps_per_second": timings.get("steps_per_second"),
+        "updates_per_second": timings.get("updates_per_second")
+    }
@@ -0,0 +1,230 @@
+# src/services/training_scheduler.py
+
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+
+try:
+    import torch
+except ImportError:  # O agendador funciona sem torch (só não limita as threads)
+    torch = None
+
+DEFAULT_MAX_WORKERS = 2   # Treinamentos executados ao mesmo tempo; os demais esperam na fila
+
+# Estados de um job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class TrainingJob:
+    """Um treinamento agendado: estado, progresso e pedido de cancelamento."""
+
+    def __init__(self, key, fn, priority=0, description=None, store=None, events=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.fn = fn
+        self.priority = priority
+        self.description = description
+        self.status = QUEUED
+        self.progress = {"episode": 0, "episodes": None, "fraction": 0.0, "last": None, "timings": None}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.store = store  # SharedAIState opcional: espelha o job para os outros workers do servidor
+        self.events = events  # EventBus opcional: publica progresso e mudanças de estado em "training:<chave>"
+        self._cancel_event = threading.Event()
+
+    def should_stop(self):
+        """Usado como `should_stop` do TradingTrainer.train: True depois de cancel() (neste ou em outro worker)."""
+        if not self._cancel_event.is_set() and self.store is not None and self.store.cancel_requested(self.job_id):
+            self._cancel_event.set()
+        return self._cancel_event.is_set()
+
+    def report_progress(self, episode, episodes, metrics=None, timings=None):
+        """Usado como `progress_callback` do TradingTrainer.train."""
+        self.progress = {
+            "episode": episode,
+            "episodes": episodes,
+            "fraction": round(episode / episodes, 4) if episodes else 0.0,
+            "last": metrics,
+            "timings": timings
+        }
+        self.persist(event="episode")
+
+    def persist(self, result=None, event="status"):
+        """Grava o estado atual no armazenamento compartilhado e avisa os assinantes de eventos, se houver."""
+        if self.store is not None:
+            self.store.update_job(self.to_dict(), result=result)
+        if self.events is not None:
+            data = {"job_id": self.job_id, **self.progress} if event == "episode" else self.to_dict()
+            self.events.publish(f"training:{self.key}", event, data)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "key": self.key,
+            "description": self.description,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class TrainingScheduler:
+    """Executa treinamentos em um pool limitado de threads, em ordem de prioridade.
+
+    Jobs com a mesma prioridade saem na ordem de chegada (FIFO); prioridades menores saem
+    primeiro. Cada job recebe a função `fn(job)`, que deve repassar `job.report_progress` e
+    `job.should_stop` ao treinamento. O número de threads do torch é dividido entre os
+    workers para que treinamentos simultâneos não disputem os mesmos núcleos.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, torch_threads=None, max_finished=100):
+        self.max_workers = max(1, int(max_workers))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.max_workers)
+        self.max_finished = max_finished
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._jobs = {}  # job_id -> TrainingJob (na ordem de submissão)
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            if torch is not None:
+                # Orçamento de threads por job (o pool intra-op do torch é do processo inteiro)
+                torch.set_num_threads(self.torch_threads)
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._run, name=f"training-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, key, fn, priority=0, description=None, store=None, events=None):
+        """
+        Coloca um treinamento na fila.
+
+        Args:
+            key: Identificador do recurso treinado (ex.: "BTC-USD_US"); só um job ativo por chave
+            fn: Função chamada com o job (`fn(job)`); o retorno fica em `job.result`
+            priority: Prioridade (menor sai primeiro; empates em ordem de chegada)
+            description: Texto livre exibido no status
+            store: SharedAIState opcional; o job só é aceito se nenhum worker tiver outro ativo para a chave
+            events: EventBus opcional para o progresso ao vivo (SSE)
+
+        Returns:
+            O TrainingJob criado
+
+        Raises:
+            ValueError: Se já existir um job na fila ou em execução para a mesma chave
+        """
+        with self._lock:
+            active = self._active_job(key)
+            if active is not None:
+                raise ValueError(f"Já existe um treinamento {active.status} para {key} ({active.job_id}).")
+            job = TrainingJob(key, fn, priority=priority, description=description, store=store, events=events)
+            if store is not None and not store.claim_job(job.to_dict()):
+                raise ValueError(f"Já existe um treinamento em andamento para {key} em outro worker.")
+            self._jobs[job.job_id] = job
+            self._prune_finished()
+        self._ensure_workers()
+        self._queue.put((priority, next(self._counter), job))
+        if events is not None:
+            events.publish(f"training:{key}", "status", job.to_dict())
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancela um job. Na fila, ele é descartado na hora; em execução, o treinamento para no
+        início do próximo episódio (gravando um checkpoint retomável).
+
+        Returns:
+            O job, ou None se não existir
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATUSES:
+                job._cancel_event.set()
+                if job.status == QUEUED:
+                    job.status = CANCELLED
+                    job.finished_at = time.time()
+        job.persist()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def latest_job(self, key):
+        """Job mais recente de uma chave (ativo ou não), ou None."""
+        with self._lock:
+            for job in reversed(list(self._jobs.values())):
+                if job.key == key:
+                    return job
+        return None
+
+    def list_jobs(self, status=None):
+        """Lista os jobs (mais recentes primeiro), opcionalmente filtrando pelo estado."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs) if status is None or job.status == status]
+
+    def _active_job(self, key):
+        for job in self._jobs.values():
+            if job.key == key and job.status in ACTIVE_STATUSES:
+                return job
+        return None
+
+    def _prune_finished(self):
+        """Mantém no histórico só os `max_finished` jobs encerrados mais recentes."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            try:
+                cancelled = job.status == QUEUED and job.should_stop()  # Cancelado por outro worker
+                with self._lock:
+                    if cancelled:
+                        job.status = CANCELLED
+                        job.finished_at = time.time()
+                    if job.status != QUEUED:  # Cancelado enquanto esperava
+                        job.persist()
+                        continue
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                job.persist()
+                try:
+                    job.result = job.fn(job)
+                    status = CANCELLED if job.should_stop() else DONE
+                except Exception as e:
+                    job.error = str(e)
+                    status = FAILED
+                    print(f"Erro no treinamento {job.key} ({job.job_id}): {e}")
+                with self._lock:
+                    job.status = status
+                    job.finished_at = time.time()
+                job.persist(result=job.result)
+            finally:
+                self._queue.task_done()
+
+
+# Instância global do agendador
+training_scheduler = TrainingScheduler()
@@ -0,0 +1,140 @@
+# src/services/training_worker.py
+
+import io
+import torch
+import torch.multiprocessing as mp
+
+POLL_INTERVAL = 0.5        # Segundos entre verificações de mensagens e de cancelamento
+STOP_TIMEOUT = 30          # Segundos para o processo terminar depois de enviar o resultado
+
+
+def trainer_config(trainer):
+    """Argumentos para recriar um TradingTrainer equivalente em outro processo."""
+    return {
+        "symbol": trainer.symbol,
+        "region": trainer.region,
+        "interval": trainer.interval,
+        "range_period": trainer.range_period,
+        "initial_balance": trainer.initial_balance,
+        "trade_amount": trainer.trade_amount,
+        "target_profit_abs": trainer.target_profit_abs,
+        "stop_loss_abs": trainer.stop_loss_abs,
+        "sma_window": trainer.sma_window,
+        "max_steps": trainer.max_steps,
+        "model_dir": trainer.model_dir,
+        "agent_params": trainer.agent_params,
+        "compact_replay": trainer.compact_replay
+    }
+
+
+def _agent_state_bytes(agent):
+    """Pesos, otimizador e epsilon atuais do agente, serializados para o processo de treinamento."""
+    buffer = io.BytesIO()
+    torch.save(agent.checkpoint_state(), buffer)
+    return buffer.getvalue()
+
+
+def _training_process(config, agent_state, train_kwargs, torch_threads, conn, stop_event):
+    """Processo de treinamento: recria o treinador, treina e envia progresso e resultado pelo pipe.
+
+    Mensagens (tuplas pequenas, uma por episódio):
+    ("episode", episódio, total, métricas, tempos), ("done", histórico, modelo final ou None)
+    e ("error", mensagem).
+    """
+    from src.rl_agent.trainer import TradingTrainer
+
+    torch.set_num_threads(torch_threads)
+    try:
+        trainer = TradingTrainer(**config)
+        # Começa dos mesmos pesos que o processo do servidor tinha carregado
+        state = torch.load(io.BytesIO(agent_state), map_location=trainer.agent.device)
+        trainer.agent.model.load_state_dict(state["model_state_dict"])
+        trainer.agent.target_model.load_state_dict(state["target_model_state_dict"])
+        trainer.agent.optimizer.load_state_dict(state["optimizer_state_dict"])
+        trainer.agent.epsilon = state["epsilon"]
+
+        def progress(episode, episodes, metrics):
+            conn.send(("episode", episode, episodes, metrics, trainer.training_history.get("timings")))
+
+        history = trainer.train(progress_callback=progress, should_stop=stop_event.is_set, **train_kwargs)
+        final_model = None if stop_event.is_set() else f"{trainer.symbol}_final"
+        conn.send(("done", history, final_model))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_training_process(trainer, job, train_kwargs, torch_threads=1):
+    """
+    Executa `trainer.train` em um processo separado (spawn) e acompanha o progresso.
+
+    Chamado pela thread do agendador, que só espera mensagens no pipe: o treinamento (torch e
+    ambiente) não disputa o GIL com as requisições do servidor. O progresso de cada episódio vai
+    para `job.report_progress` e para `trainer.training_history`; `job.should_stop()` é repassado
+    ao processo. No fim, o histórico completo substitui o local e o modelo final gravado pelo
+    processo é carregado em `trainer`.
+
+    Args:
+        trainer: TradingTrainer do servidor (fornece a configuração e os pesos iniciais)
+        job: TrainingJob do agendador
+        train_kwargs: Argumentos de TradingTrainer.train (episodes, resume, ...)
+        torch_threads: Threads do torch no processo de treinamento
+
+    Returns:
+        Histórico de treinamento
+    """
+    ctx = mp.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    stop_event = ctx.Event()
+    process = ctx.Process(
+        target=_training_process,
+        args=(trainer_config(trainer), _agent_state_bytes(trainer.agent), train_kwargs,
+              torch_threads, child_conn, stop_event),
+        daemon=True
+    )
+    process.start()
+    child_conn.close()
+
+    # Histórico ao vivo deste treinamento (substituído pelo completo no fim)
+    history = {key: [] for key in ("episodes", "rewards", "balances", "profits", "steps", "epsilon")}
+    trainer.training_history = history
+    result = None
+    try:
+        while result is None:
+            if job.should_stop() and not stop_event.is_set():
+                stop_event.set()
+            if not parent_conn.poll(POLL_INTERVAL):
+                if not process.is_alive() and not parent_conn.poll():
+                    raise RuntimeError(f"O processo de treinamento terminou sem resultado "
+                                       f"(código {process.exitcode}).")
+                continue
+
+            message = parent_conn.recv()
+            if message[0] == "episode":
+                _, episode, episodes, metrics, timings = message
+                job.report_progress(episode, episodes, metrics, timings)
+                history["episodes"].append(episode)
+                history["rewards"].append(metrics["reward"])
+                history["balances"].append(metrics["balance"])
+                history["profits"].append(metrics["profit"])
+                history["steps"].append(metrics["steps"])
+                history["epsilon"].append(metrics["epsilon"])
+                history["timings"] = timings
+            elif message[0] == "error":
+                raise RuntimeError(message[1])
+            else:
+                result = message
+    finally:
+        stop_event.set()  # Sem efeito se o processo já terminou
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+        parent_conn.close()
+
+    _, history, final_model = result
+    trainer.training_history = history
+    if final_model is not None:
+        # Usar no servidor o modelo que acabou de ser treinado
+        trainer.load_model(final_model)
+    return history
@@ -1,5 +1,6 @@
 # src/rl_env/trading_env.py
 
+import hashlib
 import gymnasium as gym
 import numpy as np
 import pandas as pd
@@ -13,53 +14,160 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from services.data_service import get_historical_data
 
-class TradingEnv(gym.Env):
-    """Ambiente customizado para simulação de trading com Aprendizado por Reforço."""
-    metadata = {"render_modes": ["human"], "render_fps": 30}
+MAX_CACHED_DATASETS = 32  # Conjuntos de dados preparados mantidos em memória (por processo)
+_dataset_cache = {}  # (símbolo, região, intervalo, período, janela SMA) -> (dados brutos, MarketDataset)
 
-    def __init__(self, symbol="PETR4.SA", region="BR", interval="1d", range_period="1y", 
-                 initial_balance=10000, trade_amount=1000, 
-                 target_profit_abs=330, stop_loss_abs=600, 
-                 sma_window=20, max_steps=None, render_mode=None):
-        super().__init__()
 
+class MarketDataset:
+    """Dados de mercado de um ambiente, já preparados: OHLCV sem NaN, colunas minúsculas e SMA.
+
+    É imutável e compartilhado por todos os ambientes com os mesmos dados (treino, simulações,
+    cópias em avaliação); o que muda entre episódios (saldo, valor por operação, meta e stop)
+    fica no TradingEnv. `version` identifica o conteúdo (muda quando o data_service entrega
+    candles novos).
+    """
+
+    def __init__(self, df, symbol, region, interval, range_period, sma_window):
         self.symbol = symbol
         self.region = region
         self.interval = interval
         self.range_period = range_period
-        self.initial_balance = initial_balance
-        self.trade_amount = trade_amount # Valor fixo por operação (usado repetidamente)
-        
-        # Metas em valores absolutos (R$)
-        self.target_profit_abs = target_profit_abs
-        self.stop_loss_abs = stop_loss_abs
-        
         self.sma_window = sma_window
-        self.render_mode = render_mode
+        self.df = self._prepare(df, sma_window)
+
+        # Colunas usadas a cada passo, como arrays somente leitura
+        self.close = self.df["close"].to_numpy(dtype=np.float64)
+        self.features = self.df[["close", "sma"]].to_numpy(dtype=np.float32)
+        self.close.flags.writeable = False
+        self.features.flags.writeable = False
+        self.max_price = float(self.close.max()) if len(self.close) else 0.0
+        self.version = hashlib.sha1(
+            np.ascontiguousarray(self.df[["close", "sma"]].to_numpy(dtype=np.float64)).tobytes()
+        ).hexdigest()[:16]
+
+    @staticmethod
+    def _prepare(df, sma_window):
+        """Copia os dados brutos (o DataFrame do cache do data_service não é alterado) e calcula a SMA."""
+        # Remover linhas com NaN que podem surgir no início
+        df = df.dropna()
+        # Resetar índice para garantir acesso numérico
+        df = df.reset_index()
+        # Renomear colunas para minúsculas para consistência
+        df.columns = [str(col).lower() for col in df.columns]
+        if "close" not in df.columns:
+            raise ValueError("Coluna 'close' não encontrada nos dados.")
+        df["sma"] = df["close"].rolling(window=sma_window).mean()
+        # Remover NaNs gerados pelo rolling mean inicial e resetar o índice novamente
+        return df.dropna().reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.df)
+
+
+def get_market_dataset(symbol, region="BR", interval="1d", range_period="1y", sma_window=20):
+    """
+    Conjunto de dados preparado para um ativo, reaproveitado entre ambientes.
+
+    Os dados brutos vêm do data_service (com o cache dele); a preparação (dropna, índice, SMA)
+    só é refeita quando o data_service devolve dados novos.
+
+    Returns:
+        MarketDataset, ou None se os dados não puderem ser carregados
+    """
+    key = (symbol, region, interval, range_period, sma_window)
+    try:
+        raw = get_historical_data(symbol, region, interval, range_period)
+    except Exception as e:
+        print(f"Erro ao carregar dados no ambiente: {e}")
+        return None
+    if raw is None or raw.empty:
+        return None
+
+    cached = _dataset_cache.get(key)
+    if cached is not None and cached[0] is raw:
+        return cached[1]
+
+    dataset = MarketDataset(raw, symbol, region, interval, range_period, sma_window)
+    _dataset_cache.pop(key, None)
+    _dataset_cache[key] = (raw, dataset)
+    while len(_dataset_cache) > MAX_CACHED_DATASETS:
+        del _dataset_cache[next(iter(_dataset_cache))]
+    return dataset
 
-        # Carregar dados históricos
-        self.df = self._load_data()
-        if self.df is None or self.df.empty:
+
+class TradingEnv(gym.Env):
+    """Ambiente customizado para simulação de trading com Aprendizado por Reforço.
+
+    Os dados (MarketDataset) são carregados uma vez e compartilhados; os parâmetros econômicos
+    podem ser trocados com `configure` sem recarregar nada.
+    """
+    metadata = {"render_modes": ["human"], "render_fps": 30}
+
+    def __init__(self, symbol="PETR4.SA", region="BR", interval="1d", range_period="1y", 
+                 initial_balance=10000, trade_amount=1000, 
+                 target_profit_abs=330, stop_loss_abs=600, 
+                 sma_window=20, max_steps=None, render_mode=None, dataset=None):
+        super().__init__()
+
+        # Carregar dados históricos (ou usar um conjunto já preparado)
+        if dataset is None:
+            dataset = get_market_dataset(symbol, region, interval, range_period, sma_window)
+        if dataset is None or len(dataset) == 0:
             raise ValueError("Não foi possível carregar os dados históricos.")
-        
-        # Calcular SMA
-        self._calculate_sma()
+        self.dataset = dataset
+        self.df = dataset.df  # Somente leitura: compartilhado com outros ambientes
+
+        self.symbol = dataset.symbol
+        self.region = dataset.region
+        self.interval = dataset.interval
+        self.range_period = dataset.range_period
+        self.sma_window = dataset.sma_window
+        self.render_mode = render_mode
         
         # Definir o número máximo de passos (se não fornecido, usa o tamanho dos dados)
         self.max_steps = max_steps if max_steps is not None else len(self.df) - self.sma_window - 1
         if self.max_steps <= 0:
             raise ValueError("Dados insuficientes para o número de passos ou janela SMA.")
+        self.end_step = self.max_steps # Último passo do episódio (reset pode começar em outro ponto)
 
         # Espaço de Ação: 0=Manter, 1=Comprar, 2=Vender
         self.action_space = spaces.Discrete(3)
 
+        # Parâmetros econômicos, espaço de observação e estado do ambiente
+        self.configure(initial_balance, trade_amount, target_profit_abs, stop_loss_abs)
+
+    def configure(self, initial_balance=None, trade_amount=None, target_profit_abs=None, stop_loss_abs=None):
+        """
+        Troca os parâmetros econômicos do ambiente (sem recarregar os dados) e o reseta.
+        Parâmetros None mantêm o valor atual.
+
+        Args:
+            initial_balance: Saldo inicial
+            trade_amount: Valor de cada operação individual
+            target_profit_abs: Meta de lucro em valor absoluto (R$)
+            stop_loss_abs: Stop loss em valor absoluto (R$)
+
+        Returns:
+            O próprio ambiente
+        """
+        if initial_balance is not None:
+            self.initial_balance = initial_balance
+        if trade_amount is not None:
+            self.trade_amount = trade_amount # Valor fixo por operação (usado repetidamente)
+        
+        # Metas em valores absolutos (R$)
+        if target_profit_abs is not None:
+            self.target_profit_abs = target_profit_abs
+        if stop_loss_abs is not None:
+            self.stop_loss_abs = stop_loss_abs
+
         # Espaço de Observação:
         # [Preço Atual (Close), SMA, Posição Atual (0=nenhuma, 1=comprado), Saldo Normalizado]
         # Normalizar saldo e preço pode ser útil, mas começaremos sem normalização complexa
         # Usaremos Box com limites razoáveis. Ajustar conforme necessário.
         # Limites inferiores: [0, 0, 0, 0]
         # Limites superiores: [Preço Máximo Histórico * 2, Preço Máximo Histórico * 2, 1, Saldo Inicial * 10]
-        max_price = self.df["close"].max() * 2
+        max_price = self.dataset.max_price * 2
         max_balance = self.initial_balance * 10
         self.observation_space = spaces.Box(
             low=np.array([0, 0, 0, 0], dtype=np.float32),
@@ -69,32 +177,7 @@ class TradingEnv(gym.Env):
 
         # Estado do ambiente
         self.reset()
-
-    def _load_data(self):
-        """Carrega os dados históricos usando o data_service."""
-        try:
-            df = get_historical_data(self.symbol, self.region, self.interval, self.range_period)
-            # Remover linhas com NaN que podem surgir no início
-            df.dropna(inplace=True)
-            # Resetar índice para garantir acesso numérico
-            df.reset_index(inplace=True)
-            # Renomear colunas para minúsculas para consistência
-            df.columns = [col.lower() for col in df.columns]
-            return df
-        except Exception as e:
-            print(f"Erro ao carregar dados no ambiente: {e}")
-            return None
-
-    def _calculate_sma(self):
-        """Calcula a Média Móvel Simples (SMA)."""
-        if "close" in self.df.columns:
-            self.df["sma"] = self.df["close"].rolling(window=self.sma_window).mean()
-            # Remover NaNs gerados pelo rolling mean inicial
-            self.df.dropna(inplace=True)
-            # Resetar índice novamente após dropna
-            self.df.reset_index(drop=True, inplace=True)
-        else:
-            raise ValueError("Coluna 'close' não encontrada nos dados.")
+        return self
 
     def _get_observation(self):
         """Retorna a observação atual do ambiente."""
@@ -126,6 +209,14 @@ class TradingEnv(gym.Env):
             
         return observation
 
+    def observation_arrays(self):
+        """Colunas fixas das observações (preço e SMA por passo) e os limites do espaço de observação.
+
+        Permite remontar qualquer observação a partir do passo, da posição e do saldo
+        (usado pela memória de replay compacta do agente).
+        """
+        return self.dataset.features, self.observation_space.low, self.observation_space.high
+
     def _get_info(self):
         """Retorna informações adicionais sobre o estado."""
         return {
@@ -146,7 +237,11 @@ class TradingEnv(gym.Env):
 
         self.balance = self.initial_balance
         self.initial_episode_balance = self.initial_balance  # Saldo no início deste episódio
-        self.current_step = 0 # Começa no primeiro ponto de dado VÁLIDO após cálculo da SMA
+        # Começa no primeiro ponto de dado VÁLIDO após cálculo da SMA, ou em options["start_step"]
+        # (início deslocado, usado na avaliação); o episódio dura no máximo max_steps passos
+        start_step = int((options or {}).get("start_step", 0))
+        self.current_step = start_step
+        self.end_step = min(start_step + self.max_steps, len(self.df))
         self.position = 0
         self.entry_price = 0
         self.shares_held = 0
@@ -221,7 +316,7 @@ class TradingEnv(gym.Env):
             
         # --- Avançar Tempo e Verificar Fim dos Dados ---
         self.current_step += 1
-        if self.current_step >= self.max_steps:
+        if self.current_step >= self.end_step:
             # Se ainda estiver comprado no final, força a venda
             if self.position == 1:
                 final_price = self.df.loc[self.current_step -1, "close"]
@@ -254,7 +349,7 @@ class TradingEnv(gym.Env):
     def _render_frame(self):
         """Lógica de renderização para modo human (ex: print)."""
         current_price = self.df.loc[self.current_step, "close"] if self.current_step < len(self.df) else "N/A"
-        print(f"Passo: {self.current_step}/{self.max_steps}")
+        print(f"Passo: {self.current_step}/{self.end_step}")
         print(f"Preço Atual: {current_price}")
         print(f"Saldo: {self.balance:.2f}")
         print(f"Posição: {'Comprado' if self.position == 1 else 'Nenhuma'}")
@@ -271,6 +366,105 @@ class TradingEnv(gym.Env):
         """Fecha o ambiente e limpa recursos (opcional)."""
         pass
 
+def run_batched_episodes(env, policy, trade_amounts, target_profits_abs, stop_losses_abs, start_step=0):
+    """
+    Roda um episódio do ambiente para cada combinação de parâmetros de operação, todos juntos.
+
+    As regras são as de `TradingEnv.step` (compra, venda, meta, stop e venda forçada no fim),
+    aplicadas a vetores com o estado de todos os episódios; a política decide as ações de
+    todos os episódios ativos em uma única chamada por passo. Os dados, a SMA, o saldo
+    inicial e `max_steps` vêm de `env`, que não é alterado.
+
+    Args:
+        env: Ambiente com os dados já carregados
+        policy: Função que recebe as observações (matriz N x 4, float32) e retorna N ações
+        trade_amounts: Valor de cada operação, por episódio
+        target_profits_abs: Meta de lucro em valor absoluto (R$), por episódio
+        stop_losses_abs: Stop loss em valor absoluto (R$), por episódio
+        start_step: Passo inicial (como options["start_step"] do reset)
+
+    Returns:
+        Dicionário de arrays (um valor por episódio): final_balance, accumulated_profit,
+        total_reward, steps e trades (compras e vendas decididas pela política)
+    """
+    trade_amount = np.asarray(trade_amounts, dtype=np.float64)
+    target_profit = np.asarray(target_profits_abs, dtype=np.float64)
+    stop_loss = np.asarray(stop_losses_abs, dtype=np.float64)
+    count = len(trade_amount)
+
+    close = env.dataset.close
+    features = env.dataset.features
+    low, high = env.observation_space.low, env.observation_space.high
+    end_step = min(start_step + env.max_steps, len(env.df))
+
+    # Estado de todos os episódios
+    balance = np.full(count, float(env.initial_balance))
+    position = np.zeros(count, dtype=np.int64)
+    entry_price = np.zeros(count)
+    shares_held = np.zeros(count)
+    accumulated_profit = np.zeros(count)
+    total_reward = np.zeros(count)
+    steps = np.zeros(count, dtype=np.int64)
+    trades = np.zeros(count, dtype=np.int64)
+    active = np.ones(count, dtype=bool)
+    actions = np.zeros(count, dtype=np.int64)
+    observations = np.empty((count, 4), dtype=np.float32)
+
+    for step in range(start_step, end_step):
+        rows = np.flatnonzero(active)
+        if rows.size == 0:
+            break
+        price = close[step]
+
+        # Observações [Preço, SMA, Posição, Saldo] dos episódios ativos, como em _get_observation
+        obs = observations[:rows.size]
+        obs[:, :2] = features[step]
+        obs[:, 2] = position[rows]
+        obs[:, 3] = balance[rows]
+        np.clip(obs, low, high, out=obs)
+        actions[:] = 0
+        actions[rows] = np.asarray(policy(obs)).reshape(-1)
+
+        buy = active & (actions == 1) & (position == 0) & (balance >= trade_amount)
+        sell = active & (actions == 2) & (position == 1)
+
+        # Comprar
+        position[buy] = 1
+        entry_price[buy] = price
+        shares_held[buy] = trade_amount[buy] / price
+        balance[buy] -= trade_amount[buy]
+
+        # Vender (a recompensa do passo é o lucro realizado)
+        profit = np.where(sell, (price - entry_price) * shares_held, 0.0)
+        balance[sell] += trade_amount[sell] + profit[sell]
+        accumulated_profit += profit
+        total_reward += profit
+        position[sell] = 0
+        entry_price[sell] = 0
+        shares_held[sell] = 0
+
+        trades += buy | sell
+        steps[active] += 1
+        terminated = active & ((accumulated_profit >= target_profit) | (accumulated_profit <= -stop_loss))
+
+        if step + 1 >= end_step:
+            # Fim dos dados: venda forçada de quem ainda está comprado
+            forced = active & (position == 1)
+            profit = (price - entry_price[forced]) * shares_held[forced]
+            balance[forced] += trade_amount[forced] + profit
+            accumulated_profit[forced] += profit
+            position[forced] = 0
+            terminated |= active
+        active &= ~terminated
+
+    return {
+        "final_balance": balance,
+        "accumulated_profit": accumulated_profit,
+        "total_reward": total_reward,
+        "steps": steps,
+        "trades": trades
+    }
+
 # --- Bloco para Teste Simples do Ambiente (opcional) ---
 if __name__ == "__main__":
     print("Testando o ambiente TradingEnv...")
@@ -1,13 +1,34 @@
 # src/rl_agent/trainer.py
 
 import os
+import copy
+import shutil
+import hashlib
 import numpy as np
 import torch
 import json
 import time
 from datetime import datetime
-from src.rl_env.trading_env import TradingEnv
-from src.rl_agent.dqn_agent import DQNAgent
+from src.rl_env.trading_env import TradingEnv, get_market_dataset, run_batched_episodes
+from src.rl_agent.dqn_agent import DQNAgent, CompactReplayMemory, load_exported_policy
+from src.rl_agent.actor_learner import train_actor_learner
+from src.rl_agent.data_parallel import train_data_parallel
+from src.rl_agent.training_profiler import PhaseTimer
+from src.rl_agent.checkpoint_writer import checkpoint_writer
+from src.rl_agent.policy_export import export_policy
+from src.rl_agent.model_registry import get_model_registry
+
+# Hiperparâmetros padrão do agente DQN (podem ser sobrescritos via agent_params)
+DEFAULT_AGENT_PARAMS = {
+    "learning_rate": 0.001,
+    "gamma": 0.99,
+    "epsilon": 1.0,
+    "epsilon_min": 0.01,
+    "epsilon_decay": 0.995,
+    "memory_size": 10000,
+    "batch_size": 64,
+    "target_update": 10
+}
 
 class TradingTrainer:
     """Classe para treinar e executar o agente de IA no ambiente de trading."""
@@ -16,7 +37,7 @@ class TradingTrainer:
                  initial_balance=10000, trade_amount=1000, 
                  target_profit_abs=330, stop_loss_abs=600,
                  sma_window=20, max_steps=None,
-                 model_dir="/home/ubuntu/ia_trader_app/models"):
+                 model_dir="/home/ubuntu/ia_trader_app/models", agent_params=None, compact_replay=False):
         """
         Inicializa o treinador com parâmetros para o ambiente e o agente.
         
@@ -32,6 +53,9 @@ class TradingTrainer:
             sma_window: Janela para cálculo da média móvel simples
             max_steps: Número máximo de passos por episódio
             model_dir: Diretório para salvar/carregar modelos
+            agent_params: Hiperparâmetros do agente (sobrescrevem DEFAULT_AGENT_PARAMS)
+            compact_replay: Se True, a memória de replay guarda só índices, posição e saldo
+                            (as observações são remontadas dos dados do ambiente)
         """
         self.symbol = symbol
         self.region = region
@@ -44,6 +68,7 @@ class TradingTrainer:
         self.sma_window = sma_window
         self.max_steps = max_steps
         self.model_dir = model_dir
+        self.agent_params = {**DEFAULT_AGENT_PARAMS, **(agent_params or {})}
         
         # Criar diretório de modelos se não existir
         os.makedirs(self.model_dir, exist_ok=True)
@@ -68,15 +93,13 @@ class TradingTrainer:
         self.agent = DQNAgent(
             state_size=state_size,
             action_size=action_size,
-            learning_rate=0.001,
-            gamma=0.99,
-            epsilon=1.0,
-            epsilon_min=0.01,
-            epsilon_decay=0.995,
-            memory_size=10000,
-            batch_size=64,
-            target_update=10
+            **self.agent_params
         )
+        self.compact_replay = compact_replay
+        # Modelo de inferência exportado (TorchScript) equivalente aos pesos atuais, se houver
+        self.inference_model = None
+        if compact_replay:
+            self.agent.use_compact_memory(*self.env.observation_arrays())
         
         # Histórico de treinamento
         self.training_history = {
@@ -88,126 +111,289 @@ class TradingTrainer:
             "epsilon": []
         }
         
-    def train(self, episodes=100, batch_size=64, save_interval=10, verbose=True):
+    def train(self, episodes=100, batch_size=64, save_interval=10, verbose=True, resume=False,
+              progress_callback=None, should_stop=None):
         """
         Treina o agente no ambiente de trading.
         
         Args:
             episodes: Número de episódios de treinamento
             batch_size: Tamanho do lote para treinamento
-            save_interval: Intervalo para salvar o modelo
+            save_interval: Intervalo para salvar o modelo (e o checkpoint completo)
             verbose: Se True, exibe informações durante o treinamento
+            resume: Se True, continua a partir do último checkpoint completo não concluído
+            progress_callback: Função chamada ao fim de cada episódio com (episódio, total, métricas)
+            should_stop: Função verificada antes de cada episódio; se retornar True, o treinamento
+                         para e grava um checkpoint completo (retomável com resume=True)
             
         Returns:
             Histórico de treinamento
         """
         start_time = time.time()
         
-        for episode in range(1, episodes + 1):
-            state, info = self.env.reset()
-            total_reward = 0
-            step_count = 0
-            done = False
-            
-            while not done:
-                # Escolher ação
-                action = self.agent.act(state)
+        start_episode = 1
+        if resume:
+            completed_episodes = self.load_checkpoint()
+            if completed_episodes is not None:
+                start_episode = completed_episodes + 1
+                if verbose:
+                    print(f"Retomando treinamento do episódio {start_episode}/{episodes}")
+        
+        # Os pesos vão mudar: o modelo exportado deixa de corresponder ao agente
+        self.inference_model = None
+        
+        # A memória compacta remonta as observações a partir dos dados do ambiente atual
+        if isinstance(self.agent.memory, CompactReplayMemory):
+            self.agent.memory.set_features(*self.env.observation_arrays())
+        
+        # Medição do tempo por fase (ambiente, ação, replay, checkpoints)
+        timer = PhaseTimer()
+        self.agent.profiler = timer
+        
+        try:
+            for episode in range(start_episode, episodes + 1):
+                if should_stop is not None and should_stop():
+                    # Interrompido: grava o último episódio concluído, sem gerar o modelo final
+                    if verbose:
+                        print(f"Treinamento interrompido antes do episódio {episode}/{episodes}")
+                    if episode > start_episode:
+                        self.save_checkpoint(episode - 1, episodes)
+                    self.save_training_history()
+                    return self.training_history
                 
-                # Executar ação
-                next_state, reward, terminated, truncated, info = self.env.step(action)
-                done = terminated or truncated
+                t0 = time.perf_counter()
+                state, info = self.env.reset()
+                timer.record("env_reset", t0)
+                total_reward = 0
+                step_count = 0
+                done = False
                 
-                # Armazenar experiência
-                self.agent.remember(state, action, reward, next_state, done)
+                while not done:
+                    # Escolher ação
+                    t0 = time.perf_counter()
+                    action = self.agent.act(state)
+                    t1 = time.perf_counter()
+                    
+                    # Executar ação
+                    step = info["step"]
+                    next_state, reward, terminated, truncated, info = self.env.step(action)
+                    done = terminated or truncated
+                    t2 = time.perf_counter()
+                    
+                    # Armazenar experiência
+                    self.agent.remember(state, action, reward, next_state, done, step=step, next_step=info["step"])
+                    t3 = time.perf_counter()
+                    timer.add("act", t1 - t0)
+                    timer.add("env_step", t2 - t1)
+                    timer.add("remember", t3 - t2)
+                    
+                    # Treinar agente (experience replay)
+                    self.agent.replay()
+                    
+                    # Atualizar estado e contadores
+                    state = next_state
+                    total_reward += reward
+                    step_count += 1
                 
-                # Treinar agente (experience replay)
-                self.agent.replay()
+                timer.steps += step_count
+                timer.episodes += 1
                 
-                # Atualizar estado e contadores
-                state = next_state
-                total_reward += reward
-                step_count += 1
-            
-            # Registrar resultados do episódio
-            self.training_history["episodes"].append(episode)
-            self.training_history["rewards"].append(total_reward)
-            self.training_history["balances"].append(info["balance"])
-            self.training_history["profits"].append(info["accumulated_profit"])
-            self.training_history["steps"].append(step_count)
-            self.training_history["epsilon"].append(self.agent.epsilon)
-            
-            # Exibir progresso
-            if verbose and (episode % 10 == 0 or episode == 1):
-                elapsed = time.time() - start_time
-                print(f"Episódio {episode}/{episodes} | Recompensa: {total_reward:.2f} | "
-                      f"Saldo: {info['balance']:.2f} | Lucro: {info['accumulated_profit']:.2f} | "
-                      f"Passos: {step_count} | Epsilon: {self.agent.epsilon:.4f} | "
-                      f"Tempo: {elapsed:.2f}s")
+                # Registrar resultados do episódio
+                self.training_history["episodes"].append(episode)
+                self.training_history["rewards"].append(total_reward)
+                self.training_history["balances"].append(info["balance"])
+                self.training_history["profits"].append(info["accumulated_profit"])
+                self.training_history["steps"].append(step_count)
+                self.training_history["epsilon"].append(self.agent.epsilon)
+                
+                # Exibir progresso
+                if verbose and (episode % 10 == 0 or episode == 1):
+                    elapsed = time.time() - start_time
+                    summary = timer.summary()
+                    print(f"Episódio {episode}/{episodes} | Recompensa: {total_reward:.2f} | "
+                          f"Saldo: {info['balance']:.2f} | Lucro: {info['accumulated_profit']:.2f} | "
+                          f"Passos: {step_count} | Epsilon: {self.agent.epsilon:.4f} | "
+                          f"Tempo: {elapsed:.2f}s | Passos/s: {summary['steps_per_second']:.1f} | "
+                          f"Atualizações/s: {summary['updates_per_second']:.1f}")
+                
+                self.training_history["timings"] = timer.summary()
+                if progress_callback is not None:
+                    progress_callback(episode, episodes, {
+                        "reward": float(total_reward),
+                        "balance": float(info["balance"]),
+                        "profit": float(info["accumulated_profit"]),
+                        "steps": step_count,
+                        "epsilon": float(self.agent.epsilon)
+                    })
+                
+                # Salvar modelo periodicamente
+                # (só o snapshot em memória é feito aqui; a gravação fica com o checkpoint_writer)
+                if episode % save_interval == 0:
+                    t0 = time.perf_counter()
+                    self.save_model(f"{self.symbol}_{episode}", group=f"{self.model_dir}/{self.symbol}", wait=False)
+                    self.save_checkpoint(episode, episodes, wait=False)
+                    timer.record("checkpoint", t0)
             
-            # Salvar modelo periodicamente
-            if episode % save_interval == 0:
-                self.save_model(f"{self.symbol}_{episode}")
+            # Salvar modelo final (espera as gravações pendentes)
+            t0 = time.perf_counter()
+            self.save_model(f"{self.symbol}_final", wait=False)
+            self.save_checkpoint(episodes, episodes, completed=True)
+            timer.record("checkpoint", t0)
+            self.training_history["timings"] = timer.summary()
+        finally:
+            self.agent.profiler = None
         
-        # Salvar modelo final
-        self.save_model(f"{self.symbol}_final")
+        if verbose:
+            print("Tempo por fase: " + " | ".join(
+                f"{phase}: {stats['total_seconds']:.2f}s ({stats['share'] * 100:.1f}%)"
+                for phase, stats in self.training_history["timings"]["phases"].items()))
         
         # Salvar histórico de treinamento
         self.save_training_history()
         
         return self.training_history
     
-    def test(self, episodes=10, render=False, verbose=True):
+    def train_distributed(self, episodes=100, num_actors=None, save_interval=10, verbose=True, **kwargs):
+        """
+        Treina o agente com vários processos atores coletando experiência em paralelo
+        e um único aprendiz (este processo) atualizando a rede.
+        
+        Args:
+            episodes: Número total de episódios de treinamento (somando todos os atores)
+            num_actors: Número de processos atores (padrão: núcleos - 1)
+            save_interval: Intervalo para salvar o modelo
+            verbose: Se True, exibe informações durante o treinamento
+            **kwargs: Repassados para train_actor_learner (replay_ratio, sync_interval)
+            
+        Returns:
+            Histórico de treinamento
+        """
+        return train_actor_learner(self, episodes=episodes, num_actors=num_actors,
+                                   save_interval=save_interval, verbose=verbose, **kwargs)
+    
+    def train_data_parallel(self, episodes=100, world_size=2, save_interval=10, verbose=True):
+        """
+        Treina o agente com vários processos aprendizes em paralelo de dados (torch.distributed, gloo).
+        Os gradientes são promediados a cada atualização e o modelo final é salvo normalmente.
+        
+        Args:
+            episodes: Número total de episódios de treinamento (somando todos os processos)
+            world_size: Número de processos aprendizes
+            save_interval: Intervalo para salvar o histórico de treinamento
+            verbose: Se True, exibe informações durante o treinamento
+            
+        Returns:
+            Histórico de treinamento
+        """
+        return train_data_parallel(self, episodes=episodes, world_size=world_size,
+                                   save_interval=save_interval, verbose=verbose)
+    
+    def test(self, episodes=10, render=False, verbose=True, random_starts=False, envs=None, seed=None):
         """
         Testa o agente treinado no ambiente de trading.
         
+        Sem exploração, a política é determinística e o `reset` do ambiente também: sem
+        inícios aleatórios, todos os episódios de um mesmo ambiente seriam idênticos, então
+        cada ambiente é avaliado uma única vez. Com `random_starts`, cada episódio começa em
+        um ponto diferente dos dados. Todos os episódios rodam juntos (uma cópia do ambiente
+        por episódio) e a rede decide as ações de todos em uma única inferência em lote por passo.
+        
         Args:
-            episodes: Número de episódios de teste
+            episodes: Número de episódios de teste por ambiente (usado com random_starts)
             render: Se True, renderiza o ambiente durante o teste
             verbose: Se True, exibe informações durante o teste
+            random_starts: Se True, cada episódio começa em um passo aleatório da primeira metade dos dados
+            envs: Lista de ambientes a avaliar (ex.: outros ativos/períodos); padrão: [self.env]
+            seed: Semente para os inícios aleatórios
             
         Returns:
             Resultados do teste
         """
+        if episodes < 1:
+            raise ValueError(f"O número de episódios de teste deve ser pelo menos 1 (recebido: {episodes}).")
+        envs = envs or [self.env]
+        rng = np.random.default_rng(seed)
+        
+        # Um episódio por (ambiente, passo inicial)
+        runs = []
+        for dataset, env in enumerate(envs):
+            if random_starts:
+                max_start = max(1, min(env.max_steps, len(env.df)) // 2)
+                starts = rng.integers(0, max_start, size=episodes).tolist()
+            else:
+                starts = [0]
+            for start_step in starts:
+                run_env = copy.copy(env)  # Compartilha os dados (somente leitura); estado próprio
+                state, info = run_env.reset(options={"start_step": start_step})
+                runs.append({
+                    "dataset": dataset,
+                    "start_step": start_step,
+                    "env": run_env,
+                    "state": state,
+                    "info": info,
+                    "total_reward": 0,
+                    "step_count": 0,
+                    "done": False
+                })
+        
+        model = self.inference_model or self.agent.model
+        was_training = getattr(model, "training", False)
+        if was_training:
+            model.eval()
+        try:
+            active = runs
+            while active:
+                # Escolher ações de todos os episódios ativos (sem exploração) em uma única inferência
+                states = torch.from_numpy(np.stack([run["state"] for run in active])).to(self.agent.device)
+                with torch.no_grad():
+                    actions = model(states).argmax(dim=1).cpu().numpy()
+                
+                for run, action in zip(active, actions):
+                    # Executar ação
+                    next_state, reward, terminated, truncated, info = run["env"].step(int(action))
+                    run["done"] = terminated or truncated
+                    
+                    # Renderizar se solicitado
+                    if render:
+                        run["env"].render()
+                    
+                    # Atualizar estado e contadores
+                    run["state"] = next_state
+                    run["info"] = info
+                    run["total_reward"] += reward
+                    run["step_count"] += 1
+                
+                active = [run for run in active if not run["done"]]
+        finally:
+            if was_training:
+                model.train()
+        
         test_results = {
             "episodes": [],
             "rewards": [],
             "balances": [],
             "profits": [],
             "steps": [],
-            "success_rate": 0
+            "start_steps": [],
+            "datasets": [],
+            "success_rate": 0,
+            "deterministic": not random_starts,
+            "episodes_requested": episodes * len(envs)
         }
         
         successful_episodes = 0
         
-        for episode in range(1, episodes + 1):
-            state, info = self.env.reset()
-            total_reward = 0
-            step_count = 0
-            done = False
-            
-            while not done:
-                # Escolher ação (sem exploração durante teste)
-                action = self.agent.act(state, training=False)
-                
-                # Executar ação
-                next_state, reward, terminated, truncated, info = self.env.step(action)
-                done = terminated or truncated
-                
-                # Renderizar se solicitado
-                if render:
-                    self.env.render()
-                
-                # Atualizar estado e contadores
-                state = next_state
-                total_reward += reward
-                step_count += 1
+        for episode, run in enumerate(runs, start=1):
+            info = run["info"]
             
             # Registrar resultados do episódio
             test_results["episodes"].append(episode)
-            test_results["rewards"].append(total_reward)
+            test_results["rewards"].append(run["total_reward"])
             test_results["balances"].append(info["balance"])
             test_results["profits"].append(info["accumulated_profit"])
-            test_results["steps"].append(step_count)
+            test_results["steps"].append(run["step_count"])
+            test_results["start_steps"].append(run["start_step"])
+            test_results["datasets"].append(run["dataset"])
             
             # Verificar se o episódio foi bem-sucedido (lucro positivo)
             if info["accumulated_profit"] > 0:
@@ -215,15 +401,17 @@ class TradingTrainer:
             
             # Exibir progresso
             if verbose:
-                print(f"Teste {episode}/{episodes} | Recompensa: {total_reward:.2f} | "
-                      f"Saldo: {info['balance']:.2f} | Lucro: {info['accumulated_profit']:.2f} | "
-                      f"Passos: {step_count}")
+                print(f"Teste {episode}/{len(runs)} | Ambiente: {run['dataset']} | Início: {run['start_step']} | "
+                      f"Recompensa: {run['total_reward']:.2f} | Saldo: {info['balance']:.2f} | "
+                      f"Lucro: {info['accumulated_profit']:.2f} | Passos: {run['step_count']}")
         
         # Calcular taxa de sucesso
-        test_results["success_rate"] = successful_episodes / episodes
+        test_results["success_rate"] = successful_episodes / len(runs)
         
         if verbose:
             print(f"\nResultados do Teste:")
+            if not random_starts and episodes > 1:
+                print(f"Avaliação determinística: 1 episódio por ambiente (em vez de {episodes})")
             print(f"Taxa de Sucesso: {test_results['success_rate'] * 100:.2f}%")
             print(f"Lucro Médio: {np.mean(test_results['profits']):.2f}")
             print(f"Recompensa Média: {np.mean(test_results['rewards']):.2f}")
@@ -231,6 +419,57 @@ class TradingTrainer:
         
         return test_results
     
+    def act_greedy(self, state):
+        """
+        Escolhe a melhor ação (sem exploração), usando o modelo exportado quando disponível.
+        
+        Args:
+            state: Observação do ambiente
+            
+        Returns:
+            Ação escolhida
+        """
+        if self.inference_model is None:
+            return self.agent.act(state, training=False)
+        with torch.no_grad():
+            action_values = self.inference_model(torch.from_numpy(np.asarray(state, dtype=np.float32)))
+        return int(action_values.argmax())
+    
+    def export_policy(self, name=None, quantize=True, sample_episodes=3):
+        """
+        Exporta o modelo salvo para inferência rápida (TorchScript congelado, int8 opcional).
+        
+        Os estados de referência da verificação de paridade e da medição de latência são
+        observações reais do ambiente, coletadas com ações aleatórias.
+        
+        Args:
+            name: Nome do modelo salvo (sem extensão); padrão: "{symbol}_final"
+            quantize: Se True, aplica quantização dinâmica int8 às camadas lineares
+            sample_episodes: Episódios usados para coletar os estados de referência
+            
+        Returns:
+            Relatório da exportação (paridade, latência, caminho do modelo exportado)
+        """
+        if name is None:
+            name = f"{self.symbol}_final"
+        checkpoint_path = os.path.join(self.model_dir, f"{name}.pth")
+        
+        sample_states = []
+        sample_env = copy.copy(self.env)
+        for _ in range(sample_episodes):
+            state, info = sample_env.reset()
+            done = False
+            while not done:
+                sample_states.append(state)
+                state, reward, terminated, truncated, info = sample_env.step(sample_env.action_space.sample())
+                done = terminated or truncated
+        
+        report = export_policy(checkpoint_path, self.agent.state_size, self.agent.action_size,
+                               np.stack(sample_states), quantize=quantize)
+        if report["passed"]:
+            self.inference_model = load_exported_policy(checkpoint_path)
+        return report
+    
     def run_simulation(self, trade_amount, target_profit_abs, stop_loss_abs, verbose=True):
         """
         Executa uma simulação com o agente treinado usando parâmetros específicos.
@@ -244,18 +483,14 @@ class TradingTrainer:
         Returns:
             Resultados da simulação
         """
-        # Criar ambiente específico para esta simulação
+        # Criar ambiente específico para esta simulação (sobre os dados já preparados)
         sim_env = TradingEnv(
-            symbol=self.symbol,
-            region=self.region,
-            interval=self.interval,
-            range_period=self.range_period,
             initial_balance=self.initial_balance,
             trade_amount=trade_amount,
             target_profit_abs=target_profit_abs,
             stop_loss_abs=stop_loss_abs,
-            sma_window=self.sma_window,
-            max_steps=self.max_steps
+            max_steps=self.max_steps,
+            dataset=self.market_dataset()
         )
         
         # Executar simulação
@@ -269,7 +504,7 @@ class TradingTrainer:
         
         while not done:
             # Escolher ação (sem exploração durante simulação)
-            action = self.agent.act(state, training=False)
+            action = self.act_greedy(state)
             
             # Registrar estado antes da ação
             pre_action_info = sim_env._get_info()
@@ -343,21 +578,146 @@ class TradingTrainer:
         
         return simulation_results
     
-    def save_model(self, name=None):
+    def run_simulation_grid(self, combinations):
         """
-        Salva o modelo do agente.
+        Simula várias combinações de parâmetros de operação de uma vez, com um único ambiente.
+        
+        Equivale a chamar run_simulation para cada combinação, mas os dados são carregados uma
+        vez e todos os episódios avançam juntos (estado em arrays, uma inferência em lote por
+        passo), então centenas de combinações levam o tempo de poucas simulações.
         
         Args:
-            name: Nome do arquivo (sem extensão)
+            combinations: Lista de tuplas (trade_amount, target_profit_abs, stop_loss_abs)
+            
+        Returns:
+            Tabela de resultados: dicionário de colunas (listas com uma linha por combinação)
         """
-        if name is None:
-            name = f"{self.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        combinations = np.asarray(combinations, dtype=np.float64).reshape(-1, 3)
+        trade_amounts, target_profits, stop_losses = combinations.T
         
-        filepath = os.path.join(self.model_dir, f"{name}.pth")
-        self.agent.save(filepath)
+        # Ambiente construído uma vez para toda a grade (os parâmetros de operação vêm da grade)
+        sim_env = TradingEnv(
+            initial_balance=self.initial_balance,
+            max_steps=self.max_steps,
+            dataset=self.market_dataset()
+        )
         
-        # Salvar também os parâmetros do ambiente
-        params = {
+        model = self.inference_model or self.agent.model
+        device = self.agent.device
+        
+        def policy(observations):
+            with torch.no_grad():
+                return model(torch.from_numpy(observations).to(device)).argmax(dim=1).cpu().numpy()
+        
+        was_training = getattr(model, "training", False)
+        if was_training:
+            model.eval()
+        try:
+            outcome = run_batched_episodes(sim_env, policy, trade_amounts, target_profits, stop_losses)
+        finally:
+            if was_training:
+                model.train()
+        
+        profits = outcome["accumulated_profit"]
+        return {
+            "trade_amount": trade_amounts.tolist(),
+            "target_profit_abs": target_profits.tolist(),
+            "stop_loss_abs": stop_losses.tolist(),
+            "final_balance": outcome["final_balance"].tolist(),
+            "accumulated_profit": profits.tolist(),
+            "total_reward": outcome["total_reward"].tolist(),
+            "steps": outcome["steps"].tolist(),
+            "trades": outcome["trades"].tolist(),
+            "success": (profits > 0).tolist(),
+            "target_reached": (profits >= target_profits).tolist(),
+            "stop_loss_reached": (profits <= -stop_losses).tolist()
+        }
+    
+    def market_dataset(self):
+        """Dados de mercado atuais do ativo (MarketDataset compartilhado, do cache)."""
+        dataset = get_market_dataset(self.symbol, self.region, self.interval, self.range_period, self.sma_window)
+        if dataset is None:
+            raise ValueError("Não foi possível carregar os dados históricos.")
+        return dataset
+    
+    def configure_env(self, initial_balance=None, trade_amount=None, target_profit_abs=None, stop_loss_abs=None):
+        """
+        Atualiza os parâmetros econômicos do treinador e do seu ambiente sem recarregar os dados
+        (o ambiente só é recriado se o data_service tiver entregue dados novos). Parâmetros None
+        mantêm o valor atual.
+        
+        Args:
+            initial_balance: Saldo inicial
+            trade_amount: Valor de cada operação individual
+            target_profit_abs: Meta de lucro em valor absoluto (R$)
+            stop_loss_abs: Stop loss em valor absoluto (R$)
+            
+        Returns:
+            O ambiente configurado
+        """
+        if initial_balance is not None:
+            self.initial_balance = initial_balance
+        if trade_amount is not None:
+            self.trade_amount = trade_amount
+        if target_profit_abs is not None:
+            self.target_profit_abs = target_profit_abs
+        if stop_loss_abs is not None:
+            self.stop_loss_abs = stop_loss_abs
+        
+        dataset = self.market_dataset()
+        if dataset is not self.env.dataset:
+            self.env = TradingEnv(
+                initial_balance=self.initial_balance,
+                trade_amount=self.trade_amount,
+                target_profit_abs=self.target_profit_abs,
+                stop_loss_abs=self.stop_loss_abs,
+                max_steps=self.max_steps,
+                dataset=dataset
+            )
+        else:
+            self.env.configure(self.initial_balance, self.trade_amount, self.target_profit_abs, self.stop_loss_abs)
+        return self.env
+    
+    def model_fingerprint(self):
+        """Hash dos pesos da rede usada nas simulações (muda a cada treino ou modelo carregado)."""
+        digest = hashlib.sha1()
+        for name, tensor in self.agent.model.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().numpy().tobytes())
+        return digest.hexdigest()[:16]
+    
+    def simulation_key(self, trade_amount, target_profit_abs, stop_loss_abs):
+        """
+        Tudo de que o resultado de run_simulation depende: versão do modelo, versão dos dados,
+        parâmetros do ambiente e os parâmetros da simulação. Chaves iguais dão resultados iguais.
+        
+        Args:
+            trade_amount: Valor de cada operação individual
+            target_profit_abs: Meta de lucro em valor absoluto (R$)
+            stop_loss_abs: Stop loss em valor absoluto (R$)
+            
+        Returns:
+            Dicionário serializável em JSON
+        """
+        return {
+            "symbol": self.symbol,
+            "region": self.region,
+            "model": self.model_fingerprint(),
+            "exported": self.inference_model is not None,
+            "data": self.market_dataset().version,
+            "interval": self.interval,
+            "range_period": self.range_period,
+            "initial_balance": float(self.initial_balance),
+            "sma_window": self.sma_window,
+            "max_steps": self.max_steps,
+            "trade_amount": float(trade_amount),
+            "target_profit_abs": float(target_profit_abs),
+            "stop_loss_abs": float(stop_loss_abs)
+        }
+    
+    def model_params(self):
+        """Parâmetros do ambiente e do agente (os argumentos do construtor, exceto model_dir)."""
+        return {
             "symbol": self.symbol,
             "region": self.region,
             "interval": self.interval,
@@ -367,12 +727,55 @@ class TradingTrainer:
             "target_profit_abs": self.target_profit_abs,
             "stop_loss_abs": self.stop_loss_abs,
             "sma_window": self.sma_window,
-            "max_steps": self.max_steps
+            "max_steps": self.max_steps,
+            "agent_params": self.agent_params,
+            "compact_replay": self.compact_replay
+        }
+    
+    def model_metrics(self):
+        """Métricas do último episódio de treinamento (registradas com o modelo salvo)."""
+        history = self.training_history
+        if not history["episodes"]:
+            return {}
+        return {
+            "episode": history["episodes"][-1],
+            "reward": float(history["rewards"][-1]),
+            "balance": float(history["balances"][-1]),
+            "profit": float(history["profits"][-1]),
+            "steps": history["steps"][-1]
         }
+    
+    def save_model(self, name=None, group=None, wait=True):
+        """
+        Salva o modelo do agente e o registra no registro de modelos do diretório
+        (depois que os arquivos estão no disco, junto com a remoção dos checkpoints descartados).
+        
+        Args:
+            name: Nome do arquivo (sem extensão)
+            group: Grupo de retenção do checkpoint_writer (só os últimos checkpoints do grupo são mantidos)
+            wait: Se False, retorna logo após o snapshot em memória (gravação em segundo plano)
+        """
+        if name is None:
+            name = f"{self.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        filepath = os.path.join(self.model_dir, f"{name}.pth")
+        
+        # Salvar também os parâmetros do ambiente
+        params = self.model_params()
         
         params_filepath = os.path.join(self.model_dir, f"{name}_params.json")
-        with open(params_filepath, "w") as f:
-            json.dump(params, f, indent=4)
+        registry = get_model_registry(self.model_dir)
+        metrics = self.model_metrics()
+        
+        def register(removed_paths):
+            registry.register(name, filepath, params, metrics, removed_paths=removed_paths)
+        
+        job = checkpoint_writer.submit([
+            (filepath, "torch", self.agent.checkpoint_state()),
+            (params_filepath, "json", json.dumps(params, indent=4))
+        ], group=group, on_done=register)
+        if wait:
+            job.wait()
         
         return filepath
     
@@ -385,6 +788,8 @@ class TradingTrainer:
         """
         filepath = os.path.join(self.model_dir, f"{name}.pth")
         self.agent.load(filepath)
+        # Usar o modelo exportado deste checkpoint nas simulações, se houver
+        self.inference_model = load_exported_policy(filepath)
         
         # Carregar também os parâmetros do ambiente
         params_filepath = os.path.join(self.model_dir, f"{name}_params.json")
@@ -404,5 +809,172 @@ class TradingTrainer:
             self.sma_window = params.get("sma_window", self.sma_window)
             self.max_steps = params.get("max_steps", self.max_steps)
             
-            # Recriar ambiente com os parâmetros carr
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+            # Recriar ambiente com os parâmetros carregados
+            self.env = TradingEnv(
+                symbol=self.symbol,
+                region=self.region,
+                interval=self.interval,
+                range_period=self.range_period,
+                initial_balance=self.initial_balance,
+                trade_amount=self.trade_amount,
+                target_profit_abs=self.target_profit_abs,
+                stop_loss_abs=self.stop_loss_abs,
+                sma_window=self.sma_window,
+                max_steps=self.max_steps
+            )
+        
+        return filepath
+    
+    def checkpoint_dir(self):
+        """Diretório do checkpoint completo (retomável) deste ativo e região."""
+        return os.path.join(self.model_dir, "checkpoints", f"{self.symbol}_{self.region}")
+    
+    def save_checkpoint(self, episode, episodes, completed=False, wait=True):
+        """
+        Salva o estado completo do treinamento: agente (redes, otimizador, contadores),
+        memória de replay, geradores aleatórios e histórico de treinamento.
+        
+        Cada checkpoint vai para um subdiretório novo; só depois que todos os seus arquivos
+        estão no disco o ponteiro `latest.json` passa a apontar para ele (troca atômica) e as
+        versões anteriores são apagadas. Uma falha no meio deixa o checkpoint anterior intacto,
+        nunca pesos novos com o histórico antigo.
+        
+        Args:
+            episode: Último episódio concluído
+            episodes: Total de episódios pedidos no treinamento
+            completed: Se True, marca o treinamento como concluído (não será retomado)
+            wait: Se False, retorna logo após o snapshot em memória (gravação em segundo plano)
+            
+        Returns:
+            Caminho do diretório desta versão do checkpoint
+        """
+        checkpoint_dir = self.checkpoint_dir()
+        version = f"{episode:06d}_{time.time_ns()}"
+        version_dir = os.path.join(checkpoint_dir, version)
+        writes = self.agent.full_state_writes(version_dir)
+        
+        trainer_state = {
+            "episode": episode,
+            "episodes": episodes,
+            "completed": completed,
+            "saved_at": datetime.now().isoformat(),
+            "agent_params": self.agent_params,
+            "training_history": self.training_history
+        }
+        writes.append((os.path.join(version_dir, "trainer_state.json"), "json",
+                       json.dumps(trainer_state, default=float)))
+        # O ponteiro é gravado por último: só aponta para versões completas
+        writes.append((os.path.join(checkpoint_dir, "latest.json"), "json", json.dumps({"version": version})))
+        
+        def remove_old_versions(removed_paths):
+            for entry in os.listdir(checkpoint_dir):
+                entry_path = os.path.join(checkpoint_dir, entry)
+                if entry != version and os.path.isdir(entry_path):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+        
+        job = checkpoint_writer.submit(writes, on_done=remove_old_versions)
+        if wait:
+            job.wait()
+        
+        return version_dir
+    
+    def latest_checkpoint_dir(self):
+        """Diretório da versão apontada por `latest.json`, ou None se não há checkpoint completo."""
+        pointer_filepath = os.path.join(self.checkpoint_dir(), "latest.json")
+        if not os.path.exists(pointer_filepath):
+            return None
+        with open(pointer_filepath, "r") as f:
+            version = json.load(f)["version"]
+        return os.path.join(self.checkpoint_dir(), version)
+    
+    def load_checkpoint(self):
+        """
+        Restaura o último checkpoint completo, se houver um treinamento não concluído.
+        
+        Returns:
+            Número de episódios já concluídos, ou None se não há o que retomar
+        """
+        checkpoint_writer.flush(self.checkpoint_dir())  # A última versão pode ainda estar sendo gravada
+        version_dir = self.latest_checkpoint_dir()
+        if version_dir is None:
+            return None
+        
+        with open(os.path.join(version_dir, "trainer_state.json"), "r") as f:
+            trainer_state = json.load(f)
+        if trainer_state.get("completed"):
+            return None
+        
+        self.agent.load_full_state(version_dir)
+        self.training_history = trainer_state["training_history"]
+        return trainer_state["episode"]
+    
+    def save_state(self, dirpath, wait=True, done_callback=None):
+        """
+        Salva o treinador inteiro para ser recriado depois com `load_state` (ex.: ao sair da memória):
+        estado completo do agente, parâmetros e histórico de treinamento.
+        
+        Args:
+            dirpath: Diretório de destino
+            wait: Se False, retorna logo após o snapshot em memória (gravação em segundo plano)
+            done_callback: Função chamada com o CheckpointJob quando a gravação terminar (com
+                           `job.error` preenchido se ela falhou)
+            
+        Returns:
+            Caminho do diretório
+        """
+        writes = self.agent.full_state_writes(dirpath)
+        trainer_state = {
+            "params": self.model_params(),
+            "model_dir": self.model_dir,
+            "training_history": self.training_history,
+            "saved_at": datetime.now().isoformat()
+        }
+        writes.append((os.path.join(dirpath, "trainer.json"), "json", json.dumps(trainer_state, default=float)))
+        job = checkpoint_writer.submit(writes)
+        if done_callback is not None:
+            job.add_done_callback(done_callback)
+        if wait:
+            job.wait()
+        return dirpath
+    
+    @classmethod
+    def load_state(cls, dirpath):
+        """
+        Recria um treinador salvo por `save_state` (os geradores aleatórios globais não são alterados).
+        
+        Args:
+            dirpath: Diretório salvo
+            
+        Returns:
+            Instância de TradingTrainer
+        """
+        checkpoint_writer.flush(dirpath)  # A gravação pode ainda estar em andamento
+        with open(os.path.join(dirpath, "trainer.json"), "r") as f:
+            trainer_state = json.load(f)
+        
+        trainer = cls(model_dir=trainer_state["model_dir"], **trainer_state["params"])
+        trainer.agent.load_full_state(dirpath, restore_rng=False)
+        trainer.training_history = trainer_state["training_history"]
+        return trainer
+    
+    def memory_footprint(self):
+        """Estimativa (bytes) da memória do treinador: dados do ambiente e agente."""
+        df = getattr(self.env, "df", None)
+        data_bytes = int(df.memory_usage(deep=True).sum()) if df is not None else 0
+        return data_bytes + self.agent.memory_footprint()
+    
+    def save_training_history(self, name=None):
+        """
+        Salva o histórico de treinamento em JSON.
+        
+        Args:
+            name: Nome do arquivo (sem extensão)
+        """
+        if name is None:
+            name = f"{self.symbol}_training_history"
+        
+        filepath = os.path.join(self.model_dir, f"{name}.json")
+        with open(filepath, "w") as f:
+            json.dump(self.training_history, f, indent=4, default=float)
+        
+        return filepath
@@ -0,0 +1,81 @@
+# src/rl_agent/training_profiler.py
+
+import time
+
+# Fases medidas no laço de treinamento (na ordem em que aparecem no resumo)
+TRAINING_PHASES = (
+    "env_reset",
+    "env_step",
+    "act",
+    "remember",
+    "replay_sample",
+    "replay_tensors",
+    "replay_forward",
+    "replay_backward",
+    "replay_step",
+    "target_sync",
+    "checkpoint"
+)
+
+
+class PhaseTimer:
+    """Acumula o tempo gasto em cada fase do treinamento com custo mínimo.
+
+    Cada medição é só uma soma e um contador por fase (sem listas por passo), então o
+    resumo pode ser recalculado a cada episódio e anexado ao histórico de treinamento.
+    Uso: `start = time.perf_counter(); ...; timer.record("env_step", start)`.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.max_seconds = {}
+        self.steps = 0
+        self.updates = 0
+        self.episodes = 0
+        self.started_at = time.perf_counter()
+
+    def record(self, phase, start):
+        """Registra uma medição da fase `phase` iniciada em `start` (time.perf_counter())."""
+        return self.add(phase, time.perf_counter() - start)
+
+    def add(self, phase, seconds):
+        """Registra uma duração já medida (em segundos) para a fase `phase`."""
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        if seconds > self.max_seconds.get(phase, 0.0):
+            self.max_seconds[phase] = seconds
+        return seconds
+
+    def summary(self):
+        """
+        Resumo das medições até agora.
+
+        Returns:
+            Dicionário com o tempo total, taxas (passos/s, atualizações/s) e, por fase,
+            o tempo total, a fração do tempo total, o número de chamadas e as latências média e máxima (ms)
+        """
+        elapsed = time.perf_counter() - self.started_at
+        phases = {}
+        ordered = [p for p in TRAINING_PHASES if p in self.totals] + \
+                  [p for p in self.totals if p not in TRAINING_PHASES]
+        for phase in ordered:
+            total = self.totals[phase]
+            count = self.counts[phase]
+            phases[phase] = {
+                "total_seconds": round(total, 6),
+                "share": round(total / elapsed, 4) if elapsed > 0 else 0.0,
+                "calls": count,
+                "mean_ms": round(total / count * 1000, 4),
+                "max_ms": round(self.max_seconds[phase] * 1000, 4)
+            }
+
+        return {
+            "elapsed_seconds": round(elapsed, 4),
+            "episodes": self.episodes,
+            "steps": self.steps,
+            "updates": self.updates,
+            "steps_per_second": round(self.steps / elapsed, 2) if elapsed > 0 else 0.0,
+            "updates_per_second": round(self.updates / elapsed, 2) if elapsed > 0 else 0.0,
+            "phases": phases
+        }